@@ -0,0 +1,272 @@
+"""
+ARROW: Asset pipeline
+Threaded image decoding, frame-budgeted texture uploads and per-context shader dedup
+"""
+
+import hashlib
+import os
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pygame
+import moderngl
+
+ART_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src')
+CACHE_DIR = '.arrow_cache'
+
+# ============================================
+# 1. DECODING (WORKER THREADS)
+# ============================================
+#
+# Decoded images are kept on disk as raw RGBA behind a small header, keyed by
+# the source's path, size and mtime. A warm start reads those straight back
+# instead of decoding JPEGs again.
+
+RAW_HEADER = struct.Struct('<4sII')
+RAW_MAGIC = b'RGBA'
+
+
+def _cache_path(path, cache_dir, max_size):
+    stat = os.stat(path)
+    key = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}|{max_size}"
+    digest = hashlib.blake2b(key.encode(), digest_size=12).hexdigest()
+    return os.path.join(cache_dir, digest + '.rgba')
+
+
+def decode_image(path, cache_dir=CACHE_DIR, max_size=2048):
+    """Image file -> (size, bottom-up RGBA bytes, cache hit)"""
+    cached = _cache_path(path, cache_dir, max_size) if cache_dir else None
+    if cached and os.path.exists(cached):
+        with open(cached, 'rb') as f:
+            magic, width, height = RAW_HEADER.unpack(f.read(RAW_HEADER.size))
+            if magic == RAW_MAGIC:
+                return (width, height), f.read(), True
+
+    surface = pygame.image.load(path)
+    width, height = surface.get_size()
+    if max(width, height) > max_size:
+        # No facade needs more than the GPU will comfortably sample
+        scale = max_size / max(width, height)
+        surface = pygame.transform.smoothscale(
+            surface, (max(1, round(width * scale)), max(1, round(height * scale))))
+        width, height = surface.get_size()
+    data = pygame.image.tobytes(surface, 'RGBA', True)
+
+    if cached:
+        os.makedirs(cache_dir, exist_ok=True)
+        partial = cached + '.part'
+        with open(partial, 'wb') as f:
+            f.write(RAW_HEADER.pack(RAW_MAGIC, width, height))
+            f.write(data)
+        os.replace(partial, cached)  # a crashed write never leaves a torn cache entry
+    return (width, height), data, False
+
+
+# ============================================
+# 2. ASSET MANAGER (GL THREAD)
+# ============================================
+
+class AssetManager:
+    """Decodes on a thread pool; uploads to textures a few rows at a time per frame"""
+
+    def __init__(self, ctx, workers=4, cache_dir=CACHE_DIR, upload_budget=4 << 20):
+        self.ctx = ctx
+        self.cache_dir = cache_dir
+        self.upload_budget = upload_budget  # bytes written to the GPU per pump()
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='asset')
+        self.textures = {}   # name -> moderngl.Texture, once fully uploaded
+        self._pending = []   # [name, future]
+        self._uploading = []  # [name, texture, data, row_bytes, next_row]
+        self.requested = 0
+        self.cache_hits = 0
+        self.decode_seconds = 0.0
+        self.bytes_uploaded = 0
+
+    def load_textures(self, paths):
+        """Queue image files; names are their file names without extension"""
+        for path in paths:
+            name = os.path.splitext(os.path.basename(path))[0]
+            self._pending.append([name, self.pool.submit(self._decode, path)])
+            self.requested += 1
+
+    def _decode(self, path):
+        start = time.perf_counter()
+        result = decode_image(path, self.cache_dir)
+        return result, time.perf_counter() - start
+
+    def pump(self):
+        """Call once a frame on the GL thread: start finished decodes, upload within budget"""
+        still_pending = []
+        for name, future in self._pending:
+            if not future.done():
+                still_pending.append([name, future])
+                continue
+            ((width, height), data, hit), seconds = future.result()
+            self.decode_seconds += seconds
+            self.cache_hits += hit
+            texture = self.ctx.texture((width, height), 4)
+            self._uploading.append([name, texture, data, width * 4, 0])
+        self._pending = still_pending
+
+        budget = self.upload_budget
+        while self._uploading and budget > 0:
+            job = self._uploading[0]
+            name, texture, data, row_bytes, row = job
+            height = texture.size[1]
+            rows = max(1, min(height - row, budget // row_bytes))
+            texture.write(data[row * row_bytes:(row + rows) * row_bytes],
+                          viewport=(0, row, texture.size[0], rows))
+            budget -= rows * row_bytes
+            self.bytes_uploaded += rows * row_bytes
+            job[4] = row + rows
+            if job[4] >= height:
+                texture.build_mipmaps()
+                self.textures[name] = texture
+                self._uploading.pop(0)
+        return self.progress
+
+    @property
+    def progress(self):
+        if not self.requested:
+            return 1.0
+        done = len(self.textures)
+        partial = sum(job[4] / job[1].size[1] for job in self._uploading)
+        return (done + partial) / self.requested
+
+    @property
+    def done(self):
+        return not self._pending and not self._uploading
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+# ============================================
+# 3. SHADER PROGRAM DEDUP
+# ============================================
+
+class ProgramDedup:
+    """Links each distinct shader source once per context.
+
+    Nothing is kept across runs: moderngl does not expose
+    glGetProgramBinary, so every start links again and link_seconds is the
+    full cost. Whether that is cheap is up to the driver's own disk cache.
+    """
+
+    def __init__(self, ctx):
+        self.ctx = ctx
+        self.programs = {}
+        self.link_seconds = 0.0
+
+    def get(self, vertex_shader, fragment_shader, **kwargs):
+        key = hashlib.blake2b((vertex_shader + '\0' + fragment_shader).encode(),
+                              digest_size=16).digest()
+        program = self.programs.get(key)
+        if program is None:
+            start = time.perf_counter()
+            program = self.programs[key] = self.ctx.program(
+                vertex_shader=vertex_shader, fragment_shader=fragment_shader, **kwargs)
+            self.link_seconds += time.perf_counter() - start
+        return program
+
+    def __len__(self):
+        return len(self.programs)
+
+
+# ============================================
+# 4. LOADING SCREEN
+# ============================================
+
+class LoadingScreen:
+    """Splash image plus a progress bar, drawn while assets stream in
+
+    The splash goes through the AssetManager like any other image, so the
+    main thread never decodes it: a plain backdrop is drawn until it lands.
+    """
+
+    vertex_shader = '''
+    #version 330
+    in vec2 in_position;
+    out vec2 v_uv;
+    void main() {
+        gl_Position = vec4(in_position, 0.0, 1.0);
+        v_uv = in_position * 0.5 + 0.5;
+    }
+    '''
+
+    fragment_shader = '''
+    #version 330
+    uniform sampler2D splash;
+    uniform float progress;
+    uniform bool has_splash;
+    in vec2 v_uv;
+    out vec4 f_color;
+    void main() {
+        vec3 color = has_splash ? texture(splash, v_uv).rgb * 0.6 : vec3(0.02, 0.03, 0.04);
+        if (v_uv.y > 0.06 && v_uv.y < 0.08 && v_uv.x > 0.1 && v_uv.x < 0.9) {
+            float filled = step((v_uv.x - 0.1) / 0.8, progress);
+            color = mix(vec3(0.1, 0.15, 0.1), vec3(0.3, 0.95, 0.4), filled);
+        }
+        f_color = vec4(color, 1.0);
+    }
+    '''
+
+    def __init__(self, ctx, programs, assets, splash=None):
+        self.ctx = ctx
+        self.prog = programs.get(self.vertex_shader, self.fragment_shader)
+        self.assets = assets
+        self.splash = None
+        if splash and os.path.exists(splash):
+            assets.load_textures([splash])
+            self.splash = os.path.splitext(os.path.basename(splash))[0]
+        quad = np.array([-1.0, -1.0, 1.0, -1.0, -1.0, 1.0, 1.0, 1.0], dtype='f4')
+        self.vbo = ctx.buffer(quad.tobytes())
+        self.vao = ctx.vertex_array(self.prog, [(self.vbo, '2f', 'in_position')])
+
+    def draw(self, progress):
+        self.prog['progress'].value = progress
+        splash = self.assets.textures.get(self.splash)
+        self.prog['has_splash'].value = splash is not None
+        if splash is not None:
+            splash.use(0)
+        with self.ctx.scope(self.ctx.fbo, enable_only=moderngl.NOTHING):
+            self.vao.render(moderngl.TRIANGLE_STRIP)
+
+
+def art_paths():
+    """The show's key art under src/"""
+    return sorted(
+        os.path.join(ART_DIR, name) for name in os.listdir(ART_DIR)
+        if name.startswith('ARROW') and name.endswith('.jpg')
+    )
+
+
+# ============================================
+# 5. BENCHMARK
+# ============================================
+
+if __name__ == "__main__":
+    import argparse
+    import shutil
+    import tempfile
+
+    parser = argparse.ArgumentParser(description="Cold vs warm asset decode")
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    paths = art_paths()
+    cache_dir = tempfile.mkdtemp(prefix='arrow_assets_')
+    try:
+        for label in ('cold', 'warm'):
+            start = time.perf_counter()
+            with ThreadPoolExecutor(args.workers) as pool:
+                results = list(pool.map(lambda p: decode_image(p, cache_dir), paths))
+            elapsed = time.perf_counter() - start
+            megabytes = sum(len(data) for _, data, _ in results) / 1e6
+            hits = sum(hit for _, _, hit in results)
+            print(f"{label}: {len(paths)} images, {megabytes:.1f} MB RGBA, "
+                  f"{hits} from cache, {elapsed * 1000:.0f} ms")
+    finally:
+        shutil.rmtree(cache_dir)
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+S.P.E.C.I.A.L. packed builds
+Character state bit-packed into a few 64-bit words, and a memory-mapped database of them
+"""
+
+import json
+import os
+import struct
+import time
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+
+from perks import SPECIAL, Character, PerkTree
+
+# ------------------------- Layout -------------------------
+#
+# One record is WORDS uint64s. Fields never straddle a word, so reading one
+# is a shift and a mask on one column:
+#
+#   level        8 bits
+#   xp          24 bits
+#   perk points  8 bits
+#   S..L         4 bits each (1-10)
+#   perk ranks   just wide enough for the perk's max rank (1 or 2 bits here)
+#
+# Oliver Queen's 35 perks fit, with everything else, in two words (16 bytes)
+# against ~100 separate Python objects on a live Character.
+
+HEADER_FIELDS = (('level', 8), ('xp', 24), ('perk_points', 8))
+SPECIAL_BITS = 4
+
+
+class BuildLayout:
+    """Where each field of one PerkTree's characters lives in a packed record."""
+
+    def __init__(self, tree_name: str, fields: Sequence[Tuple[str, int]]):
+        self.tree_name = tree_name
+        # name -> (word, shift, width); perks apart, so one named "A" or "level" shadows nothing
+        self.fields: Dict[str, Tuple[int, int, int]] = {}
+        self.perk_fields: Dict[str, Tuple[int, int, int]] = {}
+        fixed = len(HEADER_FIELDS) + len(SPECIAL)
+        word, shift = 0, 0
+        for position, (name, width) in enumerate(fields):
+            if shift + width > 64:
+                word, shift = word + 1, 0
+            (self.fields if position < fixed else self.perk_fields)[name] = (word, shift, width)
+            shift += width
+        self.words = word + 1
+        self.perk_names = [name for name, _ in fields[fixed:]]
+        if len(self.perk_fields) != len(self.perk_names):
+            raise ValueError(f"{tree_name}: perk names must be unique")
+
+    @classmethod
+    def for_tree(cls, tree: PerkTree) -> 'BuildLayout':
+        fields = list(HEADER_FIELDS) + [(short, SPECIAL_BITS) for short in SPECIAL]
+        fields += [(name, max(1, int(rank).bit_length()))
+                   for name, rank in zip(tree.perk_names, tree.perks['max_rank'])]
+        return cls(tree.name, fields)
+
+    def to_json(self) -> str:
+        ordered = sorted(list(self.fields.items()) + list(self.perk_fields.items()),
+                         key=lambda item: (item[1][0], item[1][1]))
+        return json.dumps({'tree': self.tree_name, 'fields': [[name, spec[2]] for name, spec in ordered]})
+
+    @classmethod
+    def from_json(cls, text: str) -> 'BuildLayout':
+        data = json.loads(text)
+        return cls(data['tree'], [tuple(field) for field in data['fields']])
+
+    def spec(self, name: str) -> Tuple[int, int, int]:
+        """(word, shift, width) of a field; 'perk:<name>' always means the perk."""
+        if name in self.fields:
+            return self.fields[name]
+        if name in self.perk_fields:
+            return self.perk_fields[name]
+        if name.startswith('perk:') and name[5:] in self.perk_fields:
+            return self.perk_fields[name[5:]]
+        raise KeyError(f"no field {name!r} in {self.tree_name} builds")
+
+    def field(self, words: np.ndarray, name: str) -> np.ndarray:
+        """One field of every record, straight from the packed words."""
+        return _extract(words, self.spec(name))
+
+
+def _extract(words: np.ndarray, spec: Tuple[int, int, int]) -> np.ndarray:
+    word, shift, width = spec
+    return (words[:, word] >> np.uint64(shift)) & np.uint64((1 << width) - 1)
+
+
+# ------------------------- Encode / Decode -------------------------
+def encode(layout: BuildLayout, level: np.ndarray, perk_points: np.ndarray, special: np.ndarray,
+           ranks: np.ndarray, xp: Optional[np.ndarray] = None) -> np.ndarray:
+    """Column arrays for n characters -> (n, words) uint64 records."""
+    count = len(level)
+    words = np.zeros((count, layout.words), dtype=np.uint64)
+    columns = [('level', level), ('xp', xp if xp is not None else np.zeros(count, np.int64)),
+               ('perk_points', perk_points)]
+    columns += [(short, special[:, a]) for a, short in enumerate(SPECIAL)]
+    columns = [(name, layout.fields[name], values) for name, values in columns]
+    columns += [(name, layout.perk_fields[name], ranks[:, p]) for p, name in enumerate(layout.perk_names)]
+    for name, (word, shift, width), values in columns:
+        values = np.asarray(values, dtype=np.int64)
+        if count and (values.min() < 0 or values.max() >= 1 << width):
+            raise ValueError(f"{name} does not fit in {width} bits")
+        words[:, word] |= values.astype(np.uint64) << np.uint64(shift)
+    return words
+
+
+def decode(layout: BuildLayout, words: np.ndarray) -> Dict[str, np.ndarray]:
+    """(n, words) records -> level, xp, perk_points, special (n, 7), ranks (n, perks)."""
+    words = np.asarray(words)
+    out = {name: layout.field(words, name).astype(np.int64) for name, _ in HEADER_FIELDS}
+    out['special'] = np.stack([layout.field(words, short) for short in SPECIAL], axis=1).astype(np.uint8)
+    ranks = np.empty((len(words), len(layout.perk_names)), dtype=np.uint8)
+    for p, name in enumerate(layout.perk_names):
+        ranks[:, p] = _extract(words, layout.perk_fields[name])
+    out['ranks'] = ranks
+    return out
+
+
+def encode_characters(characters: Sequence[Character]) -> np.ndarray:
+    """Live Character objects (one tree) -> packed records."""
+    layout = BuildLayout.for_tree(characters[0].tree)
+    return encode(layout,
+                  np.array([c.level for c in characters]),
+                  np.array([c.perk_points for c in characters]),
+                  np.array([[c.special[short].value for short in SPECIAL] for c in characters]),
+                  np.array([c.ranks for c in characters]),
+                  np.array([c.xp for c in characters]))
+
+
+def apply_record(character: Character, layout: BuildLayout, record: np.ndarray):
+    """Load one packed record into a Character through its normal setters."""
+    fields = decode(layout, record.reshape(1, -1))
+    character.level = int(fields['level'][0])
+    character.xp = int(fields['xp'][0])
+    for a, short in enumerate(SPECIAL):
+        character.special[short].value = int(fields['special'][0, a])
+    for index, rank in enumerate(fields['ranks'][0].tolist()):
+        if character.ranks[index] != rank:
+            character.set_rank(index, rank)
+    character.perk_points = int(fields['perk_points'][0])
+
+
+# ------------------------- Build Database -------------------------
+#
+#   header  : magic, version, words per record, offset of first record, count
+#   layout  : JSON, padded so records start 8-byte aligned
+#   records : count x words uint64, appended in place
+#
+# Queries run on the memory-mapped records a chunk at a time, reading only
+# the words the conditions touch.
+
+DB_MAGIC = b'BLDB'
+DB_VERSION = 1
+DB_HEADER = struct.Struct('<4sHHIQ')
+
+OPERATORS = {'==': np.equal, '!=': np.not_equal, '<': np.less, '<=': np.less_equal,
+             '>': np.greater, '>=': np.greater_equal}
+
+
+class BuildDatabase:
+    """Append-only file of packed builds for one perk tree."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            head = f.read(DB_HEADER.size)
+            magic, version, words, offset, count = DB_HEADER.unpack(head)
+            if magic != DB_MAGIC or version != DB_VERSION:
+                raise ValueError(f"{path}: not a build database of this version")
+            self.layout = BuildLayout.from_json(f.read(offset - DB_HEADER.size).rstrip(b' ').decode())
+        self.offset = offset
+        self.count = count
+        self.records = (np.memmap(path, np.uint64, 'r', offset, (count, words)) if count
+                        else np.zeros((0, words), np.uint64))
+
+    @classmethod
+    def create(cls, path: str, tree: PerkTree) -> 'BuildDatabase':
+        layout = BuildLayout.for_tree(tree)
+        text = layout.to_json().encode()
+        offset = DB_HEADER.size + len(text)
+        offset += -offset % 8
+        with open(path, 'wb') as f:
+            f.write(DB_HEADER.pack(DB_MAGIC, DB_VERSION, layout.words, offset, 0))
+            f.write(text.ljust(offset - DB_HEADER.size, b' '))
+        return cls(path)
+
+    def append(self, words: np.ndarray):
+        words = np.ascontiguousarray(words, dtype=np.uint64)
+        if words.ndim != 2 or words.shape[1] != self.layout.words:
+            raise ValueError(f"records must be (n, {self.layout.words}) uint64")
+        with open(self.path, 'r+b') as f:
+            f.seek(self.offset + self.count * self.layout.words * 8)
+            f.write(words.tobytes())
+            self.count += len(words)
+            f.seek(0)
+            f.write(DB_HEADER.pack(DB_MAGIC, DB_VERSION, self.layout.words, self.offset, self.count))
+        self.records = np.memmap(self.path, np.uint64, 'r', self.offset, (self.count, self.layout.words))
+
+    def __len__(self):
+        return self.count
+
+    def scan(self, start: int = 0, stop: Optional[int] = None, chunk: int = 1 << 20) -> Iterable[Tuple[int, np.ndarray]]:
+        """(first record index, records) chunks over a range, still packed."""
+        stop = self.count if stop is None else min(stop, self.count)
+        for first in range(start, stop, chunk):
+            yield first, self.records[first:min(first + chunk, stop)]
+
+    def where(self, *conditions: Tuple[str, str, int], start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """Record indices matching every (field, operator, value).
+
+        Fields are 'level', 'xp', 'perk_points', an attribute letter or a perk
+        name, e.g. db.where(('Master Archer', '>=', 1), ('A', '>=', 8)); a perk
+        whose name clashes with one of the others is 'perk:<name>'. Values must
+        fit the field (0 <= value < 2 ** width).
+        """
+        specs = []
+        for name, op, value in conditions:
+            spec = self.layout.spec(name)
+            if op not in OPERATORS:
+                raise ValueError(f"unknown operator {op!r}")
+            if not 0 <= value < 1 << spec[2]:
+                raise ValueError(f"{name} holds 0..{(1 << spec[2]) - 1}, not {value}")
+            specs.append((spec, OPERATORS[op], np.uint64(value)))
+        hits = []
+        for first, records in self.scan(start, stop):
+            mask = np.ones(len(records), dtype=bool)
+            for spec, compare, value in specs:
+                mask &= compare(_extract(records, spec), value)
+            hits.append(np.flatnonzero(mask) + first)
+        return np.concatenate(hits) if hits else np.zeros(0, dtype=np.int64)
+
+    def count_where(self, *conditions: Tuple[str, str, int]) -> int:
+        return len(self.where(*conditions))
+
+    def decode(self, indices: np.ndarray) -> Dict[str, np.ndarray]:
+        return decode(self.layout, self.records[np.asarray(indices)])
+
+
+# ------------------------- Benchmark -------------------------
+if __name__ == "__main__":
+    import argparse
+    import tempfile
+
+    from perks import character_path, load_tree
+    from population import POLICIES, Population
+
+    parser = argparse.ArgumentParser(description="Pack a simulated population and query it on disk")
+    parser.add_argument('character', nargs='?', default='Oliver Queen')
+    parser.add_argument('--count', type=int, default=1_000_000)
+    parser.add_argument('--perk', default='Master Archer')
+    args = parser.parse_args()
+
+    tree = load_tree(character_path(args.character))
+    layout = BuildLayout.for_tree(tree)
+    rng = np.random.default_rng(0)
+    population = Population(tree, args.count, 2, rng)
+    for level in range(2, 51):
+        population.level_up()
+        population.spend(POLICIES['random'], rng)
+
+    start = time.perf_counter()
+    words = encode(layout, population.level, population.perk_points, population.special, population.ranks)
+    encode_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    fields = decode(layout, words)
+    decode_seconds = time.perf_counter() - start
+    assert (fields['ranks'] == population.ranks).all() and (fields['special'] == population.special).all()
+    live = Character(tree)
+    print(f"{args.count} builds: {layout.words * 8} bytes each packed "
+          f"({words.nbytes / 1e6:.0f} MB), encode {encode_seconds * 1000:.0f} ms, "
+          f"decode {decode_seconds * 1000:.0f} ms")
+
+    folder = tempfile.mkdtemp(prefix='arrow_builds_')
+    path = os.path.join(folder, 'builds.bldb')
+    try:
+        db = BuildDatabase.create(path, tree)
+        start = time.perf_counter()
+        db.append(words)
+        print(f"wrote {os.path.getsize(path) / 1e6:.0f} MB in {(time.perf_counter() - start) * 1000:.0f} ms")
+        db = BuildDatabase(path)
+        start = time.perf_counter()
+        hits = db.where((args.perk, '>=', 1))
+        query_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        both = db.where((args.perk, '>=', 1), ('A', '>=', 10), ('level', '==', 50))
+        compound_seconds = time.perf_counter() - start
+        # The same question answered by rebuilding a Character per record
+        sample = min(20000, args.count)
+        start = time.perf_counter()
+        index = tree.index[args.perk]
+        slow = 0
+        for record in db.records[:sample]:
+            apply_record(live, layout, record)
+            slow += live.ranks[index] >= 1
+        per_record = (time.perf_counter() - start) / sample
+        print(f"{args.perk} >= 1: {len(hits)} builds in {query_seconds * 1000:.0f} ms; "
+              f"with A >= 10 and level 50: {len(both)} in {compound_seconds * 1000:.0f} ms")
+        print(f"deserializing each record instead: ~{per_record * args.count:.1f} s "
+              f"({per_record * 1e6:.0f} us per record, timed on {sample})")
+        assert slow == (hits < sample).sum()
+    finally:
+        del db
+        os.remove(path)
+        os.rmdir(folder)
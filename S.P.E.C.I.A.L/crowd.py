@@ -0,0 +1,390 @@
+"""
+ARROW: Crowd simulation
+Pedestrians and Glades thugs as NumPy arrays, steered in batched passes
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+PEDESTRIAN = 0
+THUG = 1
+
+# ============================================
+# 1. SPATIAL INDEX
+# ============================================
+
+class SpatialGrid:
+    """Uniform grid over the XZ plane, rebuilt from scratch each tick.
+
+    Agents are counting-sorted by cell into CSR form: `order` lists agent
+    indices cell by cell and `cell_start[c]:cell_start[c + 1]` is cell c's
+    slice. The extra last cell is always empty and is where out-of-bounds
+    lookups land, so a neighbor query is a handful of whole-array operations
+    for all query points at once.
+    """
+
+    OFFSETS = np.array([(dx, dz) for dx in (-1, 0, 1) for dz in (-1, 0, 1)], dtype=np.int64)
+
+    def __init__(self, bounds, cell_size=1.25):
+        (self.min_x, self.min_z), (max_x, max_z) = bounds
+        self.cell_size = cell_size
+        self.nx = int(np.ceil((max_x - self.min_x) / cell_size)) + 1
+        self.nz = int(np.ceil((max_z - self.min_z) / cell_size)) + 1
+        self.empty = self.nx * self.nz
+        self.cell_start = np.zeros(self.empty + 2, dtype=np.int64)
+        self.order = np.zeros(0, dtype=np.int64)
+
+    def _cells(self, xz):
+        cx = np.floor((xz[:, 0] - self.min_x) / self.cell_size).astype(np.int64)
+        cz = np.floor((xz[:, 1] - self.min_z) / self.cell_size).astype(np.int64)
+        return cx, cz
+
+    def build(self, xz, active=None):
+        """Bucket agents (optionally only the `active` ones) by cell"""
+        index = np.arange(len(xz)) if active is None else np.flatnonzero(active)
+        cx, cz = self._cells(xz[index])
+        inside = (cx >= 0) & (cx < self.nx) & (cz >= 0) & (cz < self.nz)
+        index = index[inside]
+        keys = cx[inside] * self.nz + cz[inside]
+        self.order = index[np.argsort(keys, kind='stable')]
+        np.cumsum(np.bincount(keys, minlength=self.empty + 1), out=self.cell_start[1:])
+        return self
+
+    def pairs(self, xz):
+        """(query row, agent index) for every agent in the 3x3 cells around each point"""
+        cx, cz = self._cells(xz)
+        ncx = cx[:, None] + self.OFFSETS[:, 0]
+        ncz = cz[:, None] + self.OFFSETS[:, 1]
+        inside = (ncx >= 0) & (ncx < self.nx) & (ncz >= 0) & (ncz < self.nz)
+        keys = np.where(inside, ncx * self.nz + ncz, self.empty).ravel()
+
+        start = self.cell_start[keys]
+        count = self.cell_start[keys + 1] - start
+        row = np.repeat(np.arange(len(keys)) // len(self.OFFSETS), count)
+        skip = np.repeat(np.cumsum(count) - count - start, count)
+        return row, self.order[np.arange(len(row)) - skip]
+
+
+# ============================================
+# 2. STREET GRAPH
+# ============================================
+
+def street_graph(segments):
+    """Intersections of street segments -> (nodes (K, 2), CSR indptr, CSR neighbors)"""
+    a = segments[:, 0, [0, 2]]
+    b = segments[:, 1, [0, 2]]
+    d = b - a
+
+    # All-pairs segment intersection, solved in one broadcast
+    denom = d[:, None, 0] * d[None, :, 1] - d[:, None, 1] * d[None, :, 0]
+    diff = a[None, :, :] - a[:, None, :]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = (diff[..., 0] * d[None, :, 1] - diff[..., 1] * d[None, :, 0]) / denom
+        u = (diff[..., 0] * d[:, None, 1] - diff[..., 1] * d[:, None, 0]) / denom
+    hit = (denom != 0) & (t >= 0) & (t <= 1) & (u >= 0) & (u <= 1)
+    seg_i, seg_j = np.nonzero(hit)
+    t = t[seg_i, seg_j]
+    points = a[seg_i] + d[seg_i] * t[:, None]
+
+    nodes, node_of = np.unique(np.round(points, 3), axis=0, return_inverse=True)
+    node_of = node_of.ravel()
+
+    # Consecutive intersections along each segment are connected
+    order = np.lexsort((t, seg_i))
+    seg_sorted, node_sorted = seg_i[order], node_of[order]
+    same = (seg_sorted[1:] == seg_sorted[:-1]) & (node_sorted[1:] != node_sorted[:-1])
+    src = np.concatenate([node_sorted[:-1][same], node_sorted[1:][same]])
+    dst = np.concatenate([node_sorted[1:][same], node_sorted[:-1][same]])
+
+    order = np.argsort(src, kind='stable')
+    indptr = np.zeros(len(nodes) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=len(nodes)), out=indptr[1:])
+    return nodes, indptr, dst[order]
+
+
+# ============================================
+# 3. BATCHED STEERING
+# ============================================
+
+def steer(pos, vel, goal, max_speed, grid, index, dt,
+          separation_radius=1.2, separation_weight=6.0, responsiveness=4.0):
+    """New (position, velocity) for agents `index`: seek goal + separate from neighbors"""
+    p = pos[index]
+    v = vel[index]
+
+    to_goal = goal[index] - p
+    dist = np.sqrt(np.einsum('nc,nc->n', to_goal, to_goal))[:, None]
+    desired = to_goal / np.maximum(dist, 1e-6) * max_speed[index, None]
+
+    # Separation over candidate neighbor pairs from the grid
+    row, other = grid.pairs(p)
+    keep = other != index[row]
+    row, other = row[keep], other[keep]
+    dx = p[row, 0] - pos[other, 0]
+    dz = p[row, 1] - pos[other, 1]
+    dist2 = dx * dx + dz * dz
+    near = (dist2 < separation_radius * separation_radius) & (dist2 > 1e-8)
+    row, dx, dz = row[near], dx[near], dz[near]
+    weight = 1.0 / dist2[near]
+    separation = np.stack([np.bincount(row, dx * weight, minlength=len(index)),
+                           np.bincount(row, dz * weight, minlength=len(index))], axis=1)
+
+    accel = (desired - v) * responsiveness + separation * separation_weight
+    v = v + accel * dt
+    speed = np.sqrt(np.einsum('nc,nc->n', v, v))[:, None]
+    limit = max_speed[index, None] * 1.5
+    v = np.where(speed > limit, v / np.maximum(speed, 1e-6) * limit, v)
+    return p + v * dt, v
+
+
+# ============================================
+# 4. CROWD
+# ============================================
+
+class Crowd:
+    """Thousands of NPCs walking the street grid, one array per property"""
+
+    def __init__(self, streets, count, seed=0, thug_ratio=0.2, workers=0, force_workers=False):
+        self.rng = np.random.default_rng(seed)
+        segments = np.array([(s['start'], s['end']) for s in streets], dtype=np.float64)
+        self.nodes, self.indptr, self.neighbors = street_graph(segments)
+        self.nodes = self.nodes.astype(np.float32)
+
+        lo = self.nodes.min(axis=0) - 10.0
+        hi = self.nodes.max(axis=0) + 10.0
+        self.grid = SpatialGrid((lo, hi))
+
+        # Agent state
+        # Spawn spread along street edges, heading for the edge's far end
+        start = self.rng.integers(len(self.nodes), size=count)
+        self.goal_node = self._next_node(start)
+        along = self.rng.random((count, 1)).astype(np.float32)
+        self.position = (self.nodes[start] * (1 - along) + self.nodes[self.goal_node] * along
+                         + self.rng.uniform(-1.5, 1.5, (count, 2)).astype(np.float32))
+        self.velocity = np.zeros((count, 2), dtype=np.float32)
+        self.goal = self.nodes[self.goal_node]
+        self.kind = np.where(self.rng.random(count) < thug_ratio, THUG, PEDESTRIAN).astype(np.uint8)
+        self.max_speed = np.where(self.kind == THUG, 2.2, 1.4).astype(np.float32)
+        self.max_speed *= self.rng.uniform(0.8, 1.2, count).astype(np.float32)
+        self.alive = np.ones(count, dtype=bool)
+        self.hits = 0
+
+        if not (force_workers or pool_pays(count, workers)):
+            workers = 0
+        self.workers = RegionWorkers(self, workers) if workers else None
+
+    def __len__(self):
+        return len(self.position)
+
+    def _next_node(self, node):
+        """A random street-graph neighbor of every node in `node`"""
+        start = self.indptr[node]
+        degree = self.indptr[node + 1] - start
+        pick = (self.rng.random(len(node)) * degree).astype(np.int64)
+        return self.neighbors[start + pick]
+
+    def update(self, dt, arrive_radius=2.0):
+        """One batched tick: index, steer, integrate, advance goals"""
+        if self.workers:
+            self.workers.step(dt)
+        else:
+            self.grid.build(self.position, self.alive)
+            moving = np.flatnonzero(self.alive)
+            pos, vel = steer(self.position, self.velocity, self.goal, self.max_speed,
+                             self.grid, moving, dt)
+            self.position[moving] = pos
+            self.velocity[moving] = vel
+
+        reached = self.alive & (np.einsum('nc,nc->n', self.goal - self.position,
+                                          self.goal - self.position) < arrive_radius ** 2)
+        if reached.any():
+            self.goal_node[reached] = self._next_node(self.goal_node[reached])
+            self.goal[reached] = self.nodes[self.goal_node[reached]]
+
+    def resolve_arrow_hits(self, arrows, radius=0.6, height=1.9):
+        """Down any agent an arrow passes through; returns ids of arrows that hit"""
+        if not arrows:
+            return set()
+        if self.workers:
+            # Worker processes index their own copies; the main grid is stale
+            self.grid.build(self.position, self.alive)
+        # Otherwise the index from update() is one update old: a few cm even
+        # when the governor steps the crowd every 4th tick, well inside the
+        # 3x3-cell search
+        tips = np.array([tuple(a['position']) for a in arrows], dtype=np.float32)
+        xz = tips[:, [0, 2]]
+        arrow, agent = self.grid.pairs(xz)
+        offset = xz[arrow] - self.position[agent]
+        near = ((np.einsum('kc,kc->k', offset, offset) < radius * radius)
+                & (tips[arrow, 1] >= 0.0) & (tips[arrow, 1] <= height))
+        arrow, agent = arrow[near], agent[near]
+        if not len(arrow):
+            return set()
+        # One victim per arrow: the first agent it touches
+        arrow, first = np.unique(arrow, return_index=True)
+        victims = agent[first]
+        self.alive[victims] = False
+        self.velocity[victims] = 0.0
+        self.hits += len(victims)
+        return {arrows[i]['id'] for i in arrow}
+
+    def close(self):
+        if self.workers:
+            self.workers.close()
+            self.workers = None
+
+
+# ============================================
+# 5. OPTIONAL PROCESS POOL (SPLIT BY REGION)
+# ============================================
+
+#
+# A pool only pays when steering outgrows the per-tick round trip: argsort
+# into strips, submit/collect (~0.45 ms for two workers) and the copy back.
+# Each worker also rebuilds the full spatial grid, so only steering is split.
+# Measured parts, per tick:
+#
+#   agents   grid build   steering   copy back
+#    1000      0.30 ms     0.78 ms    0.05 ms
+#    2000      0.45 ms     1.69 ms    0.09 ms
+#   10000      1.79 ms    12.85 ms    0.41 ms
+#
+# With a core per worker, halving steering beats the overhead from about
+# 2,000 agents (POOL_BREAK_EVEN). With fewer cores than workers the strips
+# run one after another, so the pool never wins: on one CPU, 10k agents take
+# 14.4 ms/tick in process and 16.6 ms with 2 workers, and 40k take 107 ms
+# and 130 ms. Below either bound Crowd steers in process, whatever workers
+# says. `python crowd.py --sweep` measures the crossing on the host it runs on.
+
+POOL_BREAK_EVEN = 2000
+
+
+def pool_pays(count, workers):
+    """Whether `workers` processes would steer `count` agents faster than one"""
+    return workers > 0 and count >= POOL_BREAK_EVEN and (os.cpu_count() or 1) >= workers
+
+
+_shared = {}
+
+
+def _attach(spec, grid_args):
+    """Worker initializer: map the crowd's shared arrays once"""
+    for name, (shm_name, shape, dtype) in spec.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        _shared[name] = (shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf))
+    _shared['grid'] = SpatialGrid(*grid_args)
+
+
+def _region_step(index, dt):
+    arr = {name: value[1] for name, value in _shared.items() if name != 'grid'}
+    grid = _shared['grid'].build(arr['position'], arr['alive'])
+    pos, vel = steer(arr['position'], arr['velocity'], arr['goal'], arr['max_speed'],
+                     grid, index, dt)
+    arr['out_position'][index] = pos
+    arr['out_velocity'][index] = vel
+
+
+class RegionWorkers:
+    """Steering split across processes by X strips of the city, over shared memory"""
+
+    def __init__(self, crowd, workers):
+        self.crowd = crowd
+        self.count = workers
+        self._blocks = []
+        spec = {}
+        for name in ('position', 'velocity', 'goal', 'max_speed', 'alive',
+                     'out_position', 'out_velocity'):
+            source = getattr(crowd, name.replace('out_', ''))
+            shm = shared_memory.SharedMemory(create=True, size=max(source.nbytes, 1))
+            array = np.ndarray(source.shape, dtype=source.dtype, buffer=shm.buf)
+            array[...] = source
+            self._blocks.append(shm)
+            spec[name] = (shm.name, source.shape, source.dtype)
+            if not name.startswith('out_'):
+                setattr(crowd, name, array)  # the crowd now lives in shared memory
+            else:
+                setattr(self, name, array)
+
+        grid = crowd.grid
+        bounds = ((grid.min_x, grid.min_z),
+                  (grid.min_x + (grid.nx - 1) * grid.cell_size,
+                   grid.min_z + (grid.nz - 1) * grid.cell_size))
+        self.executor = ProcessPoolExecutor(
+            workers, initializer=_attach,
+            initargs=(spec, (bounds, grid.cell_size))
+        )
+
+    def step(self, dt):
+        crowd = self.crowd
+        moving = np.flatnonzero(crowd.alive)
+        strips = np.array_split(moving[np.argsort(crowd.position[moving, 0])], self.count)
+        futures = [self.executor.submit(_region_step, strip, dt) for strip in strips if len(strip)]
+        for future in futures:
+            future.result()  # re-raises a worker's error before stale outputs are copied back
+        crowd.position[moving] = self.out_position[moving]
+        crowd.velocity[moving] = self.out_velocity[moving]
+
+    def close(self):
+        self.executor.shutdown()
+        # Move the crowd back to private memory before its shared blocks go
+        for name in ('position', 'velocity', 'goal', 'max_speed', 'alive'):
+            setattr(self.crowd, name, getattr(self.crowd, name).copy())
+        self.out_position = self.out_velocity = None
+        for shm in self._blocks:
+            shm.close()
+            shm.unlink()
+
+
+# ============================================
+# 6. BENCHMARK
+# ============================================
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Crowd simulation throughput")
+    parser.add_argument('--agents', type=int, default=10000)
+    parser.add_argument('--ticks', type=int, default=300)
+    parser.add_argument('--workers', type=int, default=0)
+    parser.add_argument('--sweep', action='store_true',
+                        help='time in-process vs a forced 2-worker pool over agent counts')
+    args = parser.parse_args()
+
+    streets = []
+    for i in range(-100, 100, 15):
+        streets.append({'start': (i, 0.1, -100), 'end': (i, 0.1, 100)})
+        streets.append({'start': (-100, 0.1, i), 'end': (100, 0.1, i)})
+
+    def run(agents, workers, force=False):
+        crowd = Crowd(streets, agents, workers=workers, force_workers=force)
+        pooled = crowd.workers.count if crowd.workers else 0
+        start = time.perf_counter()
+        for _ in range(args.ticks):
+            crowd.update(1.0 / 60.0)
+        elapsed = time.perf_counter() - start
+        crowd.close()
+        return elapsed / args.ticks, pooled
+
+    print(f"{os.cpu_count()} CPU(s); pool used from {POOL_BREAK_EVEN} agents "
+          f"with a CPU per worker")
+    if args.sweep:
+        break_even = None
+        for agents in (500, 1000, 2000, 5000, 10000, 20000):
+            alone, _ = run(agents, 0)
+            pooled, _ = run(agents, 2, force=True)
+            if break_even is None and pooled < alone:
+                break_even = agents
+            print(f"{agents:>6} agents: {alone * 1000:6.2f} ms/tick in process, "
+                  f"{pooled * 1000:6.2f} ms/tick with 2 workers")
+        print(f"break-even on this host: "
+              + (f"~{break_even} agents" if break_even else "none up to 20000 agents"))
+    else:
+        seconds, pooled = run(args.agents, args.workers)
+        print(f"{args.agents} agents, {pooled or 1} process(es)"
+              + (" (in process: the pool does not pay here)" if args.workers and not pooled else "")
+              + f": {seconds * 1000:.2f} ms/tick "
+              f"({'within' if seconds < 1 / 60 else 'over'} the 60 Hz budget)")
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+S.P.E.C.I.A.L. perk eligibility index
+Which perks a character can take right now, kept current as the sheet changes
+"""
+
+import time
+from typing import Dict, List, Set, Tuple
+
+import numpy as np
+
+from perks import SPECIAL, Character, PerkTree
+
+# ------------------------- Buckets -------------------------
+#
+# A perk's next rank is open when four conditions hold: attribute value,
+# character level, prerequisite taken, rank below max. Each character keeps
+# a count of unmet conditions per perk; a perk is available when its count
+# is zero. Every change to the sheet can only flip the conditions of the
+# perks in one bucket of the shared tree:
+#
+#   attribute a reaches v  -> perks under a needing exactly v
+#   level reaches L        -> perks needing exactly level L
+#   perk p gets a rank     -> perks that require p
+#   perk p hits max rank   -> p itself
+#
+# so an update touches only those perks instead of rescanning the tree.
+
+
+class PerkBuckets:
+    """Perks of one PerkTree grouped by the threshold that unlocks them."""
+    __slots__ = ('by_attribute', 'by_level', 'dependents', 'max_rank')
+
+    def __init__(self, tree: PerkTree):
+        perks = tree.perks
+        self.by_attribute: List[Dict[int, List[int]]] = [{} for _ in SPECIAL]
+        self.by_level: Dict[int, List[int]] = {}
+        self.dependents: List[List[int]] = [[] for _ in range(len(tree))]
+        self.max_rank = [int(r) for r in perks['max_rank']]
+        for i, row in enumerate(perks.tolist()):
+            attribute, _, special_value, level_requirement, required = row
+            self.by_attribute[attribute].setdefault(special_value, []).append(i)
+            self.by_level.setdefault(level_requirement, []).append(i)
+            if required >= 0:
+                self.dependents[required].append(i)
+
+
+_buckets: Dict[PerkTree, PerkBuckets] = {}
+
+
+def buckets_for(tree: PerkTree) -> PerkBuckets:
+    """Built once per tree and shared by every character on it."""
+    buckets = _buckets.get(tree)
+    if buckets is None:
+        buckets = _buckets[tree] = PerkBuckets(tree)
+    return buckets
+
+
+def unmet_conditions(character: Character) -> np.ndarray:
+    """Number of unmet requirements per perk, computed from scratch."""
+    perks = character.tree.perks
+    special = np.array([character.special[short].value for short in SPECIAL])
+    required = perks['required_perk']
+    has_required = np.where(required >= 0, character.ranks[np.maximum(required, 0)] >= 1, True)
+    return ((character.ranks >= perks['max_rank']).astype(np.int16)
+            + (special[perks['attribute']] < perks['special_value'])
+            + (character.level < perks['level_requirement'])
+            + ~has_required)
+
+
+# ------------------------- EligibilityIndex Class -------------------------
+class EligibilityIndex:
+    """Available perks of one character, updated in step with its sheet.
+
+    Attaching sets character.eligibility; from then on level, attribute and
+    rank changes (Character.level, SpecialAttribute.value, Character.set_rank)
+    report here and only the affected bucket is revisited.
+    """
+    __slots__ = ('character', 'buckets', 'unmet', 'available', '_added', '_removed')
+
+    def __init__(self, character: Character):
+        self.character = character
+        self.buckets = buckets_for(character.tree)
+        self.unmet: List[int] = unmet_conditions(character).tolist()
+        self.available: Set[int] = {i for i, count in enumerate(self.unmet) if count == 0}
+        self._added: Set[int] = set()
+        self._removed: Set[int] = set()
+        character.eligibility = self
+
+    def detach(self):
+        if self.character.eligibility is self:
+            self.character.eligibility = None
+
+    # ------------------------- Queries -------------------------
+    def is_available(self, index: int) -> bool:
+        return self.unmet[index] == 0
+
+    def names(self) -> List[str]:
+        """Available perk names in tree order."""
+        return [self.character.tree.perk_names[i] for i in sorted(self.available)]
+
+    def changes(self) -> Tuple[Set[int], Set[int]]:
+        """(opened, closed) perk indices since the last call; cost is their size."""
+        added, removed = self._added, self._removed
+        self._added, self._removed = set(), set()
+        return added, removed
+
+    # ------------------------- Updates -------------------------
+    def _adjust(self, perks: List[int], delta: int):
+        unmet = self.unmet
+        for i in perks:
+            before = unmet[i]
+            unmet[i] = before + delta
+            if before + delta == 0:
+                self._open(i)
+            elif before == 0:
+                self._close(i)
+
+    def _open(self, i: int):
+        self.available.add(i)
+        if i in self._removed:
+            self._removed.discard(i)
+        else:
+            self._added.add(i)
+
+    def _close(self, i: int):
+        self.available.discard(i)
+        if i in self._added:
+            self._added.discard(i)
+        else:
+            self._removed.add(i)
+
+    def _crossed(self, thresholds: Dict[int, List[int]], old: int, new: int):
+        # Requirement r is met when value >= r, so moving old -> new flips
+        # every bucket in (old, new] one way or the other
+        low, high, delta = (old, new, -1) if new > old else (new, old, 1)
+        if high - low <= len(thresholds):
+            for value in range(low + 1, high + 1):
+                perks = thresholds.get(value)
+                if perks:
+                    self._adjust(perks, delta)
+        else:
+            for value, perks in thresholds.items():
+                if low < value <= high:
+                    self._adjust(perks, delta)
+
+    def level_changed(self, old: int, new: int):
+        self._crossed(self.buckets.by_level, old, new)
+
+    def attribute_changed(self, attribute: int, old: int, new: int):
+        self._crossed(self.buckets.by_attribute[attribute], old, new)
+
+    def rank_changed(self, index: int, old: int, new: int):
+        if (old >= 1) != (new >= 1):
+            self._adjust(self.buckets.dependents[index], -1 if new >= 1 else 1)
+        top = self.buckets.max_rank[index]
+        if (old >= top) != (new >= top):
+            self._adjust((index,), 1 if new >= top else -1)
+
+
+# ------------------------- Benchmark -------------------------
+#
+# Default run (10k characters x 20 changes, a query after each): scan ~47-51
+# us/query, index ~2.4-3.5 us/query, ~14-20x. The ~50x first measured for
+# the index predates can_take's switch to plain rule tuples, which made
+# the scan itself about 5x cheaper; what remains of an index query is the
+# cost of the sheet change that precedes it.
+def full_scan(character: Character) -> Set[int]:
+    """Reference answer: ask can_take about every perk."""
+    return {i for i in range(len(character.tree)) if character.can_take(i)}
+
+
+if __name__ == "__main__":
+    import argparse
+    import shutil
+    import tempfile
+
+    from perks import load_tree, synthetic_roster
+
+    parser = argparse.ArgumentParser(description="Eligibility index vs a can_take scan per query")
+    parser.add_argument('--characters', type=int, default=10000)
+    parser.add_argument('--trees', type=int, default=20, help='distinct perk trees to share')
+    parser.add_argument('--perks-per-attribute', type=int, default=10)
+    parser.add_argument('--steps', type=int, default=20, help='sheet changes per character')
+    parser.add_argument('--check', action='store_true', help='compare every answer to the scan')
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix='arrow_roster_')
+    try:
+        paths = synthetic_roster(folder, args.trees, args.perks_per_attribute)
+        trees = [load_tree(path) for path in paths]
+    finally:
+        shutil.rmtree(folder)
+
+    # One scripted session per character: level ups, attribute points and
+    # perk picks, each followed by a "what can I take now?" query
+    rng = np.random.default_rng(0)
+    scripts = [(int(rng.integers(len(trees))), rng.integers(0, 3, args.steps),
+                rng.integers(0, len(SPECIAL), args.steps), rng.random(args.steps))
+               for _ in range(args.characters)]
+
+    def cast(use_index):
+        # Building a sheet (~70 Perk objects) costs more than its 20 queries;
+        # it is setup, so it stays outside the timed loop on both sides
+        characters = [Character(trees[script[0]]) for script in scripts]
+        return [(character, EligibilityIndex(character) if use_index else None)
+                for character in characters]
+
+    def play(use_index, cast):
+        answers = 0
+        mismatches = 0
+        for (character, index), (_, actions, attributes, picks) in zip(cast, scripts):
+            for action, attribute, pick in zip(actions, attributes, picks):
+                if action == 0:
+                    character.level += 1
+                elif action == 1:
+                    character.special[SPECIAL[attribute]].increase()
+                else:
+                    available = sorted(index.available if use_index else full_scan(character))
+                    if available:
+                        chosen = available[int(pick * len(available))]
+                        character.set_rank(chosen, int(character.ranks[chosen]) + 1)
+                if use_index:
+                    index.changes()
+                    answers += len(index.available)
+                    if args.check and index.available != full_scan(character):
+                        mismatches += 1
+                else:
+                    answers += len(full_scan(character))
+        return answers, mismatches
+
+    results = {}
+    for label, use_index in (('can_take scan', False), ('eligibility index', True)):
+        sheets = cast(use_index)
+        start = time.perf_counter()
+        answers, mismatches = play(use_index, sheets)
+        elapsed = time.perf_counter() - start
+        results[label] = (elapsed, answers)
+        queries = args.characters * args.steps
+        print(f"{label:>18}: {queries} queries in {elapsed * 1000:7.0f} ms "
+              f"({elapsed / queries * 1e6:5.1f} us each)"
+              + (f", {mismatches} mismatches" if args.check and use_index else ""))
+    scan, index = results['can_take scan'], results['eligibility index']
+    assert scan[1] == index[1], "index and scan disagree"
+    print(f"{'speedup':>18}: {scan[0] / index[0]:.1f}x")
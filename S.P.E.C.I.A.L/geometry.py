@@ -0,0 +1,285 @@
+"""
+ARROW: Static geometry builder
+Streets and lampposts baked into one indexed vertex buffer, buildings drawn as instanced boxes
+"""
+
+import time
+
+import numpy as np
+
+# ============================================
+# 1. VERTEX FORMAT
+# ============================================
+
+# 20 bytes per vertex: float position, normal and color packed into bytes
+# (normal decoded in the shader as n * 2.0 - 1.0)
+VERTEX = np.dtype([
+    ('position', '<f4', 3),
+    ('normal', 'u1', 4),
+    ('color', 'u1', 4),
+])
+VERTEX_FORMAT = '3f 3f1 1x 3f1 1x'
+VERTEX_ATTRIBUTES = ('in_position', 'in_normal', 'in_color')
+
+ASPHALT = (0.12, 0.12, 0.13)
+LAMP_POLE = (0.18, 0.2, 0.2)
+LAMP_HEAD = (1.0, 0.85, 0.45)
+
+UP = np.array([0.0, 1.0, 0.0])
+
+
+def _pack_unit(values):
+    """[-1, 1] -> unsigned byte"""
+    return np.rint((np.asarray(values) * 0.5 + 0.5) * 255.0).astype('u1')
+
+
+def _pack_color(values):
+    """[0, 1] -> unsigned byte"""
+    return np.rint(np.clip(values, 0.0, 1.0) * 255.0).astype('u1')
+
+
+def _vertices(positions, normals, colors):
+    count = len(positions)
+    out = np.empty(count, VERTEX)
+    out['position'] = positions
+    out['normal'][:, :3] = _pack_unit(normals)
+    out['normal'][:, 3] = 0
+    out['color'][:, :3] = _pack_color(colors)
+    out['color'][:, 3] = 255
+    return out
+
+
+def _quad_indices(quads, base=0):
+    """Two counter-clockwise triangles per quad of four consecutive vertices"""
+    corners = np.array([0, 1, 2, 0, 2, 3], dtype=np.int64)
+    starts = base + np.arange(quads, dtype=np.int64)[:, None] * 4
+    return (starts + corners).ravel()
+
+
+# ============================================
+# 2. PRIMITIVES (VECTORIZED)
+# ============================================
+
+def _box_template():
+    """Unit cube as six outward-facing quads: corners (6, 4, 3) and normals (6, 3)"""
+    normals = np.array([
+        [1, 0, 0], [-1, 0, 0], [0, 1, 0], [0, -1, 0], [0, 0, 1], [0, 0, -1]
+    ], dtype=np.float64)
+    corners = np.empty((6, 4, 3))
+    for face, n in enumerate(normals):
+        # Pick u, v with u x v = n so the quad winds counter-clockwise from outside
+        u = np.abs(np.roll(n, 1))
+        v = np.cross(n, u)
+        center = n * 0.5
+        corners[face] = [
+            center - 0.5 * u - 0.5 * v,
+            center + 0.5 * u - 0.5 * v,
+            center + 0.5 * u + 0.5 * v,
+            center - 0.5 * u + 0.5 * v,
+        ]
+    return corners, normals
+
+
+BOX_CORNERS, BOX_NORMALS = _box_template()
+
+
+def boxes(centers, sizes, colors):
+    """Axis-aligned boxes -> (positions, normals, colors) with 24 vertices each"""
+    centers = np.asarray(centers, dtype=np.float64)
+    sizes = np.asarray(sizes, dtype=np.float64)
+    count = len(centers)
+    positions = centers[:, None, None, :] + BOX_CORNERS[None] * sizes[:, None, None, :]
+    normals = np.broadcast_to(BOX_NORMALS[None, :, None, :], (count, 6, 4, 3))
+    colors = np.broadcast_to(np.asarray(colors, dtype=np.float64).reshape(-1, 1, 1, 3),
+                             (count, 6, 4, 3))
+    return positions.reshape(-1, 3), normals.reshape(-1, 3), colors.reshape(-1, 3)
+
+
+def street_segments(streets):
+    """StarlingCity.streets dicts -> (N, 2, 3) array of start/end points"""
+    return np.array([(s['start'], s['end']) for s in streets], dtype=np.float64).reshape(-1, 2, 3)
+
+
+def road_quads(segments, width=4.0, color=ASPHALT):
+    """One flat quad per street segment"""
+    start, end = segments[:, 0], segments[:, 1]
+    direction = end - start
+    direction /= np.linalg.norm(direction, axis=1, keepdims=True)
+    side = np.cross(UP, direction) * (width / 2.0)
+    positions = np.stack([start - side, end - side, end + side, start + side], axis=1)
+    normals = np.broadcast_to(UP, positions.shape)
+    colors = np.broadcast_to(color, positions.shape)
+    return positions.reshape(-1, 3), normals.reshape(-1, 3), colors.reshape(-1, 3)
+
+
+def place_lampposts(segments, spacing=15.0, width=4.0, rng=None):
+    """Lamppost feet along every segment, alternating kerbs, mid-block -> (M, 3)"""
+    start, end = segments[:, 0], segments[:, 1]
+    direction = end - start
+    length = np.linalg.norm(direction, axis=1)
+    direction /= length[:, None]
+    side = np.cross(UP, direction)
+
+    per_segment = np.maximum((length // spacing).astype(np.int64), 0)
+    owner = np.repeat(np.arange(len(segments)), per_segment)
+    slot = np.arange(len(owner)) - np.repeat(np.cumsum(per_segment) - per_segment, per_segment)
+
+    along = (slot + 0.5) * spacing
+    if rng is not None:
+        along += rng.uniform(-0.15, 0.15, len(along)) * spacing
+    kerb = np.where(slot % 2 == 0, 1.0, -1.0) * (width / 2.0 + 0.6)
+    feet = start[owner] + direction[owner] * along[:, None] + side[owner] * kerb[:, None]
+    feet[:, 1] = 0.0
+    return feet
+
+
+def lamppost_boxes(feet, height=4.5):
+    """Pole plus lamp head per lamppost"""
+    count = len(feet)
+    poles = feet + [0.0, height / 2.0, 0.0]
+    heads = feet + [0.0, height + 0.1, 0.0]
+    centers = np.concatenate([poles, heads])
+    sizes = np.concatenate([np.tile([0.15, height, 0.15], (count, 1)),
+                            np.tile([0.6, 0.2, 0.6], (count, 1))])
+    colors = np.concatenate([np.tile(LAMP_POLE, (count, 1)), np.tile(LAMP_HEAD, (count, 1))])
+    return boxes(centers, sizes, colors)
+
+
+# ============================================
+# 3. MERGED STATIC MESH
+# ============================================
+
+class StaticMesh:
+    """All static street furniture in one vertex buffer + one index buffer"""
+
+    def __init__(self, vertices, indices, part_ends=None):
+        self.vertices = vertices
+        index_type = 'u2' if len(vertices) <= 0xFFFF else 'u4'
+        self.indices = indices.astype(index_type)
+        self.part_ends = part_ends or [len(indices)]  # index count through each part
+        self.vao = None
+
+    @classmethod
+    def build(cls, parts):
+        """Merge (positions, normals, colors) quad soups into one mesh"""
+        soups = [_vertices(*part) for part in parts]
+        vertices = np.concatenate(soups)
+        indices = _quad_indices(len(vertices) // 4)
+        part_ends = np.cumsum([len(soup) // 4 * 6 for soup in soups]).tolist()
+        return cls(vertices, indices, part_ends)
+
+    def upload(self, ctx, prog):
+        """Create GPU buffers once; the mesh is immutable afterwards"""
+        self.vbo = ctx.buffer(self.vertices.tobytes())
+        self.ibo = ctx.buffer(self.indices.tobytes())
+        self.vao = ctx.vertex_array(
+            prog, [(self.vbo, VERTEX_FORMAT, *VERTEX_ATTRIBUTES)],
+            self.ibo, index_element_size=self.indices.itemsize
+        )
+        return self
+
+    def render(self, parts=None):
+        """Single draw call; parts=n draws only the first n parts"""
+        if self.vao is not None:
+            if parts is None or parts >= len(self.part_ends):
+                self.vao.render()
+            else:
+                self.vao.render(vertices=self.part_ends[parts - 1])
+
+    @property
+    def nbytes(self):
+        return self.vertices.nbytes + self.indices.nbytes
+
+
+def build_street_mesh(streets, lampposts, road_width=4.0):
+    """Road quads for every street and boxes for every lamppost, merged"""
+    segments = street_segments(streets)
+    feet = np.asarray(lampposts, dtype=np.float64).reshape(-1, 3)
+    return StaticMesh.build([road_quads(segments, road_width), lamppost_boxes(feet)])
+
+
+# ============================================
+# 4. INSTANCED BOXES
+# ============================================
+#
+# Buildings are boxes that differ only in where, how big and what colour, so
+# they share one unit cube and a per-instance buffer. Each frame only the
+# instances that survived culling are packed to the front of that buffer and
+# drawn in one call; the upload is skipped when the visible set is unchanged.
+
+INSTANCE = np.dtype([
+    ('center', '<f4', 3),
+    ('size', '<f4', 3),
+    ('tint', '<f4', 3),
+])
+INSTANCE_FORMAT = '3f 3f 3f/i'
+INSTANCE_ATTRIBUTES = ('in_center', 'in_size', 'in_tint')
+
+
+class BoxInstances:
+    """Axis-aligned boxes sharing one unit cube; draws any subset in one call"""
+
+    def __init__(self, centers, sizes, colors):
+        self.instances = np.empty(len(centers), INSTANCE)
+        self.instances['center'] = centers
+        self.instances['size'] = sizes
+        self.instances['tint'] = colors
+        self.cube = _vertices(*boxes([(0.0, 0.0, 0.0)], [(1.0, 1.0, 1.0)], [(1.0, 1.0, 1.0)]))
+        self.cube_indices = _quad_indices(6).astype('u2')
+        self.drawn = len(centers)
+        self.vao = None
+        self._visible = None
+
+    @classmethod
+    def from_buildings(cls, buildings):
+        """StarlingCity.buildings dicts, in list order"""
+        return cls(np.array([b['pos'] for b in buildings], dtype=np.float64).reshape(-1, 3),
+                   np.array([b['scale'] for b in buildings], dtype=np.float64).reshape(-1, 3),
+                   np.array([b['color'] for b in buildings], dtype=np.float64).reshape(-1, 3))
+
+    def upload(self, ctx, prog):
+        self.vbo = ctx.buffer(self.cube.tobytes())
+        self.ibo = ctx.buffer(self.cube_indices.tobytes())
+        self.instance_buffer = ctx.buffer(self.instances.tobytes(), dynamic=True)
+        self.vao = ctx.vertex_array(
+            prog, [(self.vbo, VERTEX_FORMAT, *VERTEX_ATTRIBUTES),
+                   (self.instance_buffer, INSTANCE_FORMAT, *INSTANCE_ATTRIBUTES)],
+            self.ibo, index_element_size=self.cube_indices.itemsize
+        )
+        return self
+
+    def render(self, visible=None):
+        """visible: boolean mask over the instances (None draws them all)"""
+        if self.vao is None:
+            return
+        if visible is None:
+            visible = np.ones(len(self.instances), dtype=bool)
+        if self._visible is None or not np.array_equal(visible, self._visible):
+            packed = self.instances[visible]
+            self.instance_buffer.write(packed.tobytes())
+            self.drawn = len(packed)
+            self._visible = visible.copy()
+        if self.drawn:
+            self.vao.render(instances=self.drawn)
+
+
+# ============================================
+# 5. BENCHMARK
+# ============================================
+
+if __name__ == "__main__":
+    for scale in (1, 10):
+        # Same 15-unit grid as StarlingCity, over a scale x wider area
+        extent = 100 * scale
+        streets = []
+        for i in range(-extent, extent, 15):
+            streets.append({'start': (i, 0.1, -extent), 'end': (i, 0.1, extent)})
+            streets.append({'start': (-extent, 0.1, i), 'end': (extent, 0.1, i)})
+
+        start = time.perf_counter()
+        feet = place_lampposts(street_segments(streets), rng=np.random.default_rng(0))
+        mesh = build_street_mesh(streets, feet)
+        elapsed = time.perf_counter() - start
+        print(f"{scale:>3}x grid: {len(streets)} streets, {len(feet)} lampposts, "
+              f"{len(mesh.vertices)} vertices, {mesh.nbytes / 1e6:.2f} MB, "
+              f"{elapsed * 1000:.1f} ms")
@@ -0,0 +1,240 @@
+"""
+ARROW: Quality governor
+Holds the frame-time budget by stepping draw distance, detail, buildings, trails and NPC rate
+"""
+
+import json
+import time
+from collections import deque
+
+import numpy as np
+
+# ============================================
+# 1. QUALITY LADDER
+# ============================================
+#
+# Settings move together along one ladder, best first, so the governor only
+# ever decides "one step cheaper" or "one step richer" and the knobs cannot
+# fight each other:
+#
+#   far_plane     projection far plane (draw distance), world units
+#   detail        0: roads and lampposts, 1: roads only
+#   max_trails    arrows whose trails are drawn, newest first
+#   crowd_stride  NPC steering runs every n-th tick (with n x dt)
+#   building_range  buildings further than this from the player (ground
+#                 distance) are not drawn; the shipped city lies within ~100
+#                 of the streets, so rungs below the top thin it out well
+#                 before the far plane cuts the streets
+
+class Quality:
+    """One rung of the ladder"""
+
+    __slots__ = ('far_plane', 'detail', 'max_trails', 'crowd_stride', 'building_range')
+
+    def __init__(self, far_plane, detail, max_trails, crowd_stride, building_range):
+        self.far_plane = far_plane
+        self.detail = detail
+        self.max_trails = max_trails
+        self.crowd_stride = crowd_stride
+        self.building_range = building_range
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return (f"far {self.far_plane:.0f}, detail {self.detail}, "
+                f"buildings within {self.building_range:.0f}, "
+                f"{self.max_trails} trails, crowd every {self.crowd_stride} tick(s)")
+
+
+LADDER = (
+    Quality(500.0, 0, 256, 1, 500.0),
+    Quality(350.0, 0, 192, 1, 120.0),
+    Quality(250.0, 1, 128, 2, 90.0),
+    Quality(180.0, 1, 64, 3, 70.0),
+    Quality(120.0, 1, 32, 4, 50.0),
+)
+
+
+# ============================================
+# 2. GOVERNOR (HYSTERESIS)
+# ============================================
+#
+# Frame costs go into a rolling window. The governor steps down when the
+# window's p90 is over budget * over, and steps back up only when it has
+# been under budget * under for a longer stretch - the gap between the two
+# thresholds and the two patience counts is the hysteresis. After any change
+# it waits `settle` frames (and clears the window) so the next decision sees
+# the new settings, not the old ones. A step up that has to be taken back
+# within `probation` frames doubles the patience before that rung is tried
+# again, so a rung that is just too heavy is probed ever more rarely instead
+# of flickering in and out.
+#
+# Before stepping up it also predicts the richer rung's p90: each move's
+# trigger p90 against the first full window after it gives the cost ratio
+# of the two rungs, and a raise whose predicted p90 (current p90 x ratio)
+# would not stay under budget * headroom is not attempted at all. Rungs
+# never tried yet are probed as before.
+
+class QualityGovernor:
+    """Watches frame times and picks a rung of the quality ladder"""
+
+    def __init__(self, budget_ms=1000.0 / 60, ladder=LADDER, window=60, over=1.0, under=0.75,
+                 down_after=20, up_after=180, settle=30, probation=300, headroom=0.9, start=0,
+                 crowd=True, log=print):
+        self.budget_ms = budget_ms
+        self.ladder = ladder
+        self.over = over
+        self.under = under
+        self.down_after = down_after  # frames over budget before stepping down
+        self.up_after = up_after      # frames with headroom before stepping up
+        self.settle = settle
+        self.probation = probation
+        self.headroom = headroom
+        self.crowd = crowd            # False pins crowd_stride at 1 (recording, replays)
+        self.log = log
+        self.level = start
+        self.frames = 0
+        self.samples = deque(maxlen=window)
+        self.history = []             # (frame, from level, to level, p90 ms)
+        self._over_run = 0
+        self._under_run = 0
+        self._settle_until = 0
+        self._backoff = [1] * len(ladder)   # up_after multiplier per rung
+        self._raised_at = None               # frame of the last step up
+        self._step_cost = [None] * (len(ladder) - 1)  # p90 of rung i / p90 of rung i + 1
+        self._measuring = None               # (previous level, its p90) until the new rung is measured
+
+    @property
+    def quality(self):
+        rung = self.ladder[self.level]
+        if not self.crowd and rung.crowd_stride != 1:
+            rung = Quality(rung.far_plane, rung.detail, rung.max_trails, 1, rung.building_range)
+        return rung
+
+    def observe(self, frame_ms):
+        """Add one frame's cost; returns the new Quality if it changed, else None"""
+        self.frames += 1
+        self.samples.append(frame_ms)
+        if self.frames < self._settle_until or len(self.samples) < self.samples.maxlen // 2:
+            return None
+        p90 = float(np.percentile(np.fromiter(self.samples, float), 90))
+        if self._measuring is not None:
+            level, before = self._measuring
+            self._measuring = None
+            richer = min(level, self.level)
+            if level < self.level:
+                self._step_cost[richer] = before / max(p90, 1e-6)
+            else:
+                self._step_cost[richer] = p90 / max(before, 1e-6)
+        if p90 > self.budget_ms * self.over:
+            self._over_run += 1
+            self._under_run = 0
+        elif p90 < self.budget_ms * self.under:
+            self._under_run += 1
+            self._over_run = 0
+        else:
+            self._over_run = self._under_run = 0
+
+        if self._over_run >= self.down_after and self.level < len(self.ladder) - 1:
+            return self._move(self.level + 1, p90)
+        if self.level > 0 and self._under_run >= self.up_after * self._backoff[self.level - 1]:
+            ratio = self._step_cost[self.level - 1]
+            if ratio is not None and p90 * ratio >= self.budget_ms * self.headroom:
+                self._under_run = 0   # the richer rung would not fit yet; look again later
+                return None
+            return self._move(self.level - 1, p90)
+        return None
+
+    def _move(self, level, p90):
+        self.history.append((self.frames, self.level, level, p90))
+        if level > self.level:
+            if self._raised_at is not None and self.frames - self._raised_at < self.probation:
+                self._backoff[self.level] *= 2
+            self._raised_at = None
+        else:
+            if self._raised_at is not None:
+                self._backoff[self.level] = 1   # the last raise held up
+            self._raised_at = self.frames
+        if self.log:
+            verb = 'lowering' if level > self.level else 'raising'
+            self.log(f"[governor] frame {self.frames}: p90 {p90:.1f} ms vs {self.budget_ms:.1f} ms "
+                     f"budget, {verb} quality to {level}: {self.ladder[level]!r}")
+        self._measuring = (self.level, p90)
+        self.level = level
+        self.samples.clear()
+        self._over_run = self._under_run = 0
+        self._settle_until = self.frames + self.settle
+        return self.quality
+
+    def report(self):
+        return {
+            'budget_ms': self.budget_ms,
+            'level': self.level,
+            'quality': self.quality.as_dict(),
+            'changes': len(self.history),
+            'history': [{'frame': f, 'from': a, 'to': b, 'p90_ms': round(p, 2)}
+                        for f, a, b, p in self.history],
+        }
+
+
+# ============================================
+# 3. WORKLOADS
+# ============================================
+
+def trace_frame_times(path):
+    """Frame costs (ms) from a Chrome trace dumped by FrameProfiler"""
+    with open(path) as f:
+        events = json.load(f)['traceEvents']
+    return [e['dur'] / 1000.0 for e in sorted(events, key=lambda e: e['ts']) if e['name'] == 'frame']
+
+
+def synthetic_cost(quality, load, rng):
+    """Frame cost model: render scales with draw distance and detail, plus buildings, trails and NPCs"""
+    render = 7.5 * (quality.far_plane / 500.0) ** 2 * (1.0 if quality.detail == 0 else 0.7)
+    # From the streets every building is within ~100 units; inside that the
+    # number drawn grows with the range's area (60: about 2/3 of them)
+    buildings = 1.5 * min(quality.building_range / 100.0, 1.0) ** 2
+    trails = 0.01 * quality.max_trails
+    crowd = 4.0 / quality.crowd_stride
+    return (render + buildings + trails + crowd) * load * rng.lognormal(0.0, 0.08)
+
+
+# ============================================
+# 4. BENCHMARK
+# ============================================
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Drive the governor with a synthetic load or a recorded trace")
+    parser.add_argument('--trace', help='Chrome trace from the profiler (F4 / --slow-frame-ms)')
+    parser.add_argument('--budget-ms', type=float, default=1000.0 / 60)
+    parser.add_argument('--frames', type=int, default=3600)
+    args = parser.parse_args()
+
+    governor = QualityGovernor(args.budget_ms)
+    if args.trace:
+        # Recorded costs do not react to the governor - this shows its decisions only
+        for frame_ms in trace_frame_times(args.trace):
+            governor.observe(frame_ms)
+    else:
+        # A weak machine: fine at first, a heavy firefight, then calm again
+        rng = np.random.default_rng(0)
+        costs = []
+        start = time.perf_counter()
+        for frame in range(args.frames):
+            load = 0.9 if frame < args.frames // 4 else 1.9 if frame < args.frames // 2 else 1.0
+            cost = synthetic_cost(governor.quality, load, rng)
+            costs.append(cost)
+            governor.observe(cost)
+        elapsed = time.perf_counter() - start
+        costs = np.array(costs)
+        for name, part in (('first quarter', costs[:args.frames // 4]),
+                           ('firefight', costs[args.frames // 4:args.frames // 2]),
+                           ('after', costs[args.frames // 2:])):
+            over = (part > args.budget_ms).mean() * 100
+            print(f"{name:>14}: p50 {np.percentile(part, 50):5.1f} ms, p90 {np.percentile(part, 90):5.1f} ms, "
+                  f"{over:4.1f}% of frames over budget")
+        print(f"governor overhead: {elapsed / args.frames * 1e6:.0f} us/frame (incl. cost model)")
+    print(json.dumps(governor.report(), indent=2))
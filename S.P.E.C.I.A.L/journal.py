@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+S.P.E.C.I.A.L. change journal
+Undo, redo, time travel and what-if branches for character sheets
+"""
+
+import struct
+import time
+from typing import List, Optional, Tuple
+
+from perks import SPECIAL, Character
+
+# ------------------------- Journal Layout -------------------------
+#
+# Changes are nodes in a persistent tree: each holds one invertible delta and
+# a pointer to the state before it. Nodes are never modified, so any number
+# of journals (branches) can point into the same history and share it.
+#
+#   delta    : (kind, key, old, new, points before, points after)
+#              kind LEVEL, RANK (key = perk index) or SPECIAL (key = attribute)
+#   snapshot : every SNAPSHOT_EVERY nodes, the whole sheet in compact form -
+#              level/points header, 7 attribute bytes, then one bytes object
+#              of perk ranks per attribute. Attributes whose ranks did not
+#              change reuse the previous snapshot's bytes object, so sheets
+#              share structure between snapshots as well as between branches.
+#
+# Undo and redo apply one delta, O(1). Restoring an arbitrary node costs one
+# snapshot plus at most SNAPSHOT_EVERY deltas.
+
+LEVEL, RANK, SPECIAL_VALUE = 0, 1, 2
+SNAPSHOT_EVERY = 32
+SNAPSHOT_HEADER = struct.Struct('<HH')     # level, perk points
+
+
+class Node:
+    """One change, and the history before it."""
+    __slots__ = ('parent', 'delta', 'depth', 'level', 'snapshot')
+
+    def __init__(self, parent: Optional['Node'], delta: Optional[Tuple], level: int, snapshot=None):
+        self.parent = parent
+        self.delta = delta
+        self.depth = parent.depth + 1 if parent else 0
+        self.level = level              # character level after this change
+        self.snapshot = snapshot
+
+
+def _snapshot(character: Character, previous: Optional[Tuple]) -> Tuple:
+    chunks = []
+    for a, (first, last) in enumerate(character.tree.attribute_slices):
+        chunk = character.ranks[first:last].tobytes()
+        if previous is not None and previous[1][a] == chunk:
+            chunk = previous[1][a]
+        chunks.append(chunk)
+    header = SNAPSHOT_HEADER.pack(character.level, character.perk_points) + \
+        bytes(character.special[short].value for short in SPECIAL)
+    return header, tuple(chunks)
+
+
+def _nearest_snapshot(node: Node) -> Optional[Tuple]:
+    while node is not None and node.snapshot is None:
+        node = node.parent
+    return node.snapshot if node is not None else None
+
+
+# ------------------------- Journal Class -------------------------
+class Journal:
+    """A character plus its position in a shared change history.
+
+    Edits made through the journal (level_up, assign, increase) are recorded;
+    edits made on the character directly are not.
+    """
+
+    def __init__(self, character: Character, head: Optional[Node] = None):
+        self.character = character
+        if head is None:
+            head = Node(None, None, character.level, _snapshot(character, None))
+        self.head = head
+        self.redo_stack: List[Node] = []
+
+    # ------------------------- Recording -------------------------
+    def _record(self, delta: Tuple):
+        head = self.head
+        snapshot = None
+        if (head.depth + 1) % SNAPSHOT_EVERY == 0:
+            snapshot = _snapshot(self.character, _nearest_snapshot(head))
+        self.head = Node(head, delta, self.character.level, snapshot)
+        self.redo_stack.clear()
+
+    def level_up(self):
+        character = self.character
+        points = character.perk_points
+        character.gain_level()
+        self._record((LEVEL, 0, character.level - 1, character.level, points, character.perk_points))
+
+    def assign(self, index: int) -> bool:
+        character = self.character
+        rank, points = int(character.ranks[index]), character.perk_points
+        if not character.spend_on_perk(index):
+            return False
+        self._record((RANK, index, rank, rank + 1, points, character.perk_points))
+        return True
+
+    def increase(self, short: str) -> bool:
+        character = self.character
+        value, points = character.special[short].value, character.perk_points
+        if not character.spend_on_attribute(short):
+            return False
+        self._record((SPECIAL_VALUE, SPECIAL.index(short), value, value + 1, points, character.perk_points))
+        return True
+
+    # ------------------------- Moving -------------------------
+    def _apply(self, delta: Tuple, forward: bool):
+        kind, key, old, new, points_before, points_after = delta
+        value = new if forward else old
+        character = self.character
+        if kind == LEVEL:
+            character.level = value
+        elif kind == RANK:
+            character.set_rank(key, value)
+        else:
+            character.special[SPECIAL[key]].value = value
+        character.perk_points = points_after if forward else points_before
+
+    def undo(self) -> bool:
+        if self.head.delta is None:
+            return False
+        self._apply(self.head.delta, False)
+        self.redo_stack.append(self.head)
+        self.head = self.head.parent
+        return True
+
+    def redo(self) -> bool:
+        if not self.redo_stack:
+            return False
+        node = self.redo_stack.pop()
+        self._apply(node.delta, True)
+        self.head = node
+        return True
+
+    def _restore(self, node: Node):
+        """Put the character in node's state: nearest snapshot, then its deltas."""
+        path = []
+        base = node
+        while base.snapshot is None:
+            path.append(base)
+            base = base.parent
+        header, chunks = base.snapshot
+        character = self.character
+        level, points = SNAPSHOT_HEADER.unpack_from(header)
+        character.level = level
+        for a, short in enumerate(SPECIAL):
+            character.special[short].value = header[SNAPSHOT_HEADER.size + a]
+        for (first, last), chunk in zip(character.tree.attribute_slices, chunks):
+            for index, rank in zip(range(first, last), chunk):
+                if character.ranks[index] != rank:
+                    character.set_rank(index, rank)
+        character.perk_points = points
+        for step in reversed(path):
+            self._apply(step.delta, True)
+        self.head = node
+
+    def goto_level(self, level: int) -> bool:
+        """Move to the moment the character reached level, back or forward."""
+        if level >= self.head.level:
+            while self.head.level < level and self.redo():
+                pass
+            return self.head.level == level
+        # The node where level was reached is the first one on the path at it
+        trail = []
+        node = self.head
+        while node.parent is not None and (node.level > level or node.parent.level == level):
+            trail.append(node)
+            node = node.parent
+        if node.level != level:
+            return False
+        if len(trail) <= SNAPSHOT_EVERY:
+            while self.head is not node:
+                self.undo()
+        else:
+            self.redo_stack.extend(trail)
+            self._restore(node)
+        return True
+
+    def branch(self) -> 'Journal':
+        """A what-if copy: new character at this state, sharing all history."""
+        character = Character(self.character.tree)
+        journal = Journal(character, self.head)
+        journal._restore(self.head)
+        return journal
+
+    def __len__(self):
+        return self.head.depth
+
+
+# ------------------------- Benchmark -------------------------
+if __name__ == "__main__":
+    import argparse
+    import copy
+    import tracemalloc
+
+    import numpy as np
+
+    parser = argparse.ArgumentParser(description="Journal memory and undo/redo/branch cost")
+    parser.add_argument('character', nargs='?', default='Oliver Queen')
+    parser.add_argument('--characters', type=int, default=1000)
+    parser.add_argument('--ops', type=int, default=200, help='edits per character')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    base = Character.load(args.character)
+    perks = len(base.tree)
+
+    def play(journal, script):
+        for kind, target in script:
+            if kind == 0:
+                journal.level_up()
+            elif kind == 1:
+                journal.assign(target)
+            else:
+                journal.increase(SPECIAL[target % len(SPECIAL)])
+
+    scripts = [list(zip(rng.integers(0, 3, args.ops).tolist(), rng.integers(0, perks, args.ops).tolist()))
+               for _ in range(args.characters)]
+    tracemalloc.start()
+    characters = [Character(base.tree) for _ in range(args.characters)]
+    before = tracemalloc.get_traced_memory()[0]
+    journals = [Journal(c) for c in characters]
+    start = time.perf_counter()
+    for journal, script in zip(journals, scripts):
+        play(journal, script)
+    record_seconds = time.perf_counter() - start
+    journal_bytes = tracemalloc.get_traced_memory()[0] - before
+    recorded = sum(len(j) for j in journals)
+    tracemalloc.stop()
+
+    # What deepcopy-per-action would cost, measured on a sample
+    sample = Character(base.tree)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    copies = [copy.deepcopy(sample) for _ in range(100)]
+    deepcopy_bytes = (tracemalloc.get_traced_memory()[0] - before) / 100
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    undone = sum(j.undo() for j in journals for _ in range(50))
+    redone = sum(j.redo() for j in journals for _ in range(50))
+    undo_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    jumps = sum(j.goto_level(max(1, j.character.level // 2)) for j in journals)
+    goto_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    branches = [j.branch() for j in journals]
+    branch_seconds = time.perf_counter() - start
+
+    print(f"{args.characters} characters, {recorded} recorded changes in {record_seconds * 1000:.0f} ms")
+    print(f"journal memory: {journal_bytes / recorded * 1000 / 1024:.1f} KB per 1,000 changes "
+          f"(deepcopy per change: {deepcopy_bytes * 1000 / 1024:.0f} KB)")
+    print(f"undo + redo: {(undo_seconds / (undone + redone)) * 1e6:.1f} us each")
+    print(f"goto level: {goto_seconds / max(jumps, 1) * 1e6:.0f} us each, "
+          f"branch: {branch_seconds / len(branches) * 1e6:.0f} us each")
@@ -0,0 +1,537 @@
+"""
+ARROW: Navigation
+Walkability grid baked from building footprints + cached hierarchical pathfinding
+"""
+
+import heapq
+import math
+import time
+from collections import OrderedDict, defaultdict
+
+import numpy as np
+
+SQRT2 = math.sqrt(2.0)
+INF = np.inf
+
+# (dz, dx, cost) - 8-connected, no corner cutting
+MOVES = [(-1, 0, 1.0), (1, 0, 1.0), (0, -1, 1.0), (0, 1, 1.0),
+         (-1, -1, SQRT2), (-1, 1, SQRT2), (1, -1, SQRT2), (1, 1, SQRT2)]
+
+
+# ============================================
+# 1. WALKABILITY GRID
+# ============================================
+
+class NavGrid:
+    """Occupancy grid over the XZ plane; cell (row, col) = (z, x)"""
+
+    def __init__(self, bounds, cell_size=1.0, agent_radius=0.5):
+        (self.min_x, self.min_z), (max_x, max_z) = bounds
+        self.cell_size = cell_size
+        self.agent_radius = agent_radius
+        self.width = int(math.ceil((max_x - self.min_x) / cell_size))
+        self.height = int(math.ceil((max_z - self.min_z) / cell_size))
+        # How many footprints cover each cell; walkable where zero
+        self.coverage = np.zeros((self.height, self.width), dtype=np.int32)
+        self.walkable = np.ones((self.height, self.width), dtype=bool)
+
+    @classmethod
+    def from_buildings(cls, buildings, bounds, cell_size=1.0, agent_radius=0.5):
+        grid = cls(bounds, cell_size, agent_radius)
+        grid.add_footprints(buildings)
+        return grid
+
+    def footprint_cells(self, buildings):
+        """Building dicts -> (z0, x0, z1, x1) inclusive cell rectangles, inflated by agent radius"""
+        if not len(buildings):
+            return np.zeros((0, 4), dtype=np.int64)
+        pos = np.array([b['pos'] for b in buildings], dtype=np.float64)
+        scale = np.array([b['scale'] for b in buildings], dtype=np.float64)
+        half = scale[:, [0, 2]] / 2.0 + self.agent_radius
+        lo = (pos[:, [0, 2]] - half - (self.min_x, self.min_z)) / self.cell_size
+        hi = (pos[:, [0, 2]] + half - (self.min_x, self.min_z)) / self.cell_size
+        x0 = np.clip(np.floor(lo[:, 0]), 0, self.width - 1)
+        z0 = np.clip(np.floor(lo[:, 1]), 0, self.height - 1)
+        x1 = np.clip(np.ceil(hi[:, 0]) - 1, 0, self.width - 1)
+        z1 = np.clip(np.ceil(hi[:, 1]) - 1, 0, self.height - 1)
+        return np.stack([z0, x0, z1, x1], axis=1).astype(np.int64)
+
+    def _rasterize(self, rects, sign):
+        """Add/remove rectangles with a 2D difference array - O(cells in their bounding box)"""
+        top, left = rects[:, 0].min(), rects[:, 1].min()
+        bottom, right = rects[:, 2].max() + 1, rects[:, 3].max() + 1
+        diff = np.zeros((bottom - top + 1, right - left + 1), dtype=np.int32)
+        z0, x0, z1, x1 = (rects - (top, left, top, left)).T
+        np.add.at(diff, (z0, x0), sign)
+        np.add.at(diff, (z0, x1 + 1), -sign)
+        np.add.at(diff, (z1 + 1, x0), -sign)
+        np.add.at(diff, (z1 + 1, x1 + 1), sign)
+        box = np.s_[top:bottom, left:right]
+        self.coverage[box] += diff.cumsum(axis=0).cumsum(axis=1)[:-1, :-1]
+        np.equal(self.coverage[box], 0, out=self.walkable[box])
+
+    def add_footprints(self, buildings):
+        """Block the footprints; returns the touched cell rectangles"""
+        rects = self.footprint_cells(buildings)
+        if len(rects):
+            self._rasterize(rects, 1)
+        return rects
+
+    def remove_footprints(self, buildings):
+        rects = self.footprint_cells(buildings)
+        if len(rects):
+            self._rasterize(rects, -1)
+        return rects
+
+    def to_cell(self, x, z):
+        col = int((x - self.min_x) // self.cell_size)
+        row = int((z - self.min_z) // self.cell_size)
+        return min(max(row, 0), self.height - 1), min(max(col, 0), self.width - 1)
+
+    def to_world(self, cell):
+        row, col = cell
+        return (self.min_x + (col + 0.5) * self.cell_size,
+                self.min_z + (row + 0.5) * self.cell_size)
+
+
+# ============================================
+# 2. HIERARCHICAL PATHFINDING (HPA*)
+# ============================================
+
+class PathPlanner:
+    """HPA* over NavGrid clusters with an LRU cache of finished paths.
+
+    Border crossings between clusters ("entrances") form the abstract graph.
+    Distances inside a cluster are filled lazily, the first time a search
+    touches that cluster, with a vectorized wavefront over all of its
+    entrances at once, and kept until a repair dirties the cluster. A repair
+    relinks only the borders between dirty clusters.
+    """
+
+    def __init__(self, grid, cluster_size=16, cache_size=4096):
+        self.grid = grid
+        self.cluster_size = cluster_size
+        self.cache_size = cache_size
+        self.cache = OrderedDict()              # (start, goal) -> path or None
+        self._cache_clusters = defaultdict(set)  # cluster -> cache keys crossing it
+        self._fields = {}                        # cluster -> see _cluster_fields
+        self._edges = {}                         # entrance -> abstract edges, for built clusters
+        self.stats = {'queries': 0, 'cache_hits': 0, 'repairs': 0}
+        self._build_entrances()
+
+    # ---------- abstract graph ----------
+
+    def cluster_of(self, cell):
+        return cell[0] // self.cluster_size, cell[1] // self.cluster_size
+
+    def _border_runs(self, a, b):
+        """Transitions across one border orientation, given the walkable cells on each side"""
+        s = self.cluster_size
+        both = a & b
+        transitions = []
+        lines, length = both.shape
+        for line in range(lines):
+            open_ = np.concatenate([[False], both[line], [False]])
+            edges = np.flatnonzero(open_[1:] != open_[:-1])
+            for start, end in zip(edges[::2], edges[1::2]):
+                # Runs never straddle a cluster corner
+                while start < end:
+                    seg_end = min(end, (start // s + 1) * s)
+                    transitions.append((line, (start + seg_end - 1) // 2))
+                    start = seg_end
+        return transitions
+
+    def _build_entrances(self):
+        """Compute every entrance and inter-cluster edge from the walkable grid"""
+        walk = self.grid.walkable
+        s = self.cluster_size
+        self.cluster_entrances = defaultdict(list)
+        self.crossings = defaultdict(list)  # entrance cell -> [(cell across border, cost)]
+
+        # Vertical borders: columns s-1 | s, 2s-1 | 2s, ...
+        cols = np.arange(s, self.grid.width, s)
+        if len(cols):
+            for line, row in self._border_runs(walk[:, cols - 1].T, walk[:, cols].T):
+                self._link((row, int(cols[line]) - 1), (row, int(cols[line])))
+        # Horizontal borders
+        rows = np.arange(s, self.grid.height, s)
+        if len(rows):
+            for line, col in self._border_runs(walk[rows - 1], walk[rows]):
+                self._link((int(rows[line]) - 1, col), (int(rows[line]), col))
+
+    def _relink(self, dirty):
+        """Recompute the entrances on every border between two dirty clusters"""
+        walk = self.grid.walkable
+        s = self.cluster_size
+        borders = [(c, n) for c in dirty if c[0] * s < self.grid.height and c[1] * s < self.grid.width
+                   for n in ((c[0], c[1] + 1), (c[0] + 1, c[1]))
+                   if n in dirty and n[0] * s < self.grid.height and n[1] * s < self.grid.width]
+        for a, b in borders:
+            for here, there in ((a, b), (b, a)):
+                for cell in self.cluster_entrances.get(here, ()):
+                    self.crossings[cell] = [(other, cost) for other, cost in self.crossings[cell]
+                                            if self.cluster_of(other) != there]
+        for a, b in borders:
+            if a[0] == b[0]:
+                col, z0 = b[1] * s, a[0] * s
+                z1 = min(z0 + s, self.grid.height)
+                for _, row in self._border_runs(walk[z0:z1, col - 1][None], walk[z0:z1, col][None]):
+                    self._link((z0 + row, col - 1), (z0 + row, col))
+            else:
+                row, x0 = b[0] * s, a[1] * s
+                x1 = min(x0 + s, self.grid.width)
+                for _, col in self._border_runs(walk[row - 1, x0:x1][None], walk[row, x0:x1][None]):
+                    self._link((row - 1, x0 + col), (row, x0 + col))
+        # Cells whose last crossing went away stop being entrances
+        for cluster in dirty:
+            entrances = self.cluster_entrances.get(cluster)
+            if entrances is None:
+                continue
+            for cell in entrances:
+                if not self.crossings[cell]:
+                    del self.crossings[cell]
+            entrances[:] = [cell for cell in entrances if cell in self.crossings]
+
+    def _link(self, a, b):
+        a, b = (int(a[0]), int(a[1])), (int(b[0]), int(b[1]))
+        for cell in (a, b):
+            entrances = self.cluster_entrances[self.cluster_of(cell)]
+            if cell not in entrances:
+                entrances.append(cell)
+        self.crossings[a].append((b, 1.0))
+        self.crossings[b].append((a, 1.0))
+
+    # ---------- in-cluster distance fields ----------
+
+    def _window(self, cluster, margin=0):
+        """Cell rectangle of a cluster grown by margin clusters on every side"""
+        s = self.cluster_size
+        z0, x0 = max(cluster[0] - margin, 0) * s, max(cluster[1] - margin, 0) * s
+        z1 = min((cluster[0] + margin + 1) * s, self.grid.height)
+        x1 = min((cluster[1] + margin + 1) * s, self.grid.width)
+        return z0, x0, z1, x1
+
+    def _wavefront(self, window, sources):
+        """Distance from each source to every cell of the window, plus back-pointers.
+
+        Returns (distances (len(sources), h, w), steps) where steps[i][r][c]
+        is the MOVES index leading one cell closer to source i (-1 at the
+        source and wherever it is unreachable), as nested lists for cheap
+        walking from Python.
+        """
+        z0, x0, z1, x1 = window
+        walk = self.grid.walkable[z0:z1, x0:x1]
+        h, w = walk.shape
+        field = np.full((len(sources), h + 2, w + 2), INF)
+        padded = np.zeros((h + 2, w + 2), dtype=bool)
+        padded[1:-1, 1:-1] = walk
+        for i, (row, col) in enumerate(sources):
+            field[i, row - z0 + 1, col - x0 + 1] = 0.0
+
+        # Per-move cost into each cell: INF where the move is blocked
+        # (diagonals need both orthogonal cells open)
+        moves = []
+        for dz, dx, cost in MOVES:
+            ok = padded[1 + dz:h + 1 + dz, 1 + dx:w + 1 + dx] & walk
+            if dz and dx:
+                ok = ok & padded[1 + dz:h + 1 + dz, 1:w + 1] & padded[1:h + 1, 1 + dx:w + 1 + dx]
+            moves.append((field[:, 1 + dz:h + 1 + dz, 1 + dx:w + 1 + dx], np.where(ok, cost, INF)))
+
+        # Relax in place, so each sweep can carry distances several cells
+        inner = field[:, 1:-1, 1:-1]
+        scratch = np.empty_like(inner)
+        previous = np.empty_like(inner)
+        while True:
+            previous[...] = inner
+            for neighbor, penalty in moves:
+                np.add(neighbor, penalty, out=scratch)
+                np.minimum(inner, scratch, out=inner)
+            if np.array_equal(previous, inner):
+                break
+
+        via = np.stack([neighbor + penalty for neighbor, penalty in moves])
+        steps = via.argmin(axis=0)
+        steps[(inner == 0.0) | (inner == INF)] = -1
+        return inner, steps.tolist()
+
+    def _cluster_fields(self, cluster):
+        """(entrance -> row, distances, entrance -> abstract edges, steps), built on first use"""
+        cached = self._fields.get(cluster)
+        if cached is None:
+            entrances = self.cluster_entrances.get(cluster, [])
+            fields, steps = (self._wavefront(self._window(cluster), entrances)
+                             if entrances else (None, None))
+            z0, x0, _, _ = self._window(cluster)
+            index = {e: i for i, e in enumerate(entrances)}
+            edges = {}
+            for i, entrance in enumerate(entrances):
+                costs = fields[i] if fields is not None else None
+                edges[entrance] = [
+                    (e, float(costs[e[0] - z0, e[1] - x0])) for e in entrances
+                    if e != entrance and costs[e[0] - z0, e[1] - x0] < INF
+                ] + self.crossings.get(entrance, [])
+            cached = self._fields[cluster] = (index, fields, edges, steps)
+            self._edges.update(edges)
+        return cached
+
+    def _entrance_costs(self, cell):
+        """(entrance, cost) from cell to each entrance of its cluster it can reach inside it"""
+        cluster = self.cluster_of(cell)
+        index, fields, _, _ = self._cluster_fields(cluster)
+        if fields is None:
+            return []
+        z0, x0, _, _ = self._window(cluster)
+        costs = fields[:, cell[0] - z0, cell[1] - x0].tolist()
+        return [(entrance, costs[i]) for entrance, i in index.items() if costs[i] < INF]
+
+    def _leg(self, entrance, cell):
+        """Cells from an entrance to another cell of the same cluster"""
+        cluster = self.cluster_of(entrance)
+        index, _, _, steps = self._cluster_fields(cluster)
+        return self._walk_back(self._window(cluster), steps[index[entrance]], cell)
+
+    def _walk_back(self, window, steps, target):
+        """Cells from a wavefront's source to target, following its back-pointers"""
+        z0, x0 = window[0], window[1]
+        path = [target]
+        row, col = target
+        move = steps[row - z0][col - x0]
+        while move >= 0:
+            dz, dx, _ = MOVES[move]
+            row, col = row + dz, col + dx
+            path.append((row, col))
+            move = steps[row - z0][col - x0]
+        path.reverse()
+        return path
+
+    # ---------- queries ----------
+
+    def find_path(self, start, goal):
+        """Cell path from start to goal (inclusive), or None if unreachable"""
+        return self.find_paths([(start, goal)])[0]
+
+    def find_paths(self, queries):
+        """Batch query: pairs sharing a start cell share one abstract search"""
+        results = [None] * len(queries)
+        by_start = defaultdict(list)
+        for i, (start, goal) in enumerate(queries):
+            start, goal = tuple(start), tuple(goal)
+            self.stats['queries'] += 1
+            key = (start, goal)
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                self.stats['cache_hits'] += 1
+                results[i] = self.cache[key]
+            else:
+                by_start[start].append((i, goal))
+
+        for start, pending in by_start.items():
+            goals = {goal for _, goal in pending}
+            paths = self._search(start, goals)
+            for i, goal in pending:
+                results[i] = paths.get(goal)
+                self._remember((start, goal), results[i])
+        return results
+
+    def _search(self, start, goals):
+        """Abstract A*/Dijkstra from start to every goal, then refine to cells.
+
+        Goals within start's cluster and its eight neighbours get one exact
+        wavefront from start, so short trips never detour through entrances.
+        Longer trips join and leave the abstract graph through the entrances
+        of their own clusters, priced from those clusters' cached fields, so a
+        warm long query runs no wavefront at all.
+        """
+        walk = self.grid.walkable
+        if not walk[start]:
+            return {}
+        goals = [goal for goal in goals if walk[goal]]
+        window = self._window(self.cluster_of(start), margin=1)
+        z0, x0, z1, x1 = window
+        near = [goal for goal in goals if z0 <= goal[0] < z1 and x0 <= goal[1] < x1]
+        paths = {}
+        if near:
+            field, steps = self._wavefront(window, [start])
+            for goal in near:
+                if field[0, goal[0] - z0, goal[1] - x0] < INF:
+                    paths[goal] = self._walk_back(window, steps[0], goal)
+        remaining = {goal for goal in goals if goal not in paths}
+        if not remaining:
+            return paths
+
+        goal_links = defaultdict(list)  # entrance -> [(goal, cost)]
+        for goal in remaining:
+            for entrance, cost in self._entrance_costs(goal):
+                goal_links[entrance].append((goal, cost))
+
+        # Single goal: A* with the octile heuristic; many: plain Dijkstra
+        if len(remaining) == 1:
+            (tz, tx), weight = next(iter(remaining)), 1.0
+        else:
+            (tz, tx), weight = (0, 0), 0.0
+        diagonal = SQRT2 - 2.0
+
+        dist = {}
+        parent = {}
+        heap = []
+        for entrance, d in self._entrance_costs(start):
+            dist[entrance] = d
+            parent[entrance] = None
+            dz, dx = abs(entrance[0] - tz), abs(entrance[1] - tx)
+            heap.append((d + weight * (dz + dx + diagonal * (dz if dz < dx else dx)), -d, entrance))
+        heapq.heapify(heap)
+
+        best_goal = {}  # goal -> (cost, entrance it is reached from)
+        settle_at = INF
+        edges_of = self._edges
+        heappush, heappop = heapq.heappush, heapq.heappop
+        while heap:
+            f, d, node = heappop(heap)
+            d = -d  # stored negated: among equal f, expand the node furthest along first
+            if f >= settle_at:
+                # A goal is final once nothing cheaper is left on the heap
+                remaining -= {goal for goal in remaining if goal in best_goal and best_goal[goal][0] <= f}
+                if not remaining:
+                    break
+                settle_at = min((best_goal[goal][0] for goal in remaining if goal in best_goal),
+                                default=INF)
+            if d > dist[node]:
+                continue  # superseded heap entry
+            for goal, cost in goal_links.get(node, ()):
+                if d + cost < best_goal.get(goal, (INF,))[0]:
+                    best_goal[goal] = (d + cost, node)
+                    if goal in remaining and d + cost < settle_at:
+                        settle_at = d + cost
+
+            edges = edges_of.get(node)
+            if edges is None:
+                edges = self._cluster_fields(self.cluster_of(node))[2][node]
+            for nxt, cost in edges:
+                nd = d + cost
+                if nd < dist.get(nxt, INF):
+                    dist[nxt] = nd
+                    parent[nxt] = node
+                    dz, dx = abs(nxt[0] - tz), abs(nxt[1] - tx)
+                    heappush(heap, (nd + weight * (dz + dx + diagonal * (dz if dz < dx else dx)), -nd, nxt))
+
+        for goal, (_, entrance) in best_goal.items():
+            paths[goal] = self._refine(start, entrance, parent, goal)
+        return paths
+
+    def _refine(self, start, last, parent, goal):
+        """Expand abstract hops into grid cells"""
+        hops = [last]
+        while parent[hops[-1]] is not None:
+            hops.append(parent[hops[-1]])
+        hops.reverse()  # e1, e2, ..., last
+
+        cells = self._leg(hops[0], start)[::-1]
+        for a, b in zip(hops, hops[1:]):
+            if self.cluster_of(a) != self.cluster_of(b):
+                cells.append(b)  # step across the border
+            else:
+                cells += self._leg(a, b)[1:]
+        cells += self._leg(last, goal)[1:]
+        return cells
+
+    # ---------- cache & repair ----------
+
+    def _remember(self, key, path):
+        self.cache[key] = path
+        if path is not None:
+            for cluster in {self.cluster_of(cell) for cell in path}:
+                self._cache_clusters[cluster].add(key)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)  # stale cluster index entries are harmless
+
+    def repair(self, rects):
+        """Call after the grid changed inside cell rectangles (z0, x0, z1, x1)"""
+        dirty = set()
+        for z0, x0, z1, x1 in rects:
+            for cz in range(max(z0 // self.cluster_size - 1, 0), z1 // self.cluster_size + 2):
+                for cx in range(max(x0 // self.cluster_size - 1, 0), x1 // self.cluster_size + 2):
+                    dirty.add((cz, cx))
+        self._relink(dirty)
+        for cluster in dirty:
+            _, _, edges, _ = self._fields.pop(cluster, (None, None, {}, None))
+            for entrance in edges:
+                self._edges.pop(entrance, None)
+            for key in self._cache_clusters.pop(cluster, ()):
+                self.cache.pop(key, None)
+        # Unreachable results may have become reachable anywhere
+        for key in [k for k, path in self.cache.items() if path is None]:
+            del self.cache[key]
+        self.stats['repairs'] += 1
+
+    def stream_in(self, buildings):
+        """A tile streamed in: block its buildings and repair around them"""
+        self.repair(self.grid.add_footprints(buildings))
+
+    def stream_out(self, buildings):
+        self.repair(self.grid.remove_footprints(buildings))
+
+    def find_world_path(self, start_xz, goal_xz):
+        """World-space waypoints between two (x, z) points"""
+        path = self.find_path(self.grid.to_cell(*start_xz), self.grid.to_cell(*goal_xz))
+        return None if path is None else [self.grid.to_world(cell) for cell in path]
+
+
+# ============================================
+# 3. BENCHMARK
+# ============================================
+
+def city_blocks(tiles=4, seed=0):
+    """StarlingCity's Glades block pattern repeated over tiles x tiles"""
+    rng = np.random.default_rng(seed)
+    buildings = []
+    for tx in range(tiles):
+        for tz in range(tiles):
+            ox, oz = tx * 200, tz * 200
+            for x in range(-50, 50, 8):
+                for z in range(-50, 50, 8):
+                    if rng.random() < 0.25:
+                        continue
+                    buildings.append({'pos': (ox + x, 0, oz + z), 'scale': (6, 10, 6)})
+    return buildings
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Pathfinding throughput")
+    parser.add_argument('--tiles', type=int, default=4)
+    parser.add_argument('--queries', type=int, default=2000)
+    args = parser.parse_args()
+
+    extent = args.tiles * 200
+    buildings = city_blocks(args.tiles)
+    start = time.perf_counter()
+    grid = NavGrid.from_buildings(buildings, ((-100, -100), (extent - 100, extent - 100)))
+    planner = PathPlanner(grid)
+    print(f"bake: {grid.width}x{grid.height} cells, {len(buildings)} buildings, "
+          f"{(time.perf_counter() - start) * 1000:.1f} ms")
+
+    rng = np.random.default_rng(1)
+    free = np.argwhere(grid.walkable)
+    pairs = [(tuple(free[a]), tuple(free[b]))
+             for a, b in rng.integers(len(free), size=(args.queries, 2))]
+
+    def timed(label, run):
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        print(f"{label:>22}: {len(pairs) / elapsed:10.0f} queries/s")
+
+    timed('cold graph, no cache', lambda: [planner.find_path(*p) for p in pairs])
+    planner.cache.clear()
+    timed('warm graph, no cache', lambda: [planner.find_path(*p) for p in pairs])
+    timed('path cache', lambda: [planner.find_path(*p) for p in pairs])
+
+    planner.cache.clear()
+    hubs = [tuple(free[i]) for i in rng.integers(len(free), size=20)]
+    pairs = [(hubs[i % len(hubs)], goal) for i, (_, goal) in enumerate(pairs)]
+    timed('batch, 20 sources', lambda: planner.find_paths(pairs))
+
+    start = time.perf_counter()
+    planner.stream_out(buildings[:50])
+    print(f"repair after streaming out 50 buildings: {(time.perf_counter() - start) * 1000:.1f} ms")
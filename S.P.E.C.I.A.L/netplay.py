@@ -0,0 +1,634 @@
+"""
+ARROW: Team Arrow netplay
+Authoritative UDP server and clients, quantized snapshots delta-compressed against acked baselines
+"""
+
+import socket
+import struct
+import time
+import zlib
+from collections import OrderedDict, deque
+
+import numpy as np
+import glm
+
+from crowd import Crowd
+from replay import MOUSE_SCALE
+from scene import (KeyState, OliverQueen, PatrolSimulation, RenderState, StarlingCity,
+                   TickInput, _no_section, scripted_patrol)
+
+# ============================================
+# 1. WIRE FORMAT
+# ============================================
+#
+# Everything travels as UDP datagrams on localhost (or a LAN):
+#
+#   CONNECT   client -> server   asks for a player, and says whether it
+#                                draws the crowd (WANTS_CROWD)
+#   WELCOME   server -> client   player id, tick rate, city seed, current tick
+#   INPUT     client -> server   newest snapshot tick received (the ack) and
+#                                the last few inputs, so one lost datagram
+#                                costs nothing; the server applies each
+#                                input sequence number once
+#   SNAPSHOT  server -> client   world state at a tick, zlib-compressed
+#   BYE       either way         leaving
+#
+# A snapshot is a section per entity kind - players, arrows, the crowd near
+# this client (empty unless it asked for one) - of uint16 rows keyed by
+# uint32 entity id; player ids are uint32 in the packet headers too. Rows are quantized (1/32
+# unit positions, 1/65536-turn yaw) and, when the client has acked a
+# snapshot the server still remembers, sent as wrapping differences from it:
+# unchanged entities are left out entirely, moved ones become small numbers
+# that zlib packs tightly. Without a usable baseline the snapshot is full.
+
+CONNECT, WELCOME, INPUT, SNAPSHOT, BYE = 1, 2, 3, 4, 5
+
+CONNECT_PACKET = struct.Struct('<BB')        # type, wants
+WELCOME_PACKET = struct.Struct('<BIHqI')     # type, player id, tick rate, seed, tick
+INPUT_HEADER = struct.Struct('<BIIB')        # type, player id, acked tick, records
+SNAPSHOT_HEADER = struct.Struct('<BIIII')    # type, tick, baseline tick, player id, last input
+SECTION = struct.Struct('<HH')               # removed, changed
+
+WANTS_CROWD = 0x01
+
+NO_BASELINE = 0xFFFFFFFF
+INPUT_REDUNDANCY = 3
+BASELINES_KEPT = 64
+
+INPUT_RECORD = np.dtype([
+    ('seq', '<u4'),
+    ('keys', 'u1'),
+    ('flags', 'u1'),          # bit 0: toggle hood
+    ('fire', 'u1'),
+    ('reload', 'u1'),
+    ('mouse_dx', '<i4'),      # 1/MOUSE_SCALE px, as in recordings
+    ('mouse_dy', '<i4'),
+])
+
+POSITION_SCALE = 32.0         # 1/32 unit, +-1024 units in 16 bits
+YAW_SCALE = 65536 / (2 * np.pi)
+PITCH_SCALE = 16384.0
+
+KINDS = ('players', 'arrows', 'crowd')
+FIELDS = {'players': 7,      # x, y, z, yaw, pitch, quiver, hood
+          'arrows': 3,       # x, y, z
+          'crowd': 3}        # x, z, alive
+
+RELEVANCE_RADIUS = 80.0       # crowd agents sent to a client: this close...
+MAX_AGENTS = 1024             # ...and at most this many, nearest first
+
+# The crowd section of clients that do not draw it, shared across ticks
+NO_CROWD = (np.zeros(0, dtype=np.uint32), np.zeros((0, FIELDS['crowd']), dtype=np.uint16))
+
+
+def quantize_position(xyz):
+    return (np.round(np.asarray(xyz, dtype=np.float64) * POSITION_SCALE).astype(np.int64) & 0xFFFF).astype(np.uint16)
+
+
+def position_of(rows):
+    return rows.astype(np.int16).astype(np.float32) / POSITION_SCALE
+
+
+# ============================================
+# 2. SECTION DELTA CODING
+# ============================================
+
+def encode_section(ids, rows, base=None):
+    """ids (sorted uint32) and uint16 rows -> bytes, relative to base (ids, rows) if given"""
+    if base is None:
+        removed = np.zeros(0, dtype=np.uint32)
+        changed = np.ones(len(ids), dtype=bool)
+        delta = rows
+    else:
+        base_ids, base_rows = base
+        pos = np.minimum(np.searchsorted(base_ids, ids), max(len(base_ids) - 1, 0))
+        matched = base_ids[pos] == ids if len(base_ids) else np.zeros(len(ids), dtype=bool)
+        delta = rows.copy()
+        delta[matched] -= base_rows[pos[matched]]       # wraps mod 2^16
+        changed = ~matched | delta.any(axis=1)
+        if len(ids):
+            kept = ids[np.minimum(np.searchsorted(ids, base_ids), len(ids) - 1)] == base_ids
+            removed = base_ids[~kept]
+        else:
+            removed = base_ids
+    return (SECTION.pack(len(removed), int(changed.sum()))
+            + removed.astype('<u4').tobytes()
+            + ids[changed].astype('<u4').tobytes()
+            + delta[changed].astype('<u2').tobytes())
+
+
+def decode_section(data, offset, fields, base=None):
+    """Inverse of encode_section -> (ids, rows), offset after the section"""
+    n_removed, n_changed = SECTION.unpack_from(data, offset)
+    offset += SECTION.size
+    removed = np.frombuffer(data, '<u4', n_removed, offset)
+    offset += 4 * n_removed
+    ids = np.frombuffer(data, '<u4', n_changed, offset).astype(np.uint32)
+    offset += 4 * n_changed
+    rows = np.frombuffer(data, '<u2', n_changed * fields, offset).reshape(n_changed, fields).copy()
+    offset += 2 * n_changed * fields
+    if base is not None:
+        base_ids, base_rows = base
+        if len(base_ids):
+            pos = np.minimum(np.searchsorted(base_ids, ids), len(base_ids) - 1)
+            matched = base_ids[pos] == ids
+            rows[matched] += base_rows[pos[matched]]
+        kept = ~np.isin(base_ids, removed) & ~np.isin(base_ids, ids)
+        ids = np.concatenate([base_ids[kept], ids])
+        rows = np.concatenate([base_rows[kept], rows])
+        order = np.argsort(ids, kind='stable')
+        ids, rows = ids[order], rows[order]
+    return (ids, rows), offset
+
+
+def encode_snapshot(sections, bases=None, cache=None):
+    """kind -> (ids, rows) into a compressed body
+
+    cache, if given, maps (section, base section) identities to their
+    encoding, so a section shared by several bodies is encoded once; keep it
+    only while those objects are alive (one server tick).
+    """
+    parts = []
+    for kind in KINDS:
+        section, base = sections[kind], bases[kind] if bases else None
+        key = (id(section), id(base))
+        part = cache.get(key) if cache is not None else None
+        if part is None:
+            part = encode_section(*section, base)
+            if cache is not None:
+                cache[key] = part
+        parts.append(part)
+    body = b''.join(parts)
+    return zlib.compress(body, 1), len(body)
+
+
+def decode_snapshot(body, bases=None):
+    data = zlib.decompress(body)
+    sections, offset = {}, 0
+    for kind in KINDS:
+        sections[kind], offset = decode_section(data, offset, FIELDS[kind], bases[kind] if bases else None)
+    return sections
+
+
+# ============================================
+# 3. AUTHORITATIVE SERVER
+# ============================================
+
+class TeamSimulation(PatrolSimulation):
+    """PatrolSimulation with one OliverQueen per connected player"""
+
+    def __init__(self, city, tick_rate=60, crowd=None):
+        super().__init__(city, None, tick_rate, crowd)
+        self.players = {}       # player id -> OliverQueen
+        self._next_player = 1
+
+    def join(self):
+        player = self._next_player
+        self._next_player += 1
+        oliver = OliverQueen()
+        oliver.position.x += 3.0 * (player % 8)   # side by side on the docks
+        self.players[player] = oliver
+        return player
+
+    def leave(self, player):
+        self.players.pop(player, None)
+
+    def step_team(self, inputs, timer=None):
+        """One tick for everyone; inputs maps player id -> TickInput"""
+        section = timer.section if timer else _no_section
+        with section('players'):
+            for player, oliver in self.players.items():
+                self.update_player(inputs[player], oliver)
+        with section('arrows'):
+            self.update_arrows()
+        if self.crowd is not None:
+            with section('crowd'):
+                self.update_crowd()
+        self.tick += 1
+
+    def capture(self):
+        """Quantized players and arrows, shared by every client's snapshot"""
+        ids = np.array(sorted(self.players), dtype=np.uint32)
+        players = np.zeros((len(ids), FIELDS['players']), dtype=np.uint16)
+        for row, player in enumerate(ids.tolist()):
+            oliver = self.players[player]
+            players[row, :3] = quantize_position(tuple(oliver.position))
+            players[row, 3] = int(round((oliver.rotation.x % (2 * np.pi)) * YAW_SCALE)) & 0xFFFF
+            players[row, 4] = int(round(oliver.rotation.y * PITCH_SCALE)) & 0xFFFF
+            players[row, 5] = min(max(oliver.quiver, 0), 0xFFFF)
+            players[row, 6] = oliver.hood_raised
+        arrow_ids = np.array([a['id'] for a in self.arrows], dtype=np.uint32)
+        arrows = quantize_position([tuple(a['position']) for a in self.arrows]).reshape(-1, 3)
+        order = np.argsort(arrow_ids, kind='stable')
+        return {'players': (ids, players), 'arrows': (arrow_ids[order], arrows[order])}
+
+    def crowd_near(self, position):
+        """Ids of the agents one client is told about: nearest MAX_AGENTS within RELEVANCE_RADIUS"""
+        if self.crowd is None:
+            return np.zeros(0, dtype=np.uint32)
+        offset = self.crowd.position - np.array([position.x, position.z], dtype=np.float32)
+        distance = np.einsum('nc,nc->n', offset, offset)
+        near = np.flatnonzero(distance < RELEVANCE_RADIUS ** 2)
+        if len(near) > MAX_AGENTS:
+            near = near[np.argpartition(distance[near], MAX_AGENTS)[:MAX_AGENTS]]
+            near.sort()
+        return near.astype(np.uint32)
+
+    def crowd_rows(self, ids):
+        rows = np.zeros((len(ids), FIELDS['crowd']), dtype=np.uint16)
+        if len(ids):
+            rows[:, :2] = quantize_position(self.crowd.position[ids])
+            rows[:, 2] = self.crowd.alive[ids]
+        return rows
+
+
+class RemotePlayer:
+    """Server-side view of one client"""
+
+    def __init__(self, address, player, now, crowd=False):
+        self.address = address
+        self.player = player
+        self.crowd = crowd            # the client draws the crowd, so it gets a section
+        self.pending = TickInput()
+        self.last_seq = 0             # newest input applied
+        self.acked = NO_BASELINE      # newest snapshot the client has
+        self.sent = OrderedDict()     # tick -> sections, kept until acked past
+        self.last_heard = now
+
+    def receive_inputs(self, records):
+        for seq, keys, flags, fire, reload, dx, dy in records.tolist():
+            if seq > self.last_seq:
+                self.last_seq = seq
+                self.pending.merge(TickInput(KeyState(keys), dx / MOUSE_SCALE, dy / MOUSE_SCALE,
+                                             fire, bool(flags & 1), reload))
+
+    def take_input(self):
+        tick_input, self.pending = self.pending, self.pending.held()
+        return tick_input
+
+    def baseline(self):
+        return self.sent.get(self.acked)
+
+    def remember(self, tick, sections):
+        self.sent[tick] = sections
+        # Acks only move forward, so anything older than the ack is dead
+        while len(self.sent) > BASELINES_KEPT or (self.acked != NO_BASELINE
+                                                   and next(iter(self.sent)) < self.acked):
+            self.sent.popitem(last=False)
+
+
+class TeamServer:
+    """Ticks one TeamSimulation and streams snapshots to every client"""
+
+    def __init__(self, host='127.0.0.1', port=27960, seed=0, tick_rate=60, agents=0,
+                 timeout=5.0):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        self.sock.bind((host, port))
+        self.sock.setblocking(False)
+        self.seed = seed
+        self.timeout = timeout
+        city = StarlingCity(None, seed=seed)
+        crowd = Crowd(city.streets, agents, seed) if agents else None
+        self.simulation = TeamSimulation(city, tick_rate, crowd)
+        self.clients = {}             # address -> RemotePlayer
+        # Stats
+        self.tick_ms = []
+        self.bytes_per_tick = []
+        self.raw_bytes = 0
+        self.sent_bytes = 0
+        self.full_snapshots = 0
+        self.delta_snapshots = 0
+        self.peak_clients = 0
+        self.late_ticks = 0           # ticks that started after their slot
+        self.run_seconds = 0.0
+        self.compared = []            # sampled (sent, full compressed, full float32) sizes
+
+    def receive(self, now):
+        while True:
+            try:
+                data, address = self.sock.recvfrom(65536)
+            except BlockingIOError:
+                return
+            kind = data[0] if data else 0
+            client = self.clients.get(address)
+            if kind == CONNECT:
+                if client is None:
+                    wants = data[1] if len(data) >= CONNECT_PACKET.size else 0
+                    client = self.clients[address] = RemotePlayer(address, self.simulation.join(), now,
+                                                                  bool(wants & WANTS_CROWD))
+                    self.peak_clients = max(self.peak_clients, len(self.clients))
+                self.sock.sendto(WELCOME_PACKET.pack(WELCOME, client.player, self.simulation.tick_rate,
+                                                     self.seed, self.simulation.tick), address)
+            elif client is None:
+                continue
+            elif kind == INPUT and len(data) >= INPUT_HEADER.size:
+                _, _, acked, count = INPUT_HEADER.unpack_from(data)
+                if acked != NO_BASELINE and (client.acked == NO_BASELINE or acked > client.acked):
+                    client.acked = acked
+                count = min(count, (len(data) - INPUT_HEADER.size) // INPUT_RECORD.itemsize)
+                client.receive_inputs(np.frombuffer(data, INPUT_RECORD, count, INPUT_HEADER.size))
+                client.last_heard = now
+            elif kind == BYE:
+                self._drop(client)
+
+    def _drop(self, client):
+        self.simulation.leave(client.player)
+        del self.clients[client.address]
+
+    def tick(self):
+        start = time.perf_counter()
+        self.receive(start)
+        for client in [c for c in self.clients.values() if start - c.last_heard > self.timeout]:
+            self._drop(client)
+        simulation = self.simulation
+        simulation.step_team({c.player: c.take_input() for c in self.clients.values()})
+        shared = simulation.capture()
+        # Clients that see the same crowd share one sections dict this tick,
+        # and their baselines are earlier ticks' dicts, so clients with equal
+        # (sections, baseline) identities get the same bytes: a body is
+        # encoded once per distinct pair, and each section once per distinct
+        # (section, base section). Clients without the crowd all share one
+        # dict, and only clients that draw the crowd pay for relevance
+        plain = dict(shared, crowd=NO_CROWD)
+        with_crowd = {}
+        bodies = {}
+        encoded = {}
+        sample = simulation.tick % 30 == 0 and len(self.compared) < 10000
+        sent = 0
+        for client in self.clients.values():
+            sections = plain
+            if client.crowd and simulation.crowd is not None:
+                ids = simulation.crowd_near(simulation.players[client.player].position)
+                sections = with_crowd.get(ids.tobytes())
+                if sections is None:
+                    sections = with_crowd[ids.tobytes()] = dict(shared, crowd=(ids, simulation.crowd_rows(ids)))
+            base = client.baseline()
+            key = (id(sections), id(base))
+            if key not in bodies:
+                # The baseline rides along so its id stays taken for the tick
+                bodies[key] = encode_snapshot(sections, base, encoded) + (base,)
+                if sample and base is not None:
+                    # One comparison per distinct body, not per client
+                    full, _ = encode_snapshot(sections, None, encoded)
+                    floats = sum(len(ids) * (4 + 4 * FIELDS[kind]) for kind, (ids, _) in sections.items())
+                    self.compared.append((len(bodies[key][0]), len(full), floats))
+            body, raw, _ = bodies[key]
+            packet = SNAPSHOT_HEADER.pack(SNAPSHOT, simulation.tick,
+                                          client.acked if base is not None else NO_BASELINE,
+                                          client.player, client.last_seq) + body
+            try:
+                self.sock.sendto(packet, client.address)
+            except (BlockingIOError, OSError):
+                continue              # a full buffer is just packet loss
+            client.remember(simulation.tick, sections)
+            sent += len(packet)
+            self.raw_bytes += raw
+            if base is None:
+                self.full_snapshots += 1
+            else:
+                self.delta_snapshots += 1
+        self.sent_bytes += sent
+        self.bytes_per_tick.append(sent)
+        self.tick_ms.append((time.perf_counter() - start) * 1000.0)
+
+    def run(self, seconds=None):
+        """Tick on a fixed schedule; a late tick is not made up, the next one starts now"""
+        dt = 1.0 / self.simulation.tick_rate
+        start = next_tick = time.perf_counter()
+        while seconds is None or time.perf_counter() - start < seconds:
+            self.tick()
+            next_tick += dt
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                self.late_ticks += 1
+                next_tick = time.perf_counter()
+        self.run_seconds += time.perf_counter() - start
+
+    def report(self):
+        ticks = np.array(self.tick_ms) if self.tick_ms else np.zeros(1)
+        sizes = np.array(self.bytes_per_tick) if self.bytes_per_tick else np.zeros(1)
+        snapshots = self.full_snapshots + self.delta_snapshots
+        expected = int(self.run_seconds * self.simulation.tick_rate)
+        return {
+            'ticks': len(self.tick_ms),
+            # Ticks the schedule called for but never ran, and ticks that ran late
+            'expected_ticks': expected,
+            'missed_ticks': max(expected - len(self.tick_ms), 0),
+            'late_ticks': self.late_ticks,
+            'peak_clients': self.peak_clients,
+            'tick_ms': {'p50': float(np.percentile(ticks, 50)), 'p99': float(np.percentile(ticks, 99)),
+                        'max': float(ticks.max())},
+            'bytes_per_tick': float(sizes.mean()),
+            'bytes_per_snapshot': self.sent_bytes / snapshots if snapshots else 0.0,
+            'uncompressed_delta_bytes': self.raw_bytes / snapshots if snapshots else 0.0,
+            'full_snapshots': self.full_snapshots,
+            'delta_snapshots': self.delta_snapshots,
+            # Same snapshots sent whole: quantized + zlib, and as plain float32
+            'sampled_body_bytes': dict(zip(('delta', 'full_quantized', 'full_float32'),
+                                           np.mean(self.compared, axis=0).round(1).tolist()
+                                           if self.compared else (0, 0, 0))),
+        }
+
+
+# ============================================
+# 4. CLIENT
+# ============================================
+
+class NetClient:
+    """Sends TickInputs, receives snapshots and interpolates between them"""
+
+    def __init__(self, host='127.0.0.1', port=27960, interpolation_ticks=6, timeout=3.0, crowd=False):
+        self.server = (host, port)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        self.sock.connect(self.server)
+        self.interpolation_ticks = interpolation_ticks
+        self.snapshots = OrderedDict()   # tick -> sections, newest last
+        self.latest = None               # newest tick received
+        self.latest_at = 0.0
+        self.seq = 0
+        self.recent = deque(maxlen=INPUT_REDUNDANCY)
+        self.bytes_received = 0
+        self.undecodable = 0
+        self.connected = False
+
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            self.sock.send(CONNECT_PACKET.pack(CONNECT, WANTS_CROWD if crowd else 0))
+            self.sock.settimeout(0.25)
+            try:
+                data = self.sock.recv(65536)
+            except socket.timeout:
+                continue
+            if data and data[0] == WELCOME:
+                _, self.player, self.tick_rate, self.seed, tick = WELCOME_PACKET.unpack_from(data)
+                self.connected = True
+                break
+        if not self.connected:
+            raise ConnectionError(f"no answer from {host}:{port}")
+        self.sock.setblocking(False)
+
+    def send_input(self, tick_input):
+        self.seq += 1
+        record = np.zeros(1, INPUT_RECORD)
+        record[0] = (self.seq, tick_input.keys.mask, int(bool(tick_input.toggle_hood)),
+                     min(tick_input.fire, 255), min(tick_input.reload, 255),
+                     int(round(tick_input.mouse_dx * MOUSE_SCALE)), int(round(tick_input.mouse_dy * MOUSE_SCALE)))
+        self.recent.append(record.tobytes())
+        acked = self.latest if self.latest is not None else NO_BASELINE
+        try:
+            self.sock.send(INPUT_HEADER.pack(INPUT, self.player, acked, len(self.recent)) + b''.join(self.recent))
+        except (BlockingIOError, ConnectionRefusedError):
+            pass
+
+    def poll(self):
+        """Take in every snapshot that has arrived; returns how many"""
+        received = 0
+        while True:
+            try:
+                data = self.sock.recv(65536)
+            except BlockingIOError:
+                return received
+            except ConnectionRefusedError:
+                self.connected = False
+                return received
+            if not data or data[0] != SNAPSHOT:
+                if data and data[0] == BYE:
+                    self.connected = False
+                continue
+            self.bytes_received += len(data)
+            _, tick, baseline, _, _ = SNAPSHOT_HEADER.unpack_from(data)
+            if self.latest is not None and tick <= self.latest:
+                continue                   # late or duplicate datagram
+            bases = None
+            if baseline != NO_BASELINE:
+                bases = self.snapshots.get(baseline)
+                if bases is None:
+                    self.undecodable += 1
+                    continue
+            self.snapshots[tick] = decode_snapshot(data[SNAPSHOT_HEADER.size:], bases)
+            self.latest, self.latest_at = tick, time.perf_counter()
+            while len(self.snapshots) > BASELINES_KEPT:
+                self.snapshots.popitem(last=False)
+            received += 1
+
+    def render_state(self, now=None):
+        """RenderState for this player, interpolation_ticks behind the newest snapshot"""
+        if self.latest is None:
+            return None
+        now = time.perf_counter() if now is None else now
+        target = self.latest + (now - self.latest_at) * self.tick_rate - self.interpolation_ticks
+        ticks = list(self.snapshots)
+        older = [t for t in ticks if t <= target]
+        newer = [t for t in ticks if t > target]
+        if not older:
+            return self._state(self.snapshots[ticks[0]], self.snapshots[ticks[0]], 0.0)
+        if not newer:
+            return self._state(self.snapshots[older[-1]], self.snapshots[older[-1]], 0.0)
+        t0, t1 = older[-1], newer[0]
+        return self._state(self.snapshots[t0], self.snapshots[t1], (target - t0) / (t1 - t0))
+
+    def _state(self, a, b, alpha):
+        def player(sections):
+            ids, rows = sections['players']
+            row = rows[np.searchsorted(ids, self.player)] if self.player in ids else None
+            return row
+        p0, p1 = player(a), player(b)
+        if p0 is None:
+            p0 = p1
+        if p1 is None:
+            return None
+        pos0, pos1 = position_of(p0[:3]), position_of(p1[:3])
+        yaw0, yaw1 = p0[3] / YAW_SCALE, p1[3] / YAW_SCALE
+        yaw1 = yaw0 + (yaw1 - yaw0 + np.pi) % (2 * np.pi) - np.pi   # the short way round
+        pitch0, pitch1 = p0[4].astype(np.int16) / PITCH_SCALE, p1[4].astype(np.int16) / PITCH_SCALE
+        arrows = {}
+        ids0, rows0 = a['arrows']
+        old = dict(zip(ids0.tolist(), position_of(rows0)))
+        ids1, rows1 = b['arrows']
+        for arrow_id, pos in zip(ids1.tolist(), position_of(rows1)):
+            start = old.get(arrow_id, pos)
+            arrows[arrow_id] = glm.vec3(*(start + (pos - start) * alpha))
+        return RenderState(glm.vec3(*(pos0 + (pos1 - pos0) * alpha)),
+                           glm.vec2(yaw0 + (yaw1 - yaw0) * alpha, pitch0 + (pitch1 - pitch0) * alpha),
+                           arrows)
+
+    def close(self):
+        try:
+            self.sock.send(bytes([BYE]))
+        except OSError:
+            pass
+        self.sock.close()
+
+
+# ============================================
+# 5. LOAD TEST
+# ============================================
+
+def _server_process(port, seed, agents, seconds, results):
+    server = TeamServer(port=port, seed=seed, agents=agents)
+    server.run(seconds)
+    results.put(server.report())
+
+
+def load_test(clients, seconds=10.0, port=27960, seed=0, agents=0, crowd=False):
+    """A server process plus `clients` scripted players in this process"""
+    import multiprocessing
+
+    results = multiprocessing.Queue()
+    server = multiprocessing.Process(target=_server_process,
+                                     args=(port, seed, agents, seconds + 2.0, results), daemon=True)
+    server.start()
+    time.sleep(1.0)
+    players = [NetClient(port=port, crowd=crowd) for _ in range(clients)]
+    dt = 1.0 / players[0].tick_rate
+    frame = 0
+    start = next_frame = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for offset, player in enumerate(players):
+            player.send_input(scripted_patrol(frame + offset * 37))
+            player.poll()
+        frame += 1
+        next_frame += dt
+        delay = next_frame - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    elapsed = time.perf_counter() - start
+    for player in players:
+        player.poll()
+    states = [player.render_state() for player in players]
+    received = sum(player.bytes_received for player in players)
+    undecodable = sum(player.undecodable for player in players)
+    for player in players:
+        player.close()
+    report = results.get()
+    server.join()
+    report['client_kbytes_per_second'] = received / elapsed / clients / 1024
+    report['undecodable_snapshots'] = undecodable
+    report['clients_with_state'] = sum(state is not None for state in states)
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Run a Team Arrow server, or load-test one")
+    parser.add_argument('--port', type=int, default=27960)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--agents', type=int, default=0, help='crowd size')
+    parser.add_argument('--load', type=int, metavar='CLIENTS', help='scripted clients against a fresh server')
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--crowd', action='store_true',
+                        help='scripted clients ask for the crowd (scene.py does not draw it)')
+    args = parser.parse_args()
+
+    if args.load:
+        print(json.dumps(load_test(args.load, args.seconds, args.port, args.seed, args.agents, args.crowd),
+                         indent=2))
+    else:
+        print(f"Team Arrow server on udp://127.0.0.1:{args.port} - connect with scene.py --connect")
+        TeamServer(port=args.port, seed=args.seed, agents=args.agents).run()
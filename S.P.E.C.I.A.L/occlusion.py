@@ -0,0 +1,372 @@
+"""
+ARROW: Occlusion culling
+Low-resolution CPU depth buffer of the nearest big buildings, every building box tested against it
+"""
+
+import threading
+import time
+
+import numpy as np
+
+from geometry import BOX_CORNERS
+
+# ============================================
+# 1. BOXES & PROJECTION
+# ============================================
+#
+# Each pass, for one camera:
+#   1. project every building's 8 corners; boxes entirely off screen or
+#      beyond the far plane are frustum culled
+#   2. pick the OCCLUDERS boxes with the largest footprint-times-height over
+#      squared distance and rasterize their front faces into a small depth
+#      buffer (nearest view depth per pixel, 1/w interpolated exactly). Faces
+#      are convex quads, so each pixel row is one exact span - no per-pixel
+#      edge tests. The best third goes in first and the other occluders only
+#      if they are not already hidden behind it, which cuts overdraw
+#   3. build a max-depth pyramid and test each remaining box's screen rect
+#      and nearest depth against it: if every pixel it could touch already
+#      holds something nearer, the box is hidden
+#
+# Everything is conservative: boxes that reach behind the near plane are
+# never occluders and never culled, and the pyramid lookup covers at least
+# the box's whole rect.
+
+WIDTH, HEIGHT = 128, 64
+OCCLUDERS = 48
+NEAR = 0.1
+
+UNIT_CORNERS = np.array([[x, y, z] for x in (-0.5, 0.5) for y in (-0.5, 0.5) for z in (-0.5, 0.5)])
+# The face quads from geometry (counter-clockwise from outside) as indices into UNIT_CORNERS
+_FACE_CORNERS = np.rint(BOX_CORNERS + 0.5).astype(np.int64)              # (6, 4, 3) in {0, 1}
+BOX_FACES = _FACE_CORNERS[..., 0] * 4 + _FACE_CORNERS[..., 1] * 2 + _FACE_CORNERS[..., 2]  # (6, 4)
+
+
+def building_boxes(buildings):
+    """StarlingCity.buildings -> (centers, sizes) arrays"""
+    centers = np.array([b['pos'] for b in buildings], dtype=np.float64).reshape(-1, 3)
+    sizes = np.array([b['scale'] for b in buildings], dtype=np.float64).reshape(-1, 3)
+    return centers, sizes
+
+
+def project(view_proj, points, width=WIDTH, height=HEIGHT):
+    """(..., 3) world points -> pixel x, pixel y, view depth w"""
+    shape = points.shape[:-1]
+    clip = points.reshape(-1, 3) @ view_proj[[0, 1, 3], :3].T + view_proj[[0, 1, 3], 3]
+    w = clip[:, 2]
+    safe = np.where(np.abs(w) > 1e-9, w, 1e-9)
+    x = (clip[:, 0] / safe * 0.5 + 0.5) * width
+    y = (clip[:, 1] / safe * 0.5 + 0.5) * height
+    return x.reshape(shape), y.reshape(shape), w.reshape(shape)
+
+
+# ============================================
+# 2. DEPTH BUFFER
+# ============================================
+
+class DepthBuffer:
+    """Nearest view depth per low-res pixel, plus a max-depth pyramid for tests"""
+
+    def __init__(self, width=WIDTH, height=HEIGHT):
+        self.width = width
+        self.height = height
+        self.depth = np.full((height, width), np.inf, dtype=np.float32)
+        self.pyramid = []
+
+    def clear(self):
+        self.depth.fill(np.inf)
+
+    def rasterize(self, x, y, w):
+        """Convex planar quads as (Q, 4) pixel x, y and depth w; keeps each pixel's nearest"""
+        x1, y1 = np.roll(x, -1, axis=1), np.roll(y, -1, axis=1)
+        area = (x * y1 - x1 * y).sum(axis=1)
+        # Front faces only (counter-clockwise on screen); none behind the near plane
+        keep = (area > 1e-3) & (w.min(axis=1) > NEAR)
+        x, y, w, x1, y1 = x[keep], y[keep], w[keep], x1[keep], y1[keep]
+        if not len(x):
+            return 0
+        # Edge functions e = a * px + b * py + c, >= 0 inside
+        ea, eb = y - y1, x1 - x
+        ec = -(ea * x + eb * y)
+        # 1/w is affine in screen space across a planar face
+        plane = np.linalg.solve(np.stack([x[:, :3], y[:, :3], np.ones((len(x), 3))], axis=2),
+                                (1.0 / w[:, :3])[..., None])[..., 0]
+
+        # Every (quad, pixel row) pair, then the row's exact covered span
+        row0 = np.clip(np.ceil(y.min(axis=1) - 0.5), 0, self.height).astype(np.int64)
+        row1 = np.clip(np.floor(y.max(axis=1) - 0.5) + 1, 0, self.height).astype(np.int64)
+        rows = np.maximum(row1 - row0, 0)
+        quad = np.repeat(np.arange(len(x)), rows)
+        py = row0[quad] + np.arange(len(quad)) - np.repeat(np.cumsum(rows) - rows, rows)
+        a, rest = ea[quad], eb[quad] * (py[:, None] + 0.5) + ec[quad]      # (R, 4)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            bound = -rest / a
+        lo = np.where(a > 0, bound, -np.inf).max(axis=1)
+        hi = np.where(a < 0, bound, np.inf).min(axis=1)
+        hi = np.where(((a == 0) & (rest < 0)).any(axis=1), -np.inf, hi)
+        col0 = np.clip(np.ceil(lo - 0.5), 0, self.width).astype(np.int64)
+        col1 = np.clip(np.floor(hi - 0.5) + 1, 0, self.width).astype(np.int64)
+        spans = np.maximum(col1 - col0, 0)
+        total = int(spans.sum())
+        if not total:
+            return 0
+        # Per row: a flat buffer offset and 1/w as an affine function of the
+        # pixel's running number, so each pixel is one gather and a multiply-add
+        first = np.cumsum(spans) - spans
+        slope = plane[quad, 0]
+        start = py * self.width + col0 - first
+        base = plane[quad, 1] * (py + 0.5) + plane[quad, 2] + slope * (col0 + 0.5 - first)
+        row = np.repeat(np.arange(len(quad)), spans)
+        pixel = np.arange(total)
+        depth = 1.0 / (base[row] + slope[row] * pixel)
+        np.minimum.at(self.depth.reshape(-1), start[row] + pixel, depth.astype(np.float32))
+        return total
+
+    def build_pyramid(self):
+        """Level k holds the farthest depth of each 2^k x 2^k block"""
+        level = self.depth
+        self.pyramid = [level]
+        while level.shape[0] > 1 or level.shape[1] > 1:
+            h, w = level.shape
+            padded = np.full((h + h % 2, w + w % 2), np.inf, dtype=np.float32) if (h % 2 or w % 2) else level
+            if padded is not level:
+                padded[:h, :w] = level
+            level = np.maximum(np.maximum(padded[0::2, 0::2], padded[0::2, 1::2]),
+                               np.maximum(padded[1::2, 0::2], padded[1::2, 1::2]))
+            self.pyramid.append(level)
+
+    def hidden(self, x0, y0, x1, y1, nearest):
+        """Rects [x0, x1) x [y0, y1) (on screen, non-empty) whose nearest depth is behind the buffer"""
+        extent = np.maximum(x1 - x0, y1 - y0)
+        levels = np.minimum(np.ceil(np.log2(np.maximum(extent, 1))).astype(np.int64), len(self.pyramid) - 1)
+        farthest = np.full(len(x0), np.inf, dtype=np.float32)
+        for level in np.unique(levels).tolist():
+            sel = np.flatnonzero(levels == level)
+            grid = self.pyramid[level]
+            gx0, gy0 = x0[sel] >> level, y0[sel] >> level
+            gx1 = np.minimum((x1[sel] - 1) >> level, grid.shape[1] - 1)
+            gy1 = np.minimum((y1[sel] - 1) >> level, grid.shape[0] - 1)
+            # The rect spans at most 2 texels per axis at this level
+            farthest[sel] = np.maximum(np.maximum(grid[gy0, gx0], grid[gy0, gx1]),
+                                       np.maximum(grid[gy1, gx0], grid[gy1, gx1]))
+        return farthest < nearest
+
+
+# ============================================
+# 3. CULLER
+# ============================================
+
+class OcclusionCuller:
+    """Per-camera visibility of a fixed set of boxes (rebuild when the buildings change)"""
+
+    def __init__(self, centers, sizes, occluders=OCCLUDERS, far=500.0, resolution=(WIDTH, HEIGHT)):
+        self.centers = np.asarray(centers, dtype=np.float64)
+        self.sizes = np.asarray(sizes, dtype=np.float64)
+        self.corners = self.centers[:, None, :] + UNIT_CORNERS[None] * self.sizes[:, None, :]  # (N, 8, 3)
+        # Occluder weight before distance: footprint times height
+        self.bulk = np.sqrt(self.sizes[:, 0] * self.sizes[:, 2]) * self.sizes[:, 1]
+        self.occluders = occluders
+        self.far = far
+        self.buffer = DepthBuffer(*resolution)
+        self.stats = {'boxes': len(self.centers), 'frustum_culled': 0, 'occluded': 0, 'visible': len(self.centers),
+                      'pixels_written': 0, 'ms': 0.0}
+
+    @classmethod
+    def for_buildings(cls, buildings, **kwargs):
+        return cls(*building_boxes(buildings), **kwargs)
+
+    def visible(self, view_proj, eye):
+        """Boolean mask over the boxes for one camera (view_proj: 4x4, row-major)"""
+        start = time.perf_counter()
+        view_proj = np.asarray(view_proj, dtype=np.float64)
+        count = len(self.centers)
+        width, height = self.buffer.width, self.buffer.height
+        x, y, w = project(view_proj, self.corners, width, height)      # (N, 8) each
+        crosses_near = (w <= NEAR).any(axis=1)
+        front = ~crosses_near
+        safe_x = np.where(front[:, None], x, 0.0)
+        safe_y = np.where(front[:, None], y, 0.0)
+        x0 = np.floor(safe_x.min(axis=1)).astype(np.int64)
+        x1 = np.ceil(safe_x.max(axis=1)).astype(np.int64)
+        y0 = np.floor(safe_y.min(axis=1)).astype(np.int64)
+        y1 = np.ceil(safe_y.max(axis=1)).astype(np.int64)
+        nearest = w.min(axis=1)
+        off_screen = front & ((x1 <= 0) | (x0 >= width) | (y1 <= 0) | (y0 >= height) | (nearest > self.far))
+        # Wholly behind the camera; a box straddling the near plane stays in
+        off_screen |= w.max(axis=1) <= NEAR
+        in_view = ~off_screen
+
+        # Occluders: the bulkiest for their distance, wholly in front of the camera
+        candidates = np.flatnonzero(in_view & front)
+        rects = (x0, y0, x1, y1, nearest)
+        self.buffer.clear()
+        pixels = 0
+        if len(candidates):
+            distance = np.linalg.norm(self.centers[candidates] - np.asarray(eye, dtype=np.float64), axis=1)
+            score = self.bulk[candidates] / np.maximum(distance, 1.0) ** 2
+            chosen = candidates[np.argsort(-score)[:self.occluders]]
+            # The best third first; the rest only if they are not already behind it
+            split = (len(chosen) + 2) // 3
+            pixels = self._rasterize(x, y, w, chosen[:split])
+            self.buffer.build_pyramid()
+            rest = chosen[split:]
+            pixels += self._rasterize(x, y, w, rest[~self._hidden(rects, rest)])
+        self.buffer.build_pyramid()
+
+        mask = in_view.copy()
+        mask[candidates[self._hidden(rects, candidates)]] = False
+
+        frustum_culled = int(off_screen.sum())
+        self.stats = {'boxes': count, 'frustum_culled': frustum_culled,
+                      'occluded': count - frustum_culled - int(mask.sum()), 'visible': int(mask.sum()),
+                      'pixels_written': pixels, 'ms': (time.perf_counter() - start) * 1000.0}
+        return mask
+
+    def _rasterize(self, x, y, w, boxes):
+        return self.buffer.rasterize(x[boxes][:, BOX_FACES].reshape(-1, 4),
+                                     y[boxes][:, BOX_FACES].reshape(-1, 4),
+                                     w[boxes][:, BOX_FACES].reshape(-1, 4))
+
+    def _hidden(self, rects, boxes):
+        """Which of the on-screen boxes the current pyramid hides"""
+        x0, y0, x1, y1, nearest = (values[boxes] for values in rects)
+        x0 = np.clip(x0, 0, self.buffer.width - 1)
+        y0 = np.clip(y0, 0, self.buffer.height - 1)
+        x1 = np.clip(x1, x0 + 1, self.buffer.width)
+        y1 = np.clip(y1, y0 + 1, self.buffer.height)
+        return self.buffer.hidden(x0, y0, x1, y1, nearest)
+
+
+# ============================================
+# 4. WORKER THREAD (ONE FRAME AHEAD)
+# ============================================
+
+class OcclusionWorker(threading.Thread):
+    """Runs the culler off the render thread; each frame draws with the previous frame's mask
+
+    A one-frame-old mask can hold a building back for a frame as it comes
+    into view - the usual price of overlapping the pass with rendering.
+    """
+
+    def __init__(self, culler):
+        super().__init__(name='occlusion', daemon=True)
+        self.culler = culler
+        self.mask = np.ones(len(culler.centers), dtype=bool)
+        self.stats = dict(culler.stats)
+        self._request = None
+        self._wake = threading.Condition()
+        self._stopped = False
+
+    def submit(self, view_proj, eye):
+        """Queue this frame's camera; returns the newest finished mask"""
+        with self._wake:
+            self._request = (np.array(view_proj, dtype=np.float64), tuple(eye))
+            self._wake.notify()
+            return self.mask
+
+    def run(self):
+        while True:
+            with self._wake:
+                while self._request is None and not self._stopped:
+                    self._wake.wait()
+                if self._stopped:
+                    return
+                request, self._request = self._request, None
+            mask = self.culler.visible(*request)
+            with self._wake:
+                self.mask = mask
+                self.stats = dict(self.culler.stats)
+
+    def stop(self):
+        with self._wake:
+            self._stopped = True
+            self._wake.notify()
+        self.join(timeout=1.0)
+
+
+# ============================================
+# 5. BENCHMARK
+# ============================================
+
+def dense_city(extent, seed=0):
+    """The Glades pattern - 6 x 6 tenements every 8 units - over (-extent, extent)"""
+    rng = np.random.default_rng(seed)
+    grid = np.arange(-extent, extent, 8)
+    x, z = np.meshgrid(grid, grid, indexing='ij')
+    x, z = x.ravel().astype(np.float64), z.ravel().astype(np.float64)
+    height = rng.integers(8, 25, len(x)).astype(np.float64)
+    centers = np.stack([x, height / 2, z], axis=1)
+    sizes = np.stack([np.full(len(x), 6.0), height, np.full(len(x), 6.0)], axis=1)
+    return centers, sizes
+
+
+def shipped_city(seed=None):
+    """The buildings scene.StarlingCity actually generates, without a GL context"""
+    from scene import StarlingCity
+    return building_boxes(StarlingCity(None, seed).buildings)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import glm
+
+    parser = argparse.ArgumentParser(description="Occlusion culling cost and culled ratios along a street-level walk")
+    parser.add_argument('--city', choices=('both', 'shipped', 'dense'), default='both',
+                        help="scene.py's own city, a dense Glades grid of --extent, or both")
+    parser.add_argument('--extent', type=int, default=200, help='dense city half-width (the real city is ~50)')
+    parser.add_argument('--frames', type=int, default=240)
+    parser.add_argument('--occluders', type=int, default=OCCLUDERS)
+    parser.add_argument('--resolution', type=int, nargs=2, default=(WIDTH, HEIGHT), metavar=('W', 'H'))
+    parser.add_argument('--thread', action='store_true', help='run the pass on a worker thread')
+    parser.add_argument('--render-ms', type=float, default=8.0,
+                        help='with --thread: time each frame waits on the GPU (the worker runs meanwhile)')
+    args = parser.parse_args()
+
+    def walk(label, centers, sizes, extent):
+        culler = OcclusionCuller(centers, sizes, occluders=args.occluders, resolution=args.resolution)
+        worker = OcclusionWorker(culler) if args.thread else None
+        if worker:
+            worker.start()
+        proj = glm.perspective(glm.radians(65.0), 1280 / 720, 0.1, 500.0)
+        totals = {'frustum_culled': 0, 'occluded': 0, 'visible': 0}
+        costs, blocked = [], []
+        rewrites, last = 0, None
+        for frame in range(args.frames):
+            # Walking down a street (x = 4 lies between building columns), looking around
+            eye = glm.vec3(4.0, 2.0, -extent + frame * (2 * extent / args.frames))
+            yaw = frame * 2 * np.pi / args.frames
+            target = eye + glm.vec3(np.sin(yaw), 0.0, np.cos(yaw))
+            view_proj = np.array(proj * glm.lookAt(eye, target, glm.vec3(0, 1, 0)))
+            start = time.perf_counter()
+            if worker:
+                mask = worker.submit(view_proj, eye)
+                stats = worker.stats
+            else:
+                mask = culler.visible(view_proj, eye)
+                stats = culler.stats
+            blocked.append((time.perf_counter() - start) * 1000.0)
+            costs.append(stats['ms'])
+            for key in totals:
+                totals[key] += stats[key]
+            # BoxInstances rewrites the instance buffer whenever the mask changes
+            if mask is not None and (last is None or not np.array_equal(mask, last)):
+                rewrites += 1
+            last = mask
+            if worker:
+                time.sleep(args.render_ms / 1000.0)   # stand-in for draw calls and the buffer swap
+        if worker:
+            worker.stop()
+        boxes = len(centers) * args.frames
+        print(f"{label}: {len(centers)} buildings, {args.occluders} occluders, "
+              f"{args.resolution[0]}x{args.resolution[1]} depth buffer")
+        print(f"  per frame: {totals['visible'] / args.frames:.0f} drawn, "
+              f"{totals['frustum_culled'] / boxes * 100:.1f}% frustum culled, "
+              f"{totals['occluded'] / boxes * 100:.1f}% occluded")
+        print(f"  pass cost: p50 {np.percentile(costs, 50):.2f} ms, p95 {np.percentile(costs, 95):.2f} ms; "
+              f"render thread blocked {np.mean(blocked):.2f} ms/frame; "
+              f"instance buffer rewritten on {rewrites / args.frames * 100:.0f}% of frames")
+
+    if args.city in ('both', 'shipped'):
+        walk('shipped city', *shipped_city(), 50)
+    if args.city in ('both', 'dense'):
+        walk(f'dense city (extent {args.extent})', *dense_city(args.extent), args.extent)
@@ -0,0 +1,645 @@
+#!/usr/bin/env python3
+"""
+S.P.E.C.I.A.L. perk engine
+Character sheets loaded from declarative data files in characters/, compiled once
+"""
+
+import json
+import os
+import struct
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+SPECIAL = ('S', 'P', 'E', 'C', 'I', 'A', 'L')
+ATTRIBUTE_NAMES = ('Strength', 'Perception', 'Endurance', 'Charisma',
+                   'Intelligence', 'Agility', 'Luck')
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'characters')
+COMPILED_DIR = '.compiled'
+
+# ------------------------- Compiled Format -------------------------
+#
+#   header   : magic, version, perk count, source size and mtime
+#   special  : 7 base attribute values (u1), one pad byte
+#   perks    : PERK records, grouped by attribute in S.P.E.C.I.A.L. order
+#   strings  : UTF-8, NUL-separated: name, actor, perk names, descriptions
+#
+# The cache is rebuilt whenever the source file's size or mtime changes.
+
+MAGIC = b'PERK'
+VERSION = 1
+HEADER = struct.Struct('<4sHHQq')
+
+PERK = np.dtype([
+    ('attribute', 'u1'),           # index into SPECIAL
+    ('max_rank', 'u1'),
+    ('special_value', 'u1'),       # required attribute value
+    ('level_requirement', 'u1'),
+    ('required_perk', '<i2'),      # perk index, -1 for none
+])
+
+
+# ------------------------- Prerequisites -------------------------
+def prerequisite_order(required: np.ndarray, names: List[str]) -> List[int]:
+    """Perk indices with every prerequisite before the perks that need it.
+
+    Prerequisites form a DAG (a forest, with one prerequisite per perk); a
+    cycle raises ValueError naming the perks on it.
+    """
+    order: List[int] = []
+    state = [0] * len(required)         # 0 unvisited, 1 on the current chain, 2 placed
+    for root in range(len(required)):
+        chain = []
+        perk = root
+        while perk >= 0 and state[perk] == 0:
+            state[perk] = 1
+            chain.append(perk)
+            perk = int(required[perk])
+        if perk >= 0 and state[perk] == 1:
+            cycle = chain[chain.index(perk):]
+            raise ValueError("prerequisite cycle (each unlocks the next): " +
+                             ' -> '.join(names[i] for i in reversed(cycle + [perk])))
+        for perk in reversed(chain):
+            state[perk] = 2
+            order.append(perk)
+    return order
+
+
+# ------------------------- PerkTree Class -------------------------
+class PerkTree:
+    """Immutable perk table shared by every character built from one data file."""
+    __slots__ = ('name', 'actor', 'base_special', 'perks', 'perk_names',
+                 'descriptions', 'index', 'attribute_slices', 'order', 'ancestors', 'rules',
+                 'attribute_ancestors', 'lines')
+
+    def __init__(self, name: str, actor: str, base_special: np.ndarray, perks: np.ndarray,
+                 perk_names: List[str], descriptions: List[str]):
+        self.name = name
+        self.actor = actor
+        self.base_special = base_special
+        self.perks = perks
+        self.perk_names = perk_names
+        self.descriptions = descriptions
+        self.index = {perk_name: i for i, perk_name in enumerate(perk_names)}
+        # (attribute, max rank, attribute value, level) per perk as plain
+        # Python values, for checks one perk at a time
+        self.rules = [(SPECIAL[a], max_rank, value, level)
+                      for a, max_rank, value, level, _ in perks.tolist()]
+        bounds = np.searchsorted(perks['attribute'], np.arange(len(SPECIAL) + 1))
+        self.attribute_slices = [(int(bounds[a]), int(bounds[a + 1])) for a in range(len(SPECIAL))]
+        # Transitive prerequisites as bitsets (bit i = perk i), built in
+        # topological order so each perk extends its parent's set
+        self.order = prerequisite_order(perks['required_perk'], perk_names)
+        self.ancestors = [0] * len(perks)
+        for perk in self.order:
+            required = int(perks['required_perk'][perk])
+            if required >= 0:
+                self.ancestors[perk] = self.ancestors[required] | (1 << required)
+        # Every prerequisite any perk under an attribute depends on
+        self.attribute_ancestors = [0] * len(SPECIAL)
+        for a, (first, last) in enumerate(self.attribute_slices):
+            for perk in range(first, last):
+                self.attribute_ancestors[a] |= self.ancestors[perk]
+        self.lines: Dict = {}           # (perk, rank) -> rendered Perk line
+
+    def __len__(self):
+        return len(self.perks)
+
+    def perk_line(self, index: int, rank: int) -> str:
+        """'Name [**o] description', built once per perk and rank."""
+        line = self.lines.get((index, rank))
+        if line is None:
+            stars = '*' * rank + 'o' * (self.rules[index][1] - rank)
+            line = self.lines[(index, rank)] = \
+                f"{self.perk_names[index]} [{stars}] {self.descriptions[index]}"
+        return line
+
+    @classmethod
+    def compile(cls, data: Dict, source: str = 'perk data') -> 'PerkTree':
+        """Parsed data file -> PerkTree, validating every field."""
+        special = data.get('special', {})
+        if sorted(special) != sorted(SPECIAL):
+            raise ValueError(f"{source}: 'special' must give exactly {', '.join(SPECIAL)}")
+        rows, names, descriptions, requires = [], [], [], []
+        for a, short in enumerate(SPECIAL):
+            for perk in data.get('perks', {}).get(short, []):
+                rows.append((a, perk.get('max_rank', 1), perk['special'], perk.get('level', 1), -1))
+                names.append(perk['name'])
+                descriptions.append(perk.get('description', ''))
+                requires.append(perk.get('requires'))
+        unknown = set(data.get('perks', {})) - set(SPECIAL)
+        if unknown:
+            raise ValueError(f"{source}: unknown attribute(s) {', '.join(sorted(unknown))}")
+        if len(set(names)) != len(names):
+            raise ValueError(f"{source}: perk names must be unique")
+
+        perks = np.array(rows, dtype=PERK)
+        index = {perk_name: i for i, perk_name in enumerate(names)}
+        for i, required in enumerate(requires):
+            if required is not None:
+                if required not in index:
+                    raise ValueError(f"{source}: {names[i]!r} requires unknown perk {required!r}")
+                perks['required_perk'][i] = index[required]
+        try:
+            prerequisite_order(perks['required_perk'], names)
+        except ValueError as error:
+            raise ValueError(f"{source}: {error}") from None
+        base = np.array([special[short] for short in SPECIAL], dtype=np.uint8)
+        if base.min() < 1 or base.max() > 10:
+            raise ValueError(f"{source}: S.P.E.C.I.A.L. values must be 1-10")
+        return cls(data['name'], data.get('actor', ''), base, perks, names, descriptions)
+
+    def to_bytes(self, source_size: int = 0, source_mtime: int = 0) -> bytes:
+        strings = '\0'.join([self.name, self.actor] + self.perk_names + self.descriptions)
+        return b''.join([
+            HEADER.pack(MAGIC, VERSION, len(self.perks), source_size, source_mtime),
+            self.base_special.tobytes(), b'\0',
+            self.perks.tobytes(),
+            strings.encode('utf-8'),
+        ])
+
+    @classmethod
+    def from_bytes(cls, buf: bytes) -> 'PerkTree':
+        magic, version, count, _, _ = HEADER.unpack_from(buf)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a compiled perk tree of this version")
+        pos = HEADER.size
+        base = np.frombuffer(buf, np.uint8, len(SPECIAL), pos)
+        pos += len(SPECIAL) + 1
+        perks = np.frombuffer(buf, PERK, count, pos)
+        pos += perks.nbytes
+        strings = buf[pos:].decode('utf-8').split('\0')
+        return cls(strings[0], strings[1], base, perks,
+                   strings[2:2 + count], strings[2 + count:2 + 2 * count])
+
+
+_trees: Dict[str, PerkTree] = {}
+
+
+def _compiled_path(path: str) -> str:
+    folder, filename = os.path.split(os.path.abspath(path))
+    return os.path.join(folder, COMPILED_DIR, os.path.splitext(filename)[0] + '.perks')
+
+
+def load_tree(path: str) -> PerkTree:
+    """Data file -> PerkTree: from memory, else the compiled cache, else compile it."""
+    path = os.path.abspath(path)
+    tree = _trees.get(path)
+    if tree is not None:
+        return tree
+
+    stat = os.stat(path)
+    compiled = _compiled_path(path)
+    try:
+        with open(compiled, 'rb') as f:
+            buf = f.read()
+        _, version, _, size, mtime = HEADER.unpack_from(buf)
+        if (size, mtime) == (stat.st_size, stat.st_mtime_ns):
+            tree = PerkTree.from_bytes(buf)
+    except (OSError, ValueError, struct.error):
+        tree = None
+
+    if tree is None:
+        with open(path, encoding='utf-8') as f:
+            tree = PerkTree.compile(json.load(f), path)
+        try:
+            os.makedirs(os.path.dirname(compiled), exist_ok=True)
+            partial = compiled + '.part'
+            with open(partial, 'wb') as f:
+                f.write(tree.to_bytes(stat.st_size, stat.st_mtime_ns))
+            os.replace(partial, compiled)
+        except OSError:
+            pass  # read-only install: compile every run instead
+
+    _trees[path] = tree
+    return tree
+
+
+def character_path(name: str) -> str:
+    """'Felicity Smoak' -> characters/felicity_smoak.json"""
+    return os.path.join(DATA_DIR, name.lower().replace(' ', '_') + '.json')
+
+
+# ------------------------- Perk Class -------------------------
+class Perk:
+    """A single perk in a character's tree (shared definition, per-character rank)."""
+    __slots__ = ('character', 'index')
+
+    def __init__(self, character: 'Character', index: int):
+        self.character = character
+        self.index = index
+
+    @property
+    def _row(self):
+        return self.character.tree.perks[self.index]
+
+    @property
+    def name(self) -> str:
+        return self.character.tree.perk_names[self.index]
+
+    @property
+    def description(self) -> str:
+        return self.character.tree.descriptions[self.index]
+
+    @property
+    def rank(self) -> int:
+        return int(self.character.ranks[self.index])
+
+    @property
+    def max_rank(self) -> int:
+        return int(self._row['max_rank'])
+
+    @property
+    def special_requirement(self) -> str:
+        return SPECIAL[self._row['attribute']]
+
+    @property
+    def special_value(self) -> int:
+        return int(self._row['special_value'])
+
+    @property
+    def level_requirement(self) -> int:
+        return int(self._row['level_requirement'])
+
+    @property
+    def required_perk(self) -> Optional['Perk']:
+        required = int(self._row['required_perk'])
+        return Perk(self.character, required) if required >= 0 else None
+
+    def can_take(self, character: Optional['Character'] = None) -> bool:
+        """Check if character (default: the perk's owner) meets requirements for next rank."""
+        return (character or self.character).can_take(self.index)
+
+    def take_rank(self):
+        """Increase rank by one."""
+        if self.rank < self.max_rank:
+            self.character.set_rank(self.index, self.rank + 1)
+
+    def __str__(self):
+        return self.character.tree.perk_line(self.index, self.rank)
+
+
+# ------------------------- SpecialAttribute Class -------------------------
+class SpecialAttribute:
+    """One of the seven S.P.E.C.I.A.L. attributes."""
+    __slots__ = ('name', 'short', '_value', 'perks', 'owner', 'version')
+
+    def __init__(self, name: str, short: str, value: int, perks: List[Perk],
+                 owner: Optional['Character'] = None):
+        self.name = name
+        self.short = short
+        self._value = value
+        self.perks = perks              # list of perks under this attribute
+        self.owner = owner              # character told about changes
+        self.version = 0                # bumped by value and perk rank changes under it
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+    @value.setter
+    def value(self, value: int):
+        old, self._value = self._value, value
+        self.version += 1
+        if self.owner is not None and old != value:
+            self.owner.version += 1
+            if self.owner.eligibility is not None:
+                self.owner.eligibility.attribute_changed(SPECIAL.index(self.short), old, value)
+
+    def increase(self):
+        """Increase attribute by one (max 10)."""
+        if self.value < 10:
+            self.value += 1
+
+    def __str__(self):
+        return f"{self.short}: {self.value}"
+
+
+# ------------------------- Character Class -------------------------
+class Character:
+    """A character sheet: a shared PerkTree plus this character's progress."""
+
+    def __init__(self, tree: PerkTree):
+        self.tree = tree
+        self.name = tree.name
+        self.actor = tree.actor
+        self.eligibility = None         # EligibilityIndex kept in step with every change
+        self.version = 0                # bumped by every level, attribute and rank change
+        self._text: Dict[str, Tuple[int, str]] = {}        # short -> (attribute version, block)
+        self._data: Dict[str, Tuple[Tuple, Dict]] = {}     # short -> (state key, block)
+        self._level = 1
+        self.xp = 0
+        self.perk_points = 0
+        self.ranks = np.zeros(len(tree), dtype=np.uint8)
+        self.unlocked = 0               # bitset of perks with at least one rank
+        self.special = {
+            short: SpecialAttribute(ATTRIBUTE_NAMES[a], short, int(tree.base_special[a]),
+                                    [Perk(self, i) for i in range(*tree.attribute_slices[a])],
+                                    self)
+            for a, short in enumerate(SPECIAL)
+        }
+
+    @property
+    def level(self) -> int:
+        return self._level
+
+    @level.setter
+    def level(self, level: int):
+        old, self._level = self._level, level
+        self.version += 1
+        if self.eligibility is not None and old != level:
+            self.eligibility.level_changed(old, level)
+
+    def set_rank(self, index: int, rank: int):
+        """Set a perk's rank; the one way ranks should change."""
+        old = int(self.ranks[index])
+        self.ranks[index] = rank
+        self.version += 1
+        self.special[self.tree.rules[index][0]].version += 1
+        if rank:
+            self.unlocked |= 1 << index
+        else:
+            self.unlocked &= ~(1 << index)
+        if self.eligibility is not None and old != rank:
+            self.eligibility.rank_changed(index, old, rank)
+
+    @classmethod
+    def load(cls, name_or_path: str) -> 'Character':
+        """A character by name ('Oliver Queen') or by data file path."""
+        path = name_or_path if name_or_path.endswith('.json') else character_path(name_or_path)
+        return cls(load_tree(path))
+
+    def can_take(self, index: int) -> bool:
+        """Check if this character meets the requirements for perk index's next rank."""
+        attribute, max_rank, special_value, level_requirement = self.tree.rules[index]
+        if self.ranks[index] >= max_rank:
+            return False
+        if self.special[attribute].value < special_value:
+            return False
+        if self.level < level_requirement:
+            return False
+        ancestors = self.tree.ancestors[index]
+        return (self.unlocked & ancestors) == ancestors
+
+    def gain_level(self):
+        """level_up without the console output."""
+        self.level += 1
+        self.perk_points += 1
+
+    def spend_on_perk(self, index: int) -> bool:
+        """Spend a perk point on perk index's next rank, if allowed."""
+        if self.perk_points <= 0 or not self.can_take(index):
+            return False
+        self.set_rank(index, int(self.ranks[index]) + 1)
+        self.perk_points -= 1
+        return True
+
+    def spend_on_attribute(self, short: str) -> bool:
+        """Spend a perk point on +1 to an attribute below 10."""
+        attribute = self.special[short]
+        if self.perk_points <= 0 or attribute.value >= 10:
+            return False
+        attribute.value += 1
+        self.perk_points -= 1
+        return True
+
+    # ------------------------- Methods -------------------------
+    def level_up(self):
+        """Increase level by one and grant a perk point."""
+        self.gain_level()
+        print(f"\n>>> Level up! Now level {self.level}. You have {self.perk_points} perk point(s).")
+
+    def show_special(self):
+        """Display S.P.E.C.I.A.L. stats."""
+        print("\n" + "="*50)
+        print(f"{self.name} (played by {self.actor}) - Level {self.level}")
+        print("="*50)
+        for key in SPECIAL:
+            print(f"  {self.special[key]}")
+        print(f"\nPerk Points: {self.perk_points}")
+
+    def show_perks(self, attr_short: Optional[str] = None):
+        """Show perk tree for given attribute, or all if None."""
+        if attr_short:
+            attr = self.special.get(attr_short.upper())
+            if attr:
+                self._display_perk_tree(attr)
+            else:
+                print("Invalid attribute. Use S,P,E,C,I,A,L")
+        else:
+            for key in SPECIAL:
+                self._display_perk_tree(self.special[key])
+
+    def _display_perk_tree(self, attr: SpecialAttribute):
+        """Helper to display perks under one attribute."""
+        print(self.perk_tree_text(attr.short))
+
+    # ------------------------- Rendering -------------------------
+    def _build_perk_block(self, attr: SpecialAttribute) -> str:
+        tree = self.tree
+        lines = [f"\n--- {attr.name} ({attr.short}: {attr.value}) ---"]
+        for perk in attr.perks:
+            i = perk.index
+            short, _, special_value, level_requirement = tree.rules[i]
+            req = f"[{short}:{special_value}] Lv.{level_requirement}"
+            required = int(tree.perks['required_perk'][i])
+            if required >= 0:
+                req += f" requires {tree.perk_names[required]}"
+            lines.append(f"  {tree.perk_line(i, int(self.ranks[i]))} {req}")
+        return '\n'.join(lines)
+
+    def perk_tree_text(self, attr_short: Optional[str] = None) -> str:
+        """show_perks output as a string; each attribute rebuilt only when it changed."""
+        blocks = []
+        for short in (SPECIAL if attr_short is None else (attr_short,)):
+            attr = self.special[short]
+            cached = self._text.get(short)
+            if cached is None or cached[0] != attr.version:
+                cached = self._text[short] = (attr.version, self._build_perk_block(attr))
+            blocks.append(cached[1])
+        return '\n'.join(blocks)
+
+    def _build_perk_data(self, attr: SpecialAttribute) -> Dict:
+        tree = self.tree
+        perks = []
+        for perk in attr.perks:
+            i = perk.index
+            short, max_rank, special_value, level_requirement = tree.rules[i]
+            required = int(tree.perks['required_perk'][i])
+            perks.append({'name': tree.perk_names[i], 'attribute': short, 'rank': int(self.ranks[i]),
+                          'max_rank': max_rank, 'special': special_value, 'level': level_requirement,
+                          'requires': tree.perk_names[required] if required >= 0 else None,
+                          'available': self.can_take(i)})
+        return {'attribute': attr.name, 'short': attr.short, 'value': attr.value, 'perks': perks}
+
+    def perk_tree_data(self, attr_short: Optional[str] = None) -> List[Dict]:
+        """The perk tree as JSON-ready dicts, per attribute; shared, treat as read-only.
+
+        Availability also depends on level and on prerequisites under other
+        attributes, so those are part of each block's cache key.
+        """
+        blocks = []
+        for short in (SPECIAL if attr_short is None else (attr_short,)):
+            attr = self.special[short]
+            key = (attr.version, self.level,
+                   self.unlocked & self.tree.attribute_ancestors[SPECIAL.index(short)])
+            cached = self._data.get(short)
+            if cached is None or cached[0] != key:
+                cached = self._data[short] = (key, self._build_perk_data(attr))
+            blocks.append(cached[1])
+        return blocks
+
+    def assign_perk(self, attr_short: str, perk_index: int):
+        """
+        Attempt to assign a perk point to the given perk.
+        perk_index: 0-based index within that attribute's perk list.
+        """
+        attr = self.special.get(attr_short.upper())
+        if not attr:
+            print("Invalid attribute.")
+            return False
+        if perk_index < 0 or perk_index >= len(attr.perks):
+            print("Invalid perk index.")
+            return False
+
+        perk = attr.perks[perk_index]
+        if perk.can_take(self):
+            perk.take_rank()
+            self.perk_points -= 1
+            print(f"Perk assigned: {perk.name} now at rank {perk.rank}/{perk.max_rank}")
+            return True
+        else:
+            print("Cannot take this perk. Check requirements.")
+            return False
+
+    # ------------------------- Pip-Boy Simulation -------------------------
+    def run_pipboy(self):
+        """Simple interactive menu."""
+        while True:
+            print("\n" + "="*50)
+            print(f"PIP-BOY 3000 - {self.name.upper()}")
+            print("="*50)
+            print("1. Show S.P.E.C.I.A.L.")
+            print("2. Show all perks")
+            print("3. Show perks for an attribute")
+            print("4. Level up (simulate)")
+            print("5. Assign perk point")
+            print("6. Exit")
+            choice = input("Choose an option: ").strip()
+
+            if choice == '1':
+                self.show_special()
+            elif choice == '2':
+                self.show_perks()
+            elif choice == '3':
+                a = input("Enter attribute (S,P,E,C,I,A,L): ").upper()
+                self.show_perks(a)
+            elif choice == '4':
+                self.level_up()
+            elif choice == '5':
+                if self.perk_points <= 0:
+                    print("You have no perk points. Level up first.")
+                    continue
+                attr = input("Attribute (S,P,E,C,I,A,L): ").upper()
+                if attr not in self.special:
+                    print("Invalid.")
+                    continue
+                print("Available perks:")
+                for idx, p in enumerate(self.special[attr].perks):
+                    print(f"  {idx}: {p}")
+                try:
+                    idx = int(input("Enter perk number: "))
+                except ValueError:
+                    print("Invalid number.")
+                    continue
+                self.assign_perk(attr, idx)
+            elif choice == '6':
+                print("Returning to the real world...")
+                break
+            else:
+                print("Invalid choice.")
+
+
+# ------------------------- Roster Benchmark -------------------------
+def synthetic_roster(folder: str, count: int, perks_per_attribute: int = 5, seed: int = 0):
+    """Write count random character data files shaped like the real ones."""
+    rng = np.random.default_rng(seed)
+    paths = []
+    for c in range(count):
+        data = {
+            'name': f"Character {c}",
+            'actor': f"Actor {c}",
+            'special': {short: int(v) for short, v in zip(SPECIAL, rng.integers(1, 11, 7))},
+            'perks': {
+                short: [
+                    {'name': f"{short} Perk {p}", 'description': f"Does thing {p} better per rank",
+                     'max_rank': int(rng.integers(1, 4)), 'special': int(min(10, 2 + 2 * p)),
+                     'level': int(1 + 5 * p),
+                     **({'requires': f"{short} Perk {p - 1}"} if p and rng.random() < 0.3 else {})}
+                    for p in range(perks_per_attribute)
+                ]
+                for short in SPECIAL
+            },
+        }
+        path = os.path.join(folder, f"character_{c}.json")
+        with open(path, 'w') as f:
+            json.dump(data, f)
+        paths.append(path)
+    return paths
+
+
+if __name__ == "__main__":
+    import argparse
+    import shutil
+    import tempfile
+
+    parser = argparse.ArgumentParser(description="Pip-Boy for any character, or a roster load benchmark")
+    parser.add_argument('character', nargs='?', default='Oliver Queen')
+    parser.add_argument('--bench', type=int, metavar='N', help='time loading N synthetic characters')
+    parser.add_argument('--render', type=int, metavar='N', help='time N perk tree reads, 1 edit per 50')
+    args = parser.parse_args()
+
+    if args.render:
+        rng = np.random.default_rng(0)
+        tree = load_tree(character_path(args.character))
+        script = [(int(c), int(kind), int(target)) for c, kind, target in
+                  zip(rng.integers(0, 100, args.render), rng.integers(0, 50, args.render),
+                      rng.integers(0, len(tree), args.render))]
+        for label in ('rebuilt per read', 'cached per version'):
+            roster = [Character(tree) for _ in range(100)]
+            start = time.perf_counter()
+            for c, kind, target in script:
+                character = roster[c]
+                if kind == 0:
+                    character.gain_level()
+                    character.spend_on_perk(target)
+                elif label == 'rebuilt per read':
+                    '\n'.join(character._build_perk_block(character.special[short]) for short in SPECIAL)
+                    [character._build_perk_data(character.special[short]) for short in SPECIAL]
+                else:
+                    character.perk_tree_text()
+                    character.perk_tree_data()
+            elapsed = time.perf_counter() - start
+            print(f"{label:>18}: {args.render} operations in {elapsed * 1000:7.0f} ms "
+                  f"({elapsed / args.render * 1e6:.1f} us each, text + JSON tree per read)")
+    elif not args.bench:
+        Character.load(args.character).run_pipboy()
+    else:
+        folder = tempfile.mkdtemp(prefix='arrow_roster_')
+        try:
+            paths = synthetic_roster(folder, args.bench)
+            for label in ('cold (compile)', 'warm (cached)'):
+                _trees.clear()
+                start = time.perf_counter()
+                roster = [Character(load_tree(path)) for path in paths]
+                elapsed = time.perf_counter() - start
+                print(f"{label:>16}: {len(roster)} characters in {elapsed * 1000:7.1f} ms "
+                      f"({elapsed / len(roster) * 1e6:.0f} us each)")
+            start = time.perf_counter()
+            roster = [Character(load_tree(path)) for path in paths]
+            elapsed = time.perf_counter() - start
+            print(f"{'shared tree':>16}: {len(roster)} characters in {elapsed * 1000:7.1f} ms")
+        finally:
+            shutil.rmtree(folder)
@@ -12,6 +12,8 @@ import nltk
 from nltk.tokenize import sent_tokenize, word_tokenize
 from nltk.corpus import stopwords
 
+from relationships import EpisodeTimeline, RelationshipGraph, parse_episode
+
 class ARROWRelationshipCrawler:
     """
     Web crawler to analyze character relationships in the TV show ARROW
@@ -52,6 +54,8 @@ class ARROWRelationshipCrawler:
         }
         
         self.relationships = defaultdict(lambda: defaultdict(lambda: defaultdict(int)))
+        self.graph = RelationshipGraph()   # same counts, for path and centrality queries
+        self.timeline = EpisodeTimeline()  # and by season/episode, for reviews that name one
         self.visited_urls = set()
         self.session = requests.Session()
         self.session.headers.update({
@@ -183,8 +187,10 @@ class ARROWRelationshipCrawler:
             article = soup.find('article') or soup.find('div', {'class': 'entry-content'}) or soup
             paragraphs = article.find_all('p')
             
+            episode = parse_episode(url)
             episode_data = {
                 'url': url,
+                'episode': episode,
                 'character_interactions': defaultdict(lambda: defaultdict(int)),
                 'relationship_mentions': []
             }
@@ -215,6 +221,9 @@ class ARROWRelationshipCrawler:
                             # Update global relationships
                             self.relationships[rel[0]][rel[1]][rel[2]] += 1
                             self.relationships[rel[1]][rel[0]][rel[2]] += 1
+                            self.graph.add(rel[0], rel[1], rel[2])
+                            if episode is not None:
+                                self.timeline.add(rel[0], rel[1], rel[2], episode)
             
             return episode_data
             
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+S.P.E.C.I.A.L. Pip-Boy batch interface
+Streams of character edits and queries applied without the menu, as JSON lines or binary
+"""
+
+import json
+import struct
+import sys
+import time
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+from eligibility import EligibilityIndex
+from perks import SPECIAL, Character
+
+# ------------------------- Operations -------------------------
+#
+# JSON lines, one request per line, one response line per request:
+#
+#   {"op": "level_up", "character": "Oliver Queen"}
+#   {"op": "assign", "perk": "Quick Draw"}          or "attr": "A", "index": 0
+#   {"op": "increase", "attr": "P"}                 spends a point, as in the planner
+#   {"op": "query", "view": "sheet" | "special" | "perks" | "available"}
+#
+# "character" is a roster name or slot (default slot 0); an "id" is echoed.
+# A name that appears more than once in the roster is rejected as ambiguous.
+#
+# Binary: a header, then fixed OP records; the response is a header and one
+# RESULT record per op. Perks are tree indices, attributes SPECIAL indices,
+# and a binary query returns the number of perks available in 'value'.
+
+LEVEL_UP, ASSIGN, INCREASE, QUERY = 1, 2, 3, 4
+OPCODES = {'level_up': LEVEL_UP, 'assign': ASSIGN, 'increase': INCREASE, 'query': QUERY}
+
+OK, NO_POINTS, NOT_ALLOWED, BAD_REQUEST = 0, 1, 2, 3
+STATUS_NAMES = ('ok', 'no_points', 'not_allowed', 'bad_request')
+
+MAGIC = b'PIPB'
+VERSION = 1
+HEADER = struct.Struct('<4sHI')      # magic, version, record count
+
+OP = np.dtype([
+    ('character', '<u2'),           # roster slot
+    ('op', 'u1'),
+    ('attribute', 'u1'),            # index into SPECIAL
+    ('perk', '<u2'),                # tree index
+])
+
+RESULT = np.dtype([
+    ('status', 'u1'),
+    ('pad', 'u1'),
+    ('value', '<u2'),               # new level / rank / attribute value, or perks available
+    ('level', '<u2'),
+    ('points', '<u2'),
+])
+
+
+# ------------------------- Views -------------------------
+def special_view(character: Character) -> Dict[str, int]:
+    return {short: character.special[short].value for short in SPECIAL}
+
+
+def perks_view(character: Character) -> List[Dict]:
+    return [perk for block in character.perk_tree_data() for perk in block['perks']]
+
+
+def available_view(character: Character) -> List[str]:
+    if character.eligibility is None:
+        EligibilityIndex(character)
+    return character.eligibility.names()
+
+
+def sheet_view(character: Character) -> Dict:
+    return {'name': character.name, 'actor': character.actor, 'level': character.level,
+            'perk_points': character.perk_points, 'special': special_view(character)}
+
+
+VIEWS = {'sheet': sheet_view, 'special': special_view, 'perks': perks_view,
+         'available': available_view}
+
+
+# ------------------------- Session Class -------------------------
+class Session:
+    """A roster of characters and the batch operations applied to them."""
+
+    def __init__(self, characters: Iterable[Character]):
+        self.roster: List[Character] = list(characters)
+        # Names that occur once address their slot; a name shared by several
+        # slots is ambiguous and those characters are addressed by slot only.
+        self.slots: Dict[str, int] = {}
+        self.ambiguous = set()
+        for slot, character in enumerate(self.roster):
+            if character.name in self.slots:
+                self.ambiguous.add(character.name)
+            self.slots.setdefault(character.name, slot)
+        for name in self.ambiguous:
+            del self.slots[name]
+
+    @classmethod
+    def load(cls, names: Iterable[str]) -> 'Session':
+        return cls(Character.load(name) for name in names)
+
+    def execute(self, slot: int, op: int, attribute: int = 0, perk: int = 0) -> Tuple[int, int]:
+        """One operation -> (status, value); no console output."""
+        if slot >= len(self.roster):
+            return BAD_REQUEST, 0
+        character = self.roster[slot]
+        if op == LEVEL_UP:
+            character.gain_level()
+            return OK, character.level
+        if op == ASSIGN:
+            if perk >= len(character.tree):
+                return BAD_REQUEST, 0
+            if character.perk_points <= 0:
+                return NO_POINTS, int(character.ranks[perk])
+            if not character.spend_on_perk(perk):
+                return NOT_ALLOWED, int(character.ranks[perk])
+            return OK, int(character.ranks[perk])
+        if op == INCREASE:
+            if attribute >= len(SPECIAL):
+                return BAD_REQUEST, 0
+            short = SPECIAL[attribute]
+            if character.perk_points <= 0:
+                return NO_POINTS, character.special[short].value
+            if not character.spend_on_attribute(short):
+                return NOT_ALLOWED, character.special[short].value
+            return OK, character.special[short].value
+        if op == QUERY:
+            if character.eligibility is None:
+                EligibilityIndex(character)
+            return OK, len(character.eligibility.available)
+        return BAD_REQUEST, 0
+
+    # ------------------------- Binary -------------------------
+    def run_binary(self, request: bytes) -> bytes:
+        """Header + OP records in, header + RESULT records out."""
+        magic, version, count = HEADER.unpack_from(request)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a Pip-Boy batch of this version")
+        ops = np.frombuffer(request, OP, count, HEADER.size)
+        results = np.zeros(count, RESULT)
+        rows = []
+        execute = self.execute
+        roster = self.roster
+        for slot, op, attribute, perk in ops.tolist():
+            status, value = execute(slot, op, attribute, perk)
+            character = roster[slot] if slot < len(roster) else None
+            rows.append((status, 0, min(value, 0xFFFF),
+                         min(character.level, 0xFFFF) if character else 0,
+                         min(max(character.perk_points, 0), 0xFFFF) if character else 0))
+        results[:] = rows
+        return HEADER.pack(MAGIC, VERSION, count) + results.tobytes()
+
+    # ------------------------- JSON Lines -------------------------
+    def _decode(self, request: Dict) -> Tuple[int, int, int, int]:
+        name = request.get('character', 0)
+        if isinstance(name, bool):
+            raise ValueError("character is a slot number or a name")
+        if isinstance(name, int) and name >= 0:
+            slot = name
+        elif isinstance(name, str) and name in self.ambiguous:
+            raise ValueError(f"{name!r} names more than one slot; address it by slot number")
+        else:
+            slot = self.slots.get(name, len(self.roster)) if isinstance(name, str) else len(self.roster)
+        op = request.get('op')
+        if not isinstance(op, str):
+            raise ValueError("op must be a string")
+        op = OPCODES.get(op, 0)
+        attr = request.get('attr')
+        attribute = SPECIAL.index(attr.upper()) if isinstance(attr, str) and attr.upper() in SPECIAL else 0xFF
+        perk = 0xFFFF
+        if op == ASSIGN and slot < len(self.roster):
+            tree = self.roster[slot].tree
+            named = request.get('perk')
+            if isinstance(named, str):
+                perk = tree.index.get(named, 0xFFFF)
+            elif isinstance(named, int) and not isinstance(named, bool) and named >= 0:
+                perk = named
+            elif (attribute != 0xFF and isinstance(request.get('index'), int)
+                  and not isinstance(request['index'], bool)):
+                # assign_perk's addressing: nth perk under an attribute
+                first, last = tree.attribute_slices[attribute]
+                if 0 <= request['index'] < last - first:
+                    perk = first + request['index']
+        return slot, op, attribute, perk
+
+    def run_json(self, lines: Iterable[str]) -> Iterator[str]:
+        """JSON request lines in, JSON response lines out, in order."""
+        decode = _decoder.decode
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                request = decode(line)
+                if not isinstance(request, dict):
+                    raise ValueError("a request is a JSON object")
+                slot, op, attribute, perk = self._decode(request)
+            except ValueError as error:
+                yield json.dumps({'ok': False, 'status': 'bad_request', 'error': str(error)})
+                continue
+            status, value = self.execute(slot, op, attribute, perk)
+            # Edit replies are flat ints and fixed strings: format them from
+            # a per-status prefix instead of building and encoding a dict.
+            echo = ', "id": ' + json.dumps(request['id']) if 'id' in request else ''
+            if slot >= len(self.roster) or status == BAD_REQUEST:
+                yield _REPLY_HEADS[status] + echo + '}'
+                continue
+            character = self.roster[slot]
+            counts = f'{echo}, "level": {character.level}, "points": {character.perk_points}, "value": {value}'
+            if op != QUERY:
+                yield _REPLY_HEADS[status] + counts + '}'
+                continue
+            view = request.get('view', 'sheet')
+            view = VIEWS.get(view) if isinstance(view, str) else None
+            if view is None:
+                yield _REPLY_HEADS[BAD_REQUEST] + counts + ', "error": "unknown view"}'
+            else:
+                yield _REPLY_HEADS[status] + counts + ', "view": ' + json.dumps(view(character)) + '}'
+
+
+_decoder = json.JSONDecoder()
+_REPLY_HEADS = tuple('{"ok": %s, "status": "%s"' % ('true' if status == OK else 'false', name)
+                     for status, name in enumerate(STATUS_NAMES))
+
+def pack_ops(ops: np.ndarray) -> bytes:
+    """OP records -> a binary request."""
+    return HEADER.pack(MAGIC, VERSION, len(ops)) + np.ascontiguousarray(ops, OP).tobytes()
+
+
+def unpack_results(response: bytes) -> np.ndarray:
+    _, _, count = HEADER.unpack_from(response)
+    return np.frombuffer(response, RESULT, count, HEADER.size)
+
+
+# ------------------------- Benchmark -------------------------
+def random_ops(session: Session, count: int, seed: int = 0) -> np.ndarray:
+    """A level-up / assign / increase / query mix over the whole roster."""
+    rng = np.random.default_rng(seed)
+    ops = np.zeros(count, OP)
+    ops['character'] = rng.integers(0, len(session.roster), count)
+    ops['op'] = rng.choice([LEVEL_UP, ASSIGN, INCREASE, QUERY], count, p=[0.25, 0.5, 0.05, 0.2])
+    ops['attribute'] = rng.integers(0, len(SPECIAL), count)
+    ops['perk'] = rng.integers(0, len(session.roster[0].tree), count)
+    return ops
+
+
+def ops_to_json(session: Session, ops: np.ndarray) -> List[str]:
+    names = {op: name for name, op in OPCODES.items()}
+    lines = []
+    for slot, op, attribute, perk in ops.tolist():
+        request = {'op': names[op], 'character': slot}
+        if op == ASSIGN:
+            request['perk'] = session.roster[slot].tree.perk_names[perk]
+        elif op == INCREASE:
+            request['attr'] = SPECIAL[attribute]
+        elif op == QUERY:
+            request['view'] = 'available'
+        lines.append(json.dumps(request))
+    return lines
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Apply Pip-Boy operations from stdin, or benchmark them")
+    parser.add_argument('characters', nargs='*', default=['Oliver Queen'])
+    parser.add_argument('--binary', action='store_true', help='stdin/stdout carry the binary format')
+    parser.add_argument('--bench', type=int, metavar='N', help='time N random operations')
+    parser.add_argument('--roster', type=int, default=100, help='characters in the benchmark roster')
+    args = parser.parse_args()
+
+    if not args.bench:
+        session = Session.load(args.characters)
+        if args.binary:
+            sys.stdout.buffer.write(session.run_binary(sys.stdin.buffer.read()))
+        else:
+            for response in session.run_json(sys.stdin):
+                sys.stdout.write(response + '\n')
+    else:
+        for label in ('binary', 'json lines'):
+            session = Session.load([args.characters[0]] * args.roster)
+            ops = random_ops(session, args.bench)
+            if label == 'binary':
+                request = pack_ops(ops)
+                start = time.perf_counter()
+                results = unpack_results(session.run_binary(request))
+                elapsed = time.perf_counter() - start
+                statuses = np.bincount(results['status'], minlength=len(STATUS_NAMES))
+            else:
+                lines = ops_to_json(session, ops)
+                start = time.perf_counter()
+                responses = list(session.run_json(lines))
+                elapsed = time.perf_counter() - start
+                statuses = np.zeros(len(STATUS_NAMES), dtype=int)
+                for response in responses:
+                    statuses[STATUS_NAMES.index(json.loads(response)['status'])] += 1
+            print(f"{label:>10}: {args.bench} ops in {elapsed * 1000:6.0f} ms = "
+                  f"{args.bench / elapsed / 1000:6.0f}k ops/s  "
+                  + ', '.join(f"{name} {n}" for name, n in zip(STATUS_NAMES, statuses)))
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+S.P.E.C.I.A.L. build planner
+Lowest-level order of perk points that reaches a set of target perks
+"""
+
+import heapq
+import time
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from perks import SPECIAL, Character, PerkTree
+
+# ------------------------- Model -------------------------
+#
+# Every level up grants one perk point (Character.level_up). A point buys the
+# next rank of a perk whose requirements are met (Character.can_take) or +1
+# on an attribute below 10, as in population.py. With banking, points may be
+# saved for later levels, as the Pip-Boy allows; without it every point has
+# to be spent at the level that granted it, wasted if nothing useful is open.
+#
+# Only "items" that matter are tracked: the targets, their prerequisites
+# (transitively) and the attributes they need raised. An item's progress is a
+# perk rank or an attribute value, and a search state is
+#
+#   (level, points in hand, progress of every item)
+#
+# searched best-first on final level (A*) with
+#
+#   * memoization: one Pareto front of (level, points, order floor) per
+#     progress vector; a state no better than one already seen is dropped
+#   * an admissible bound: remaining points still to earn, the highest level
+#     requirement left, and without banking, one point per level from then on
+#   * an incumbent from a greedy plan; if it already meets the root bound
+#     the search is skipped altogether
+#   * order reduction: items are numbered so enablers come first, and points
+#     spent within one level go in non-decreasing item order
+
+Action = Tuple[int, str, str, int]   # (level, 'perk' | 'special', name, new rank / value)
+
+
+class Plan:
+    """Result of plan_build: the actions, level by level."""
+
+    def __init__(self, level: int, actions: List[Action], expanded: int, seconds: float):
+        self.level = level            # level at which every target is held
+        self.actions = actions
+        self.expanded = expanded      # search nodes expanded, 0 if greedy was optimal
+        self.seconds = seconds
+
+    def by_level(self) -> Dict[int, List[Action]]:
+        levels: Dict[int, List[Action]] = {}
+        for action in self.actions:
+            levels.setdefault(action[0], []).append(action)
+        return levels
+
+    def apply(self, character: Character):
+        """Play the plan on a character, checking every step against its rules."""
+        for level, kind, name, value in self.actions:
+            while character.level < level:
+                character.level += 1
+                character.perk_points += 1
+            if character.perk_points <= 0:
+                raise ValueError(f"level {level}: no perk point left for {name}")
+            if kind == 'perk':
+                index = character.tree.index[name]
+                if not character.can_take(index):
+                    raise ValueError(f"level {level}: cannot take {name}")
+                character.set_rank(index, int(character.ranks[index]) + 1)
+            else:
+                attribute = character.special[name]
+                if attribute.value >= 10:
+                    raise ValueError(f"level {level}: {name} is already 10")
+                attribute.value += 1
+            character.perk_points -= 1
+        while character.level < self.level:
+            character.level += 1
+            character.perk_points += 1
+
+    def __str__(self):
+        lines = [f"Level {self.level} ({len(self.actions)} points, "
+                 f"{self.expanded} nodes, {self.seconds * 1000:.1f} ms)"]
+        for level, actions in sorted(self.by_level().items()):
+            steps = ', '.join(f"{name} {'rank ' if kind == 'perk' else ''}{value}"
+                              for _, kind, name, value in actions)
+            lines.append(f"  Lv.{level:>3}: {steps}")
+        return '\n'.join(lines)
+
+
+# ------------------------- Items -------------------------
+class _Items:
+    """The perks and attributes a set of targets depends on, in enabling order."""
+
+    def __init__(self, tree: PerkTree, targets: Dict[int, int], special: List[int],
+                 ranks: List[int]):
+        perks = tree.perks
+        goal: Dict[int, int] = {}
+
+        def need(index: int, rank: int):
+            if rank > int(perks['max_rank'][index]):
+                raise ValueError(f"{tree.perk_names[index]} only has "
+                                 f"{int(perks['max_rank'][index])} rank(s)")
+            if goal.get(index, 0) >= rank:
+                return
+            goal[index] = max(goal.get(index, 0), rank)
+            required = int(perks['required_perk'][index])
+            if required >= 0:
+                need(required, 1)
+
+        for index, rank in targets.items():
+            need(index, rank)
+
+        # Perks in prerequisite order, each after the one it requires
+        order = [index for index in tree.order if index in goal]
+
+        attribute_goal = [special[a] for a in range(len(SPECIAL))]
+        for index in goal:
+            a = int(perks['attribute'][index])
+            attribute_goal[a] = max(attribute_goal[a], int(perks['special_value'][index]))
+
+        # Attributes first: raising one only ever enables perks
+        self.kinds: List[str] = []
+        self.names: List[str] = []
+        self.start: List[int] = []
+        self.goal: List[int] = []
+        self.release: List[int] = []       # level requirement, 0 for attributes
+        self.attribute: List[int] = []     # item of the attribute a perk needs, -1 for attributes
+        self.special_value: List[int] = []
+        self.required: List[int] = []      # item of the prerequisite perk, -1 for none
+        attribute_item: Dict[int, int] = {}
+        for a in range(len(SPECIAL)):
+            if attribute_goal[a] > special[a]:
+                if attribute_goal[a] > 10:
+                    raise ValueError(f"{SPECIAL[a]} would need {attribute_goal[a]}")
+                attribute_item[a] = len(self.kinds)
+                self._add('special', SPECIAL[a], special[a], attribute_goal[a], 0, -1, 0, -1)
+        perk_item: Dict[int, int] = {}
+        for index in order:
+            a = int(perks['attribute'][index])
+            required = int(perks['required_perk'][index])
+            perk_item[index] = len(self.kinds)
+            self._add('perk', tree.perk_names[index], ranks[index], max(goal[index], ranks[index]),
+                      int(perks['level_requirement'][index]), attribute_item.get(a, -1),
+                      int(perks['special_value'][index]), perk_item.get(required, -1))
+
+    def _add(self, kind, name, start, goal, release, attribute, special_value, required):
+        self.kinds.append(kind)
+        self.names.append(name)
+        self.start.append(start)
+        self.goal.append(goal)
+        self.release.append(release)
+        self.attribute.append(attribute)
+        self.special_value.append(special_value)
+        self.required.append(required)
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def open(self, i: int, progress: Tuple[int, ...], level: int) -> bool:
+        """Can item i advance one step in this state?"""
+        if progress[i] >= self.goal[i]:
+            return False
+        if self.kinds[i] == 'special':
+            return True
+        if level < self.release[i]:
+            return False
+        a = self.attribute[i]
+        if a >= 0 and progress[a] < self.special_value[i]:
+            return False
+        r = self.required[i]
+        return r < 0 or progress[r] >= 1
+
+
+# ------------------------- Search -------------------------
+def _bound(items: _Items, level: int, points: int, progress: Tuple[int, ...], bank: bool) -> int:
+    """Admissible lower bound on the final level from this state."""
+    remaining = 0
+    latest = level
+    releases = []
+    for i in range(len(items)):
+        left = items.goal[i] - progress[i]
+        if left > 0:
+            remaining += left
+            latest = max(latest, items.release[i])
+            if not bank:
+                releases.extend([items.release[i]] * left)
+    bound = max(latest, level + max(0, remaining - points))
+    if not bank and releases:
+        # One point per level: the k tasks released at R or later need k levels from R on
+        releases.sort(reverse=True)
+        for k, release in enumerate(releases, 1):
+            bound = max(bound, max(release, level + 1 - points) + k - 1)
+    return bound
+
+
+def _greedy(items: _Items, level: int, points: int, bank: bool, max_level: int):
+    """Spend on the open item with the latest release first; a feasible incumbent."""
+    progress = list(items.start)
+    actions: List[Tuple[int, int]] = []
+    while any(p < g for p, g in zip(progress, items.goal)):
+        if level > max_level:
+            return None
+        spent = True
+        while points and spent:
+            spent = False
+            candidates = [i for i in range(len(items)) if items.open(i, tuple(progress), level)]
+            if candidates:
+                i = max(candidates, key=lambda i: (items.release[i], -i))
+                progress[i] += 1
+                points -= 1
+                actions.append((level, i))
+                spent = True
+        if all(p >= g for p, g in zip(progress, items.goal)):
+            break
+        level += 1
+        points = points + 1 if bank else 1
+    return level, actions
+
+
+def _search(items: _Items, level: int, points: int, bank: bool, incumbent: int):
+    start = (level, points, tuple(items.start), 0)
+    fronts: Dict[Tuple[int, ...], List[Tuple[int, int, int]]] = {}
+    parents = {start: None}
+    heap = [(_bound(items, level, points, start[2], bank), -sum(start[2]), 0, start)]
+    counter = 1
+    expanded = 0
+
+    def dominated(level, points, progress, floor):
+        # Same items done by the same level: more points in hand and more
+        # items still allowed this level is at least as good
+        for seen_level, seen_points, seen_floor in fronts.get(progress, ()):
+            if seen_level == level and seen_points >= points and seen_floor <= floor:
+                return True
+        return False
+
+    while heap:
+        bound, _, _, state = heapq.heappop(heap)
+        level, points, progress, floor = state
+        if all(p >= g for p, g in zip(progress, items.goal)):
+            return level, state, parents, expanded
+        if dominated(level, points, progress, floor):
+            continue
+        fronts.setdefault(progress, []).append((level, points, floor))
+        expanded += 1
+
+        # Never level past an open item with a point in hand: spending it now
+        # instead of later can only open things sooner
+        successors = []
+        if points:
+            for i in range(floor, len(items)):
+                if items.open(i, progress, level):
+                    after = progress[:i] + (progress[i] + 1,) + progress[i + 1:]
+                    successors.append(((level, points - 1, after, i), i))
+        if not successors:
+            # Without banking a point nothing needs is spent elsewhere
+            successors.append(((level + 1, points + 1 if bank else 1, progress, 0), None))
+        for child, item in successors:
+            f = _bound(items, child[0], child[1], child[2], bank)
+            if f > incumbent or child in parents or dominated(child[0], child[1], child[2], child[3]):
+                continue
+            parents[child] = (state, item)
+            heapq.heappush(heap, (f, -sum(child[2]), counter, child))
+            counter += 1
+    return None, None, parents, expanded
+
+
+def plan_build(character: Union[Character, PerkTree], targets: Union[Dict[str, int], Iterable[str]],
+               bank: bool = True, max_level: int = 255, greedy: bool = True) -> Optional[Plan]:
+    """Cheapest level-by-level allocation reaching every target perk and rank.
+
+    character is a Character (planned from its current state) or a PerkTree
+    (a fresh level 1 sheet). targets maps perk name -> rank, or is a list of
+    names wanted at rank 1. Returns None if the targets cannot be reached.
+    greedy=False drops the greedy incumbent so the search always runs.
+    """
+    begin = time.perf_counter()
+    if isinstance(character, PerkTree):
+        character = Character(character)
+    tree = character.tree
+    if not isinstance(targets, dict):
+        targets = {name: 1 for name in targets}
+    unknown = [name for name in targets if name not in tree.index]
+    if unknown:
+        raise KeyError(f"no such perk(s) in {tree.name}: {', '.join(unknown)}")
+
+    special = [character.special[short].value for short in SPECIAL]
+    ranks = [int(r) for r in character.ranks]
+    items = _Items(tree, {tree.index[name]: rank for name, rank in targets.items()}, special, ranks)
+    level, points = character.level, character.perk_points
+
+    quick = _greedy(items, level, points, bank, max_level) if greedy else None
+    incumbent = quick[0] if quick else max_level
+    expanded = 0
+    if quick and quick[0] == _bound(items, level, points, tuple(items.start), bank):
+        final, steps = quick
+    else:
+        final, state, parents, expanded = _search(items, level, points, bank, incumbent)
+        if final is None:
+            if quick is None:
+                return None
+            final, steps = quick
+        else:
+            steps = []
+            while parents[state] is not None:
+                state, item = parents[state]
+                if item is not None:
+                    steps.append((state[0], item))
+            steps.reverse()
+
+    actions: List[Action] = []
+    progress = list(items.start)
+    for level, i in steps:
+        progress[i] += 1
+        actions.append((level, items.kinds[i], items.names[i], progress[i]))
+    return Plan(final, actions, expanded, time.perf_counter() - begin)
+
+
+# ------------------------- Benchmark -------------------------
+def deep_tree(perks_per_attribute: int = 50, seed: int = 0) -> PerkTree:
+    """A tree 10x the size of the real ones, with long prerequisite chains."""
+    import random
+    rng = random.Random(seed)
+    data = {'name': 'Synthetic', 'actor': '', 'special': {short: 3 for short in SPECIAL}, 'perks': {}}
+    for short in SPECIAL:
+        data['perks'][short] = [
+            {'name': f"{short}{p}", 'max_rank': rng.randint(1, 3),
+             'special': min(10, 1 + p * 10 // perks_per_attribute), 'level': 1 + p,
+             **({'requires': f"{short}{p - rng.randint(1, 3)}"} if p >= 3 and rng.random() < 0.7 else {})}
+            for p in range(perks_per_attribute)
+        ]
+    return PerkTree.compile(data, 'synthetic')
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from perks import character_path, load_tree
+
+    parser = argparse.ArgumentParser(description="Plan the lowest-level route to some perks")
+    parser.add_argument('character', nargs='?', default='Felicity Smoak')
+    parser.add_argument('targets', nargs='*', default=['Master Hacker', 'Quantum Processor'])
+    parser.add_argument('--no-bank', action='store_true', help='spend every point at the level it is earned')
+    parser.add_argument('--bench', action='store_true', help='random targets on a 10x synthetic tree')
+    parser.add_argument('--no-greedy', action='store_true',
+                        help='always run the search instead of stopping at a greedy plan that meets the bound')
+    args = parser.parse_args()
+
+    if not args.bench:
+        tree = load_tree(character_path(args.character))
+        plan = plan_build(tree, args.targets, bank=not args.no_bank, greedy=not args.no_greedy)
+        print(plan if plan else "Unreachable")
+        if plan:
+            plan.apply(Character(tree))
+    else:
+        import random
+        tree = deep_tree()
+        rng = random.Random(1)
+        for bank in (True, False):
+            times, nodes = [], []
+            for _ in range(50):
+                targets = {name: rng.randint(1, int(tree.perks['max_rank'][tree.index[name]]))
+                           for name in rng.sample(tree.perk_names, 4)}
+                plan = plan_build(tree, targets, bank=bank, greedy=not args.no_greedy)
+                plan.apply(Character(tree))
+                if args.no_greedy:
+                    assert plan.level == plan_build(tree, targets, bank=bank).level
+                times.append(plan.seconds)
+                nodes.append(plan.expanded)
+            times.sort()
+            print(f"{len(tree)} perks, banking {'on ' if bank else 'off'}"
+                  f"{', search forced' if args.no_greedy else ''}: "
+                  f"median {times[len(times) // 2] * 1000:.2f} ms, worst {times[-1] * 1000:.1f} ms, "
+                  f"max {max(nodes)} nodes")
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+S.P.E.C.I.A.L. population simulator
+Whole populations of one character sheet leveled in lockstep, for balancing
+"""
+
+import time
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from perks import SPECIAL, PerkTree
+
+# ------------------------- Policies -------------------------
+#
+# A policy scores every perk for every character in a block; each character
+# with a point to spend takes its highest-scoring eligible perk. Scores are
+# float32 (n, perks). When nothing is eligible the point goes into the
+# character's lowest attribute below 10 instead - this simulation's own rule,
+# so points are never left unspent.
+
+Policy = Callable[['Population', np.random.Generator], np.ndarray]
+
+
+def _noise(population: 'Population', rng: np.random.Generator, scale: float = 1e-3) -> np.ndarray:
+    # Breaks ties at random so equal scores don't always favour the first perk
+    return rng.random(population.ranks.shape, dtype=np.float32) * scale
+
+
+def random_policy(population, rng):
+    """Any eligible perk, uniformly."""
+    return rng.random(population.ranks.shape, dtype=np.float32)
+
+
+def deepen_policy(population, rng):
+    """Max out perks already started before opening new ones."""
+    return population.ranks.astype(np.float32) + _noise(population, rng)
+
+
+def spread_policy(population, rng):
+    """Take rank 1 of as many perks as possible."""
+    return -population.ranks.astype(np.float32) + _noise(population, rng)
+
+
+def early_policy(population, rng):
+    """Lowest level requirement first, then lowest attribute requirement."""
+    perks = population.tree.perks
+    cost = perks['level_requirement'].astype(np.float32) * 16 + perks['special_value']
+    return np.broadcast_to(-cost, population.ranks.shape) + _noise(population, rng)
+
+
+POLICIES: Dict[str, Policy] = {
+    'random': random_policy,
+    'deepen': deepen_policy,
+    'spread': spread_policy,
+    'early': early_policy,
+}
+
+
+# ------------------------- Population Class -------------------------
+class Population:
+    """n characters on one PerkTree, state held column-wise.
+
+    The same rules as Character.can_take / level_up / assign_perk, applied to
+    every row at once: one level step is a handful of array operations
+    however many characters there are.
+    """
+
+    def __init__(self, tree: PerkTree, count: int, spread: int = 0,
+                 rng: Optional[np.random.Generator] = None):
+        self.tree = tree
+        self.level = np.ones(count, dtype=np.uint8)
+        self.perk_points = np.zeros(count, dtype=np.uint8)
+        special = np.tile(tree.base_special.astype(np.int16), (count, 1))
+        if spread:
+            # Variations on the sheet: each attribute nudged up to +-spread
+            special += (rng or np.random.default_rng()).integers(-spread, spread + 1, special.shape,
+                                                                 dtype=np.int16)
+        self.special = np.clip(special, 1, 10).astype(np.uint8)
+        self.ranks = np.zeros((count, len(tree)), dtype=np.uint8)
+
+        perks = tree.perks
+        self._attribute = perks['attribute'].astype(np.intp)
+        self._special_value = perks['special_value']
+        self._level_requirement = perks['level_requirement']
+        self._max_rank = perks['max_rank']
+        required = perks['required_perk']
+        self._has_required = required >= 0
+        self._required = np.where(self._has_required, required, 0).astype(np.intp)
+
+    def __len__(self):
+        return len(self.level)
+
+    def eligible(self) -> np.ndarray:
+        """(n, perks) bool: may take the next rank of this perk now."""
+        mask = self.ranks < self._max_rank
+        mask &= self.special[:, self._attribute] >= self._special_value
+        mask &= self.level[:, None] >= self._level_requirement
+        mask &= (self.ranks[:, self._required] >= 1) | ~self._has_required
+        return mask
+
+    def level_up(self):
+        """Everyone gains a level and a perk point."""
+        self.level += 1
+        self.perk_points += 1
+
+    def spend(self, policy: Policy, rng: np.random.Generator) -> np.ndarray:
+        """Spend one point per character that has one; returns the perk taken, -1 for none."""
+        spending = self.perk_points > 0
+        mask = self.eligible()
+        if not spending.all():
+            mask &= spending[:, None]
+        scores = np.where(mask, policy(self, rng), -np.inf)
+        choice = scores.argmax(axis=1)
+        taking = mask.any(axis=1)
+        picked = np.where(taking, choice, -1)
+        rows = np.flatnonzero(taking)
+        self.ranks[rows, choice[rows]] += 1
+
+        # Nothing to take: raise the lowest attribute that still can go up
+        raising = np.flatnonzero(spending & ~taking)
+        if len(raising):
+            special = self.special[raising]
+            attribute = np.where(special < 10, special, 11).argmin(axis=1)
+            can_raise = special[np.arange(len(raising)), attribute] < 10
+            raising, attribute = raising[can_raise], attribute[can_raise]
+            self.special[raising, attribute] += 1
+            taking[raising] = True
+
+        self.perk_points -= taking
+        return picked
+
+
+# ------------------------- Distributions -------------------------
+class Distributions:
+    """Aggregate outcome of a simulated population at its final level."""
+
+    def __init__(self, tree: PerkTree, levels: int):
+        perks = len(tree)
+        self.tree = tree
+        self.count = 0
+        self.rank_counts = np.zeros((perks, int(tree.perks['max_rank'].max()) + 1), dtype=np.int64)
+        self.special_counts = np.zeros((len(SPECIAL), 11), dtype=np.int64)
+        self.unspent_counts = np.zeros(levels + 1, dtype=np.int64)
+        self.first_taken = np.zeros((levels + 1, perks), dtype=np.int64)  # [level, perk]
+
+    def record_picks(self, level: int, picks: np.ndarray, first: np.ndarray):
+        self.first_taken[level] += np.bincount(picks[first], minlength=self.first_taken.shape[1])
+
+    def add(self, population: Population):
+        self.count += len(population)
+        for p in range(len(self.tree)):
+            self.rank_counts[p] += np.bincount(population.ranks[:, p],
+                                               minlength=self.rank_counts.shape[1])
+        for a in range(len(SPECIAL)):
+            self.special_counts[a] += np.bincount(population.special[:, a], minlength=11)
+        self.unspent_counts += np.bincount(population.perk_points,
+                                           minlength=len(self.unspent_counts))[:len(self.unspent_counts)]
+
+    def taken_fraction(self) -> np.ndarray:
+        return 1.0 - self.rank_counts[:, 0] / max(self.count, 1)
+
+    def mean_rank(self) -> np.ndarray:
+        return self.rank_counts @ np.arange(self.rank_counts.shape[1]) / max(self.count, 1)
+
+    def median_unlock_level(self) -> np.ndarray:
+        """Level by which half the characters who ever took a perk had it; 0 if never."""
+        cumulative = self.first_taken.cumsum(axis=0)
+        total = cumulative[-1]
+        reached = cumulative * 2 >= np.maximum(total, 1)
+        return np.where(total > 0, reached.argmax(axis=0), 0)
+
+    def report(self):
+        tree = self.tree
+        print(f"\n{tree.name}: {self.count} characters")
+        print(f"{'perk':<28} {'taken':>6} {'mean rank':>9} {'unlock lvl':>10}")
+        for p, (taken, rank, unlock) in enumerate(zip(self.taken_fraction(), self.mean_rank(),
+                                                      self.median_unlock_level())):
+            print(f"{tree.perk_names[p]:<28} {taken:6.1%} {rank:5.2f}/{tree.perks['max_rank'][p]:<3} "
+                  f"{unlock:>10}")
+        print("\nS.P.E.C.I.A.L. at the final level (mean, share at 10)")
+        values = np.arange(11)
+        for a, short in enumerate(SPECIAL):
+            counts = self.special_counts[a]
+            print(f"  {short}: {counts @ values / max(self.count, 1):5.2f}  {counts[10] / max(self.count, 1):6.1%}")
+        unspent = self.unspent_counts @ np.arange(len(self.unspent_counts)) / max(self.count, 1)
+        print(f"\nUnspent perk points: mean {unspent:.2f}, "
+              f"{1 - self.unspent_counts[0] / max(self.count, 1):.1%} of characters have some")
+
+
+def simulate(tree: PerkTree, count: int, policy: str = 'random', levels: int = 50,
+             spread: int = 0, seed: int = 0, block: int = 1 << 16) -> Distributions:
+    """Level count characters from 1 to levels under a policy; blocks keep memory flat."""
+    choose = POLICIES[policy]
+    rng = np.random.default_rng(seed)
+    stats = Distributions(tree, levels)
+    for start in range(0, count, block):
+        population = Population(tree, min(block, count - start), spread, rng)
+        for level in range(2, levels + 1):
+            population.level_up()
+            rows = np.arange(len(population))
+            picks = population.spend(choose, rng)
+            taken = picks >= 0
+            first = taken & (population.ranks[rows, np.maximum(picks, 0)] == 1)
+            stats.record_picks(level, picks, first)
+        stats.add(population)
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from perks import character_path, load_tree
+
+    parser = argparse.ArgumentParser(description="Level a population from 1 to N and report distributions")
+    parser.add_argument('character', nargs='?', default='Oliver Queen')
+    parser.add_argument('--count', type=int, default=1_000_000)
+    parser.add_argument('--levels', type=int, default=50)
+    parser.add_argument('--policy', choices=sorted(POLICIES), default='random')
+    parser.add_argument('--spread', type=int, default=2, help='random +- on starting attributes')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    tree = load_tree(character_path(args.character))
+    start = time.perf_counter()
+    stats = simulate(tree, args.count, args.policy, args.levels, args.spread, args.seed)
+    elapsed = time.perf_counter() - start
+    stats.report()
+    steps = args.count * (args.levels - 1)
+    print(f"\n{args.count} characters x {args.levels - 1} level-ups ({args.policy}) in {elapsed:.1f} s "
+          f"= {steps / elapsed / 1e6:.1f} M character-levels/s")
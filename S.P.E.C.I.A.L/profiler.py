@@ -0,0 +1,211 @@
+"""
+ARROW: Frame-time profiler
+Scoped CPU/GPU timers, rolling percentiles, on-screen overlay and Chrome traces
+"""
+
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+import numpy as np
+import pygame
+import moderngl
+
+# ============================================
+# 1. SCOPED TIMERS & ROLLING HISTOGRAM
+# ============================================
+
+GPU_LATENCY = 3  # frames a timer query ages before its result is read
+
+class FrameProfiler:
+    """Named timers around each phase of the main loop"""
+
+    def __init__(self, ctx=None, window=300, trace_frames=120,
+                 slow_frame_ms=None, trace_path='arrow_trace.json'):
+        self.ctx = ctx                      # enables GPU timer queries
+        self.samples = defaultdict(lambda: deque(maxlen=window))  # name -> ms per frame
+        self.trace = deque(maxlen=trace_frames)                   # recent frames' events
+        self.slow_frame_ms = slow_frame_ms
+        self.trace_path = trace_path
+        self.frames = 0
+        self._origin = time.perf_counter()
+        self._last_dump = -float('inf')
+        self._free_queries = []             # timer queries ready for reuse
+        self._pending_queries = deque()     # (frame, name, query) not read yet
+        self.begin_frame()
+
+    def begin_frame(self):
+        self._frame_start = time.perf_counter()
+        self._events = []
+        self._totals = defaultdict(float)
+
+    @contextmanager
+    def section(self, name):
+        """Time a block of CPU work; nested sections nest in the trace too"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self._totals[name] += elapsed
+            self._events.append((name, start, elapsed, threading.get_ident()))
+
+    @contextmanager
+    def gpu_section(self, name):
+        """Time a block of GL commands with a timer query, where the driver has them"""
+        query = None
+        if self._free_queries:
+            query = self._free_queries.pop()
+        elif self.ctx is not None:
+            try:
+                query = self.ctx.query(time=True)
+            except moderngl.Error:
+                self.ctx = None  # no timer queries on this driver - stop asking
+        if query is None:
+            yield
+            return
+        with query:
+            yield
+        self._pending_queries.append((self.frames, name, query))
+
+    def end_frame(self):
+        """Close the frame, fold its timings into the histograms, return frame ms"""
+        end = time.perf_counter()
+        frame_ms = (end - self._frame_start) * 1000.0
+        self._events.append(('frame', self._frame_start, end - self._frame_start,
+                             threading.get_ident()))
+        for name, seconds in self._totals.items():
+            self.samples[name].append(seconds * 1000.0)
+        self._collect_gpu()
+        self.samples['frame'].append(frame_ms)
+        self.trace.append(self._events)
+        self.frames += 1
+
+        if self.slow_frame_ms and frame_ms > self.slow_frame_ms and end - self._last_dump > 10.0:
+            # Capture the hitch and the frames leading up to it
+            self._last_dump = end
+            self.dump_chrome_trace(self.trace_path)
+        return frame_ms
+
+    def _collect_gpu(self):
+        """Read timer queries GPU_LATENCY frames old, by then long finished
+
+        Reading one the GPU has not reached yet would stall the CPU until it
+        does - every frame, and inside the very frame time being measured.
+        """
+        gpu_totals = defaultdict(float)
+        pending = self._pending_queries
+        while pending and self.frames - pending[0][0] >= GPU_LATENCY:
+            frame, name, query = pending.popleft()
+            gpu_totals[frame, 'gpu:' + name] += query.elapsed / 1e6
+            self._free_queries.append(query)
+        for (_, name), ms in gpu_totals.items():
+            self.samples[name].append(ms)
+
+    def percentiles(self):
+        """name -> (p50, p95, p99) in milliseconds over the rolling window"""
+        return {
+            name: tuple(np.percentile(np.fromiter(samples, float), (50, 95, 99)))
+            for name, samples in self.samples.items() if samples
+        }
+
+    def dump_chrome_trace(self, path=None):
+        """Write recent frames in Chrome trace format (chrome://tracing, Perfetto)"""
+        events = [
+            {
+                'name': name,
+                'ph': 'X',
+                'ts': (start - self._origin) * 1e6,
+                'dur': elapsed * 1e6,
+                'pid': 0,
+                'tid': tid
+            }
+            for frame in self.trace
+            for name, start, elapsed, tid in frame
+        ]
+        with open(path or self.trace_path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        print(f"Frame trace ({len(self.trace)} frames) saved to {path or self.trace_path}")
+
+
+# ============================================
+# 2. ON-SCREEN OVERLAY
+# ============================================
+
+class ProfilerOverlay:
+    """Text panel of p50/p95/p99 per phase, drawn over the scene"""
+
+    vertex_shader = '''
+    #version 330
+    in vec2 in_position;
+    in vec2 in_uv;
+    out vec2 v_uv;
+    void main() {
+        gl_Position = vec4(in_position, 0.0, 1.0);
+        v_uv = in_uv;
+    }
+    '''
+
+    fragment_shader = '''
+    #version 330
+    uniform sampler2D panel;
+    in vec2 v_uv;
+    out vec4 f_color;
+    void main() {
+        f_color = texture(panel, v_uv);
+    }
+    '''
+
+    def __init__(self, ctx, profiler, window_size, panel_size=(440, 300), refresh=0.25):
+        self.ctx = ctx
+        self.profiler = profiler
+        self.panel_size = panel_size
+        self.refresh = refresh
+        self.visible = False
+        self._next_refresh = 0.0
+
+        pygame.font.init()
+        self.font = pygame.font.SysFont('monospace', 14)
+        self.surface = pygame.Surface(panel_size, pygame.SRCALPHA)
+        self.texture = ctx.texture(panel_size, 4)
+        self.prog = ctx.program(vertex_shader=self.vertex_shader,
+                                fragment_shader=self.fragment_shader)
+
+        # Top-left corner, in normalized device coordinates
+        w = 2.0 * panel_size[0] / window_size[0]
+        h = 2.0 * panel_size[1] / window_size[1]
+        quad = np.array([
+            -1.0,     1.0 - h, 0.0, 0.0,
+            -1.0 + w, 1.0 - h, 1.0, 0.0,
+            -1.0,     1.0,     0.0, 1.0,
+            -1.0 + w, 1.0,     1.0, 1.0,
+        ], dtype='f4')
+        self.vbo = ctx.buffer(quad.tobytes())
+        self.vao = ctx.vertex_array(self.prog, [(self.vbo, '2f 2f', 'in_position', 'in_uv')])
+
+    def toggle(self):
+        self.visible = not self.visible
+
+    def _redraw(self):
+        self.surface.fill((0, 0, 0, 170))
+        lines = [f"{'phase':<16}{'p50':>8}{'p95':>8}{'p99':>8}"]
+        for name, (p50, p95, p99) in sorted(self.profiler.percentiles().items()):
+            lines.append(f"{name:<16}{p50:8.2f}{p95:8.2f}{p99:8.2f}")
+        for row, line in enumerate(lines):
+            text = self.font.render(line, True, (120, 255, 120))
+            self.surface.blit(text, (8, 6 + row * 17))
+        self.texture.write(pygame.image.tobytes(self.surface, 'RGBA', True))
+
+    def draw(self):
+        if not self.visible:
+            return
+        now = time.perf_counter()
+        if now >= self._next_refresh:
+            self._next_refresh = now + self.refresh
+            self._redraw()
+        # Always on top: no depth test, alpha-blended over the scene
+        with self.ctx.scope(self.ctx.fbo, enable_only=moderngl.BLEND):
+            self.texture.use(0)
+            self.vao.render(moderngl.TRIANGLE_STRIP)
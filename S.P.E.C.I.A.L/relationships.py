@@ -0,0 +1,527 @@
+"""
+ARROW: Relationship graph
+Crawled relationship counts as CSR arrays, with path, neighbourhood and centrality queries
+"""
+
+import heapq
+import re
+import time
+from collections import defaultdict
+
+import numpy as np
+
+RELATIONSHIP_TYPES = ('romantic', 'familial', 'friendship', 'conflict', 'mentorship')
+
+# ============================================
+# 1. STORAGE
+# ============================================
+#
+# Counts arrive one mention at a time (ARROWRelationshipCrawler) and are kept
+# in a plain accumulator. Queries read CSR arrays - indptr, indices, weights,
+# symmetric since relationships are mutual - built per relationship type, or
+# for a set of types summed, on first use after a change. Every result is
+# memoized under the graph's version; new counts bump the version, which
+# drops the CSR arrays and the memo together.
+
+
+class CSR:
+    """One adjacency matrix: row i's neighbours are indices[indptr[i]:indptr[i + 1]]"""
+
+    def __init__(self, count, rows, cols, weights):
+        order = np.lexsort((cols, rows))
+        self.rows = rows[order]
+        self.indices = cols[order]
+        self.weights = weights[order]
+        self.indptr = np.zeros(count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.rows, minlength=count), out=self.indptr[1:])
+        self.count = count
+
+    def degree(self):
+        return np.diff(self.indptr)
+
+    def strength(self):
+        return np.bincount(self.rows, weights=self.weights, minlength=self.count)
+
+    def expand(self, frontier):
+        """All neighbours of a set of nodes in one gather: (source, neighbour, weight)"""
+        starts = self.indptr[frontier]
+        lengths = self.indptr[frontier + 1] - starts
+        total = int(lengths.sum())
+        if not total:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, np.zeros(0)
+        # Position of every edge: its row's start plus a running offset
+        offsets = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        edges = np.repeat(starts, lengths) + offsets
+        return np.repeat(frontier, lengths), self.indices[edges], self.weights[edges]
+
+
+class RelationshipGraph:
+    """Characters and typed, counted relationships between them"""
+
+    def __init__(self, names=()):
+        self.names = []
+        self.index = {}
+        self.counts = {t: defaultdict(int) for t in RELATIONSHIP_TYPES}   # type -> (i, j) i < j -> count
+        self.version = 0
+        self._csr = {}
+        self._memo = {}
+        self._memo_version = 0
+        for name in names:
+            self.node(name)
+
+    def node(self, name):
+        i = self.index.get(name)
+        if i is None:
+            i = self.index[name] = len(self.names)
+            self.names.append(name)
+            self.version += 1
+        return i
+
+    def add(self, a, b, rel_type, count=1):
+        """Record count mentions of a rel_type relationship between a and b"""
+        if rel_type not in self.counts:
+            raise ValueError(f"unknown relationship type {rel_type!r}")
+        i, j = self.node(a), self.node(b)
+        if i == j:
+            return
+        self.counts[rel_type][(min(i, j), max(i, j))] += count
+        self.version += 1
+
+    def add_counts(self, relationships):
+        """Merge the crawler's relationships[a][b][type] = count (stored both ways)"""
+        for a, others in relationships.items():
+            for b, types in others.items():
+                if a < b:
+                    for rel_type, count in types.items():
+                        self.add(a, b, rel_type, count)
+
+    @classmethod
+    def from_analysis(cls, analysis):
+        """analyze_relationships() output: one count per known relationship"""
+        graph = cls()
+        for a, relationships in analysis['relationship_network'].items():
+            for rel in relationships:
+                graph.add(a, rel['with'], rel['type'])
+        return graph
+
+    def _types(self, types):
+        if types is None:
+            return RELATIONSHIP_TYPES
+        if isinstance(types, str):
+            types = (types,)
+        for t in types:
+            if t not in self.counts:
+                raise ValueError(f"unknown relationship type {t!r}")
+        return tuple(sorted(types, key=RELATIONSHIP_TYPES.index))
+
+    def csr(self, types=None):
+        """Adjacency over one or more relationship types, counts summed"""
+        types = self._types(types)
+        if self._memo_version != self.version:
+            self._csr.clear()
+            self._memo.clear()
+            self._memo_version = self.version
+        matrix = self._csr.get(types)
+        if matrix is None:
+            pairs = [(i, j, c) for t in types for (i, j), c in self.counts[t].items()]
+            if pairs:
+                i, j, c = (np.array(column) for column in zip(*pairs))
+            else:
+                i = j = np.zeros(0, dtype=np.int64)
+                c = np.zeros(0)
+            rows = np.concatenate([i, j]).astype(np.int64)
+            cols = np.concatenate([j, i]).astype(np.int64)
+            weights = np.concatenate([c, c]).astype(np.float64)
+            # Merge duplicate pairs that come from different types
+            if len(types) > 1 and len(rows):
+                key = rows * len(self.names) + cols
+                unique, inverse = np.unique(key, return_inverse=True)
+                weights = np.bincount(inverse, weights=weights)
+                rows, cols = unique // len(self.names), unique % len(self.names)
+            matrix = self._csr[types] = CSR(len(self.names), rows, cols, weights)
+        return matrix
+
+    def _memoized(self, key, compute):
+        self.csr()  # drops stale results if the version moved
+        if key not in self._memo:
+            self._memo[key] = compute()
+        return self._memo[key]
+
+    # ============================================
+    # 2. TRAVERSAL
+    # ============================================
+
+    def hops(self, source, types=None, max_hops=None):
+        """Hop distance from source to every character, -1 if unreachable"""
+        types = self._types(types)
+
+        def compute():
+            matrix = self.csr(types)
+            distance = np.full(len(self.names), -1, dtype=np.int64)
+            parent = np.full(len(self.names), -1, dtype=np.int64)
+            start = self.index[source]
+            distance[start] = 0
+            frontier = np.array([start])
+            depth = 0
+            while len(frontier) and (max_hops is None or depth < max_hops):
+                depth += 1
+                sources, neighbours, _ = matrix.expand(frontier)
+                fresh = distance[neighbours] < 0
+                sources, neighbours = sources[fresh], neighbours[fresh]
+                neighbours, first = np.unique(neighbours, return_index=True)
+                distance[neighbours] = depth
+                parent[neighbours] = sources[first]
+                frontier = neighbours
+            return distance, parent
+
+        return self._memoized(('hops', source, types, max_hops), compute)
+
+    def shortest_path(self, a, b, types=None):
+        """Fewest-hops chain of characters from a to b, or None"""
+        distance, parent = self.hops(a, types)
+        node = self.index[b]
+        if distance[node] < 0:
+            return None
+        path = [node]
+        while parent[node] >= 0:
+            node = parent[node]
+            path.append(node)
+        return [self.names[i] for i in reversed(path)]
+
+    def strongest_path(self, a, b, types=None):
+        """Path where each step costs 1 / mentions: well-documented ties are short"""
+        types = self._types(types)
+
+        def compute():
+            matrix = self.csr(types)
+            start, goal = self.index[a], self.index[b]
+            cost = {start: 0.0}
+            parent = {start: -1}
+            heap = [(0.0, start)]
+            while heap:
+                d, node = heapq.heappop(heap)
+                if node == goal:
+                    break
+                if d > cost[node]:
+                    continue
+                lo, hi = matrix.indptr[node], matrix.indptr[node + 1]
+                for neighbour, weight in zip(matrix.indices[lo:hi].tolist(), matrix.weights[lo:hi].tolist()):
+                    step = d + 1.0 / weight
+                    if step < cost.get(neighbour, np.inf):
+                        cost[neighbour] = step
+                        parent[neighbour] = node
+                        heapq.heappush(heap, (step, neighbour))
+            if goal not in cost:
+                return None
+            path = [goal]
+            while parent[path[-1]] >= 0:
+                path.append(parent[path[-1]])
+            return [self.names[i] for i in reversed(path)], cost[goal]
+
+        return self._memoized(('strongest', a, b, types), compute)
+
+    def within(self, name, hops, types=None):
+        """Characters at most hops away from name (itself included)"""
+        distance, _ = self.hops(name, types, hops)
+        return [self.names[i] for i in np.flatnonzero(distance >= 0)]
+
+    def edges_within(self, name, hops, rel_type, via=None):
+        """rel_type edges (a, b, mentions) with both ends within hops of name over via types"""
+        def compute():
+            distance, _ = self.hops(name, via, hops)
+            near = distance >= 0
+            matrix = self.csr(rel_type)
+            keep = near[matrix.rows] & near[matrix.indices] & (matrix.rows < matrix.indices)
+            return [(self.names[i], self.names[j], int(w)) for i, j, w in
+                    zip(matrix.rows[keep], matrix.indices[keep], matrix.weights[keep])]
+
+        return self._memoized(('edges_within', name, hops, rel_type, self._types(via)), compute)
+
+    # ============================================
+    # 3. CENTRALITY (VECTORIZED)
+    # ============================================
+
+    def pagerank(self, types=None, damping=0.85, tolerance=1e-10, max_iterations=200):
+        """Mention-weighted PageRank by power iteration over the edge arrays"""
+        types = self._types(types)
+
+        def compute():
+            matrix = self.csr(types)
+            count = matrix.count
+            if count == 0:
+                return np.zeros(0)
+            strength = matrix.strength()
+            share = matrix.weights / np.where(strength > 0, strength, 1.0)[matrix.rows]
+            dangling = strength == 0
+            rank = np.full(count, 1.0 / count)
+            for _ in range(max_iterations):
+                spread = np.bincount(matrix.indices, weights=rank[matrix.rows] * share, minlength=count)
+                updated = (1.0 - damping) / count + damping * (spread + rank[dangling].sum() / count)
+                converged = np.abs(updated - rank).sum() < tolerance
+                rank = updated
+                if converged:
+                    break
+            return rank
+
+        return self._memoized(('pagerank', types, damping), compute)
+
+    def betweenness(self, types=None, samples=None, seed=0):
+        """Brandes betweenness on hop distance, one level-synchronous BFS per source
+
+        samples estimates from that many random sources (scaled up) for big graphs.
+        """
+        types = self._types(types)
+
+        def compute():
+            matrix = self.csr(types)
+            count = matrix.count
+            sources = np.arange(count)
+            if samples is not None and samples < count:
+                sources = np.random.default_rng(seed).choice(count, samples, replace=False)
+            centrality = np.zeros(count)
+            for source in sources:
+                distance = np.full(count, -1, dtype=np.int64)
+                sigma = np.zeros(count)
+                distance[source] = 0
+                sigma[source] = 1.0
+                levels = [np.array([source])]
+                edges = []   # per level: (parents, children) on shortest paths
+                while True:
+                    parents, children, _ = matrix.expand(levels[-1])
+                    unseen = distance[children] < 0
+                    nxt = np.unique(children[unseen])
+                    distance[nxt] = len(levels)
+                    on_path = distance[children] == len(levels)
+                    parents, children = parents[on_path], children[on_path]
+                    if not len(children):
+                        break
+                    sigma += np.bincount(children, weights=sigma[parents], minlength=count)
+                    edges.append((parents, children))
+                    levels.append(nxt)
+                delta = np.zeros(count)
+                for parents, children in reversed(edges):
+                    delta += np.bincount(parents, minlength=count,
+                                         weights=sigma[parents] / sigma[children] * (1.0 + delta[children]))
+                delta[source] = 0.0
+                centrality += delta
+            centrality /= 2.0  # undirected: each pair counted from both ends
+            if len(sources) < count:
+                centrality *= count / len(sources)
+            return centrality
+
+        return self._memoized(('betweenness', types, samples, seed), compute)
+
+    def degree_centrality(self, types=None):
+        types = self._types(types)
+        return self._memoized(('degree', types),
+                              lambda: self.csr(types).degree() / max(1, len(self.names) - 1))
+
+    def top(self, scores, k=5):
+        """[(name, score)] for the k highest scores"""
+        order = np.argsort(-scores, kind='stable')[:k]
+        return [(self.names[i], float(scores[i])) for i in order]
+
+
+# ============================================
+# 4. EPISODE TIMELINE
+# ============================================
+#
+# The same mentions, kept per (pair, type) in air order. Episodes map to
+# sortable keys (season * EPISODE_SLOTS + episode; whole-season reviews are
+# episode 0), and each pair/type holds its sorted episode keys next to a
+# running total of mentions, so any season/episode range is two binary
+# searches and a subtraction. New mentions wait in a pending list and are
+# merged into only the touched pair's arrays when it is next queried.
+
+EPISODE_SLOTS = 100
+ORDINALS = {'first': 1, 'second': 2, 'third': 3, 'fourth': 4, 'fifth': 5, 'sixth': 6,
+            'seventh': 7, 'eighth': 8}
+EPISODE_PATTERNS = [
+    re.compile(r'season[-_ ]?(\d+)[-_ ]episode[-_ ]?(\d+)', re.I),     # season-2-episode-17
+    re.compile(r'\bs(\d{1,2})[-_ ]?e(\d{1,2})\b', re.I),                  # s02e17
+]
+SEASON_PATTERNS = [
+    re.compile(r'season[-_ ]?(\d+)', re.I),                               # season-2
+    re.compile(r'(' + '|'.join(ORDINALS) + r')[-_ ]season', re.I),         # the-complete-second-season
+]
+
+
+def parse_episode(url):
+    """(season, episode) named in a review URL, episode 0 for a whole season, or None"""
+    for pattern in EPISODE_PATTERNS:
+        match = pattern.search(url)
+        if match:
+            return int(match.group(1)), int(match.group(2))
+    for pattern in SEASON_PATTERNS:
+        match = pattern.search(url)
+        if match:
+            season = match.group(1).lower()
+            return ORDINALS[season] if season in ORDINALS else int(season), 0
+    return None
+
+
+def _episode_key(season, episode):
+    if not 0 <= episode < EPISODE_SLOTS:
+        raise ValueError(f"episode {episode} out of range")
+    return season * EPISODE_SLOTS + episode
+
+
+def _bound(point, end):
+    """Range end -> episode key: None is open, a bare season covers all of it"""
+    if point is None:
+        return np.inf if end else -np.inf
+    if isinstance(point, tuple):
+        return _episode_key(*point)
+    return _episode_key(point, EPISODE_SLOTS - 1 if end else 0)
+
+
+class EpisodeTimeline:
+    """Relationship mentions by pair, type and episode, with range counts"""
+
+    def __init__(self):
+        self.pending = defaultdict(list)   # (a, b, type) -> [(episode key, count)]
+        self.series = {}                   # (a, b, type) -> (keys, running totals with a leading 0)
+        self.aired = set()
+
+    def add(self, a, b, rel_type, episode, count=1):
+        """count mentions of a rel_type relationship between a and b in episode (season, number)"""
+        if rel_type not in RELATIONSHIP_TYPES:
+            raise ValueError(f"unknown relationship type {rel_type!r}")
+        if a == b:
+            return
+        key = _episode_key(*episode)
+        self.pending[(min(a, b), max(a, b), rel_type)].append((key, count))
+        self.aired.add(key)
+
+    def _series(self, pair):
+        waiting = self.pending.pop(pair, None)
+        if waiting:
+            keys, totals = self.series.get(pair, (np.zeros(0, dtype=np.int64), np.zeros(1, dtype=np.int64)))
+            new_keys, new_counts = (np.array(column, dtype=np.int64) for column in zip(*waiting))
+            merged, inverse = np.unique(np.concatenate([keys, new_keys]), return_inverse=True)
+            counts = np.bincount(inverse, weights=np.concatenate([np.diff(totals), new_counts]))
+            running = np.zeros(len(merged) + 1, dtype=np.int64)
+            np.cumsum(counts.astype(np.int64), out=running[1:])
+            self.series[pair] = (merged, running)
+        return self.series.get(pair)
+
+    def _types(self, rel_type):
+        return RELATIONSHIP_TYPES if rel_type is None else (rel_type,)
+
+    def count(self, a, b, rel_type=None, first=None, last=None):
+        """Mentions between a and b from first to last inclusive
+
+        Bounds are a season number or a (season, episode) pair, e.g.
+        timeline.count('Oliver Queen', 'Felicity Smoak', 'romantic', 2, 4).
+        """
+        low, high = _bound(first, False), _bound(last, True)
+        total = 0
+        if low > high:
+            return total
+        for rel_type in self._types(rel_type):
+            series = self._series((min(a, b), max(a, b), rel_type))
+            if series is not None:
+                keys, running = series
+                total += int(running[np.searchsorted(keys, high, 'right')] - running[np.searchsorted(keys, low, 'left')])
+        return total
+
+    def evolution(self, a, b, rel_type=None):
+        """[((season, episode), mentions)] in air order, for episodes where a and b come up"""
+        per_episode = defaultdict(int)
+        for rel_type in self._types(rel_type):
+            series = self._series((min(a, b), max(a, b), rel_type))
+            if series is not None:
+                for key, count in zip(series[0].tolist(), np.diff(series[1]).tolist()):
+                    per_episode[key] += count
+        return [(divmod(key, EPISODE_SLOTS), per_episode[key]) for key in sorted(per_episode)]
+
+    def episodes(self):
+        return [divmod(key, EPISODE_SLOTS) for key in sorted(self.aired)]
+
+
+# ============================================
+# 5. BENCHMARK
+# ============================================
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Query a saved relationship analysis, or time a synthetic graph")
+    parser.add_argument('analysis', nargs='?', help='arrow_relationships.json from personality.py')
+    parser.add_argument('--bench', type=int, metavar='N', help='synthetic graph with N characters')
+    args = parser.parse_args()
+
+    if not args.bench:
+        if args.analysis:
+            with open(args.analysis) as f:
+                graph = RelationshipGraph.from_analysis(json.load(f))
+        else:
+            # The show's canon, as in ARROWRelationshipCrawler.analyze_relationships
+            graph = RelationshipGraph()
+            for a, b, t in [
+                ('Oliver Queen', 'Felicity Smoak', 'romantic'), ('Oliver Queen', 'Laurel Lance', 'romantic'),
+                ('Oliver Queen', 'Sara Lance', 'romantic'), ('Oliver Queen', 'Helena Bertinelli', 'romantic'),
+                ('Thea Queen', 'Roy Harper', 'romantic'), ('Oliver Queen', 'Thea Queen', 'familial'),
+                ('Moira Queen', 'Oliver Queen', 'familial'), ('Quentin Lance', 'Laurel Lance', 'familial'),
+                ('Quentin Lance', 'Sara Lance', 'familial'), ('John Diggle', 'Oliver Queen', 'friendship'),
+                ('Oliver Queen', 'Tommy Merlyn', 'friendship'), ('John Diggle', 'Andy Diggle', 'familial'),
+                ('Oliver Queen', 'Slade Wilson', 'conflict'), ('Oliver Queen', 'Malcolm Merlyn', 'conflict'),
+                ('Nyssa al Ghul', 'Sara Lance', 'romantic'), ('Oliver Queen', 'Roy Harper', 'mentorship'),
+            ]:
+                graph.add(a, b, t)
+        print("Roy Harper -> Nyssa al Ghul:", ' -> '.join(graph.shortest_path('Roy Harper', 'Nyssa al Ghul')))
+        print("Top by betweenness:", graph.top(graph.betweenness(), 3))
+        print("Top by PageRank:", graph.top(graph.pagerank(), 3))
+        print("Conflict edges within 2 hops of Oliver:", graph.edges_within('Oliver Queen', 2, 'conflict'))
+    else:
+        rng = np.random.default_rng(0)
+        graph = RelationshipGraph(f"Character {i}" for i in range(args.bench))
+        edges = args.bench * 10
+        a = rng.integers(0, args.bench, edges)
+        b = (a + rng.zipf(1.6, edges)) % args.bench   # mostly local ties, a few long ones
+        kinds = rng.integers(0, len(RELATIONSHIP_TYPES), edges)
+        start = time.perf_counter()
+        for i, j, t in zip(a.tolist(), b.tolist(), kinds.tolist()):
+            graph.add(graph.names[i], graph.names[j], RELATIONSHIP_TYPES[t])
+        print(f"{args.bench} characters, {edges} mentions added in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+        def timed(label, fn):
+            start = time.perf_counter()
+            result = fn()
+            cold = time.perf_counter() - start
+            start = time.perf_counter()
+            fn()
+            warm = time.perf_counter() - start
+            print(f"{label:>32}: {cold * 1000:8.1f} ms cold, {warm * 1e6:6.1f} us memoized")
+            return result
+
+        timed("CSR build (all types)", lambda: graph.csr())
+        timed("shortest path", lambda: graph.shortest_path('Character 0', f"Character {args.bench // 2}"))
+        timed("strongest path", lambda: graph.strongest_path('Character 0', f"Character {args.bench // 2}"))
+        timed("conflict edges within 2 hops", lambda: graph.edges_within('Character 0', 2, 'conflict'))
+        timed("PageRank", lambda: graph.pagerank())
+        timed("betweenness (200 sampled sources)", lambda: graph.betweenness(samples=200))
+        graph.add('Character 0', 'Character 1', 'conflict')
+        timed("PageRank after new counts", lambda: graph.pagerank())
+
+        timeline = EpisodeTimeline()
+        seasons = rng.integers(1, 9, edges)
+        numbers = rng.integers(1, 24, edges)
+        raw = list(zip(a.tolist(), b.tolist(), kinds.tolist(), seasons.tolist(), numbers.tolist()))
+        for i, j, t, season, number in raw:
+            timeline.add(graph.names[i], graph.names[j], RELATIONSHIP_TYPES[t], (season, number))
+        pair = (graph.names[a[0]], graph.names[b[0]])
+        start = time.perf_counter()
+        scanned = sum(1 for i, j, t, season, number in raw
+                      if {graph.names[i], graph.names[j]} == set(pair) and 2 <= season <= 4)
+        scan_seconds = time.perf_counter() - start
+        timeline.count(*pair)   # merge the pair's pending mentions
+        start = time.perf_counter()
+        for _ in range(1000):
+            indexed = timeline.count(*pair, first=2, last=4)
+        per_query = (time.perf_counter() - start) / 1000
+        print(f"{'seasons 2-4 range count':>32}: {per_query * 1e6:8.1f} us indexed, "
+              f"{scan_seconds * 1000:.0f} ms rescanning {edges} mentions")
+        assert indexed == scanned
@@ -0,0 +1,195 @@
+"""
+ARROW: Input recording & deterministic replay
+Compact per-tick capture of OliverQueen's controls
+"""
+
+import struct
+import zlib
+
+# ============================================
+# 1. FILE FORMAT
+# ============================================
+#
+#   header  : magic, version, tick rate, city seed   (uncompressed)
+#   body    : zlib stream of tick records
+#
+# Each record starts with a flag byte. IDLE_RUN records stand for a run of
+# ticks where the held keys did not change and nothing else happened; every
+# other record carries only the fields its flags announce. Keys are stored as
+# the XOR against the previous tick's mask, mouse deltas as zigzag varints in
+# 1/256 px, so a typical tick costs one or two bytes before compression.
+
+MAGIC = b'ARRW'
+VERSION = 1
+HEADER = struct.Struct('<4sHHq')
+
+KEYS_CHANGED = 0x01
+MOUSE = 0x02
+FIRE = 0x04
+TOGGLE_HOOD = 0x08
+RELOAD = 0x10
+IDLE_RUN = 0x80
+
+MOUSE_SCALE = 256
+
+
+def _write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(buf, pos):
+    value = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _zigzag(value):
+    return (value << 1) ^ (value >> 63)
+
+
+def _unzigzag(value):
+    return (value >> 1) ^ -(value & 1)
+
+
+# ============================================
+# 2. RECORDER
+# ============================================
+
+class InputRecorder:
+    """Streams tick records to disk; memory use is constant however long you play"""
+
+    def __init__(self, path, tick_rate=60, seed=0, level=6):
+        self.file = open(path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, VERSION, tick_rate, seed))
+        self.compressor = zlib.compressobj(level)
+        self.buffer = bytearray()
+        self.prev_mask = 0
+        self.idle = 0
+        self.ticks = 0
+
+    def record(self, mask, mouse_dx, mouse_dy, fire, toggle_hood, reload):
+        """Append one tick of input"""
+        self.ticks += 1
+        dx = round(mouse_dx * MOUSE_SCALE)
+        dy = round(mouse_dy * MOUSE_SCALE)
+        flags = ((KEYS_CHANGED if mask != self.prev_mask else 0)
+                 | (MOUSE if dx or dy else 0)
+                 | (FIRE if fire else 0)
+                 | (TOGGLE_HOOD if toggle_hood else 0)
+                 | (RELOAD if reload else 0))
+        if not flags:
+            self.idle += 1
+            return
+
+        out = self.buffer
+        self._flush_idle()
+        out.append(flags)
+        if flags & KEYS_CHANGED:
+            _write_varint(out, mask ^ self.prev_mask)
+            self.prev_mask = mask
+        if flags & MOUSE:
+            _write_varint(out, _zigzag(dx))
+            _write_varint(out, _zigzag(dy))
+        if flags & FIRE:
+            _write_varint(out, fire)
+        if flags & RELOAD:
+            _write_varint(out, reload)
+
+        if len(out) >= 1 << 16:
+            self.file.write(self.compressor.compress(bytes(out)))
+            out.clear()
+
+    def _flush_idle(self):
+        if self.idle:
+            self.buffer.append(IDLE_RUN)
+            _write_varint(self.buffer, self.idle)
+            self.idle = 0
+
+    def close(self):
+        self._flush_idle()
+        self.file.write(self.compressor.compress(bytes(self.buffer)))
+        self.file.write(self.compressor.flush())
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ============================================
+# 3. REPLAYER
+# ============================================
+
+class InputReplay:
+    """Iterates a recording as (mask, mouse_dx, mouse_dy, fire, toggle_hood, reload)"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            magic, version, self.tick_rate, self.seed = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an ARROW input recording")
+        if version != VERSION:
+            raise ValueError(f"{path}: unsupported recording version {version}")
+
+    def _chunks(self):
+        decompressor = zlib.decompressobj()
+        with open(self.path, 'rb') as f:
+            f.seek(HEADER.size)
+            while True:
+                data = f.read(1 << 16)
+                if not data:
+                    break
+                yield decompressor.decompress(data)
+        yield decompressor.flush()
+
+    def __iter__(self):
+        buf = b''
+        pos = 0
+        mask = 0
+        chunks = self._chunks()
+        for chunk in chunks:
+            buf = buf[pos:] + chunk
+            pos = 0
+            # Records are tiny; only decode while a whole one is surely buffered
+            while len(buf) - pos > 64:
+                pos, mask = yield from self._decode(buf, pos, mask)
+        while pos < len(buf):
+            pos, mask = yield from self._decode(buf, pos, mask)
+
+    @staticmethod
+    def _decode(buf, pos, mask):
+        flags = buf[pos]
+        pos += 1
+        if flags & IDLE_RUN:
+            count, pos = _read_varint(buf, pos)
+            for _ in range(count):
+                yield (mask, 0.0, 0.0, 0, False, 0)
+            return pos, mask
+
+        dx = dy = 0
+        fire = reload = 0
+        if flags & KEYS_CHANGED:
+            diff, pos = _read_varint(buf, pos)
+            mask ^= diff
+        if flags & MOUSE:
+            dx, pos = _read_varint(buf, pos)
+            dy, pos = _read_varint(buf, pos)
+            dx, dy = _unzigzag(dx), _unzigzag(dy)
+        if flags & FIRE:
+            fire, pos = _read_varint(buf, pos)
+        if flags & RELOAD:
+            reload, pos = _read_varint(buf, pos)
+        yield (mask, dx / MOUSE_SCALE, dy / MOUSE_SCALE, fire,
+               bool(flags & TOGGLE_HOOD), reload)
+        return pos, mask
@@ -4,25 +4,62 @@ Python + ModernGL + Pygame
 Author: Generated per user request
 """
 
+import argparse
+import gc
+import hashlib
+import json
+import os
+import struct
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
 import pygame
 import moderngl
 import numpy as np
 import glm
 from pygame.locals import *
 
+from assets import ART_DIR, AssetManager, LoadingScreen, ProgramDedup
+from crowd import Crowd
+from geometry import BoxInstances, build_street_mesh, place_lampposts, street_segments
+from governor import LADDER, QualityGovernor
+from navigation import NavGrid, PathPlanner
+from occlusion import OcclusionCuller, OcclusionWorker
+from profiler import FrameProfiler, ProfilerOverlay
+from replay import InputRecorder, InputReplay
+from snapshot import Autosaver, Snapshot, load_any
+from trails import ArrowTrails
+
 # ============================================
 # 1. STARLING CITY WORLD GENERATOR
 # ============================================
 
+TILE_SIZE = 50  # world units per side of a save/streaming tile
+
+
 class StarlingCity:
     """Procedurally generates the Arrowverse open world environment"""
     
-    def __init__(self, ctx):
+    def __init__(self, ctx, seed=None):
         self.ctx = ctx
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
         self.buildings = []
         self.streets = []
         self.lampposts = []
+        self.static_mesh = None
+        self.building_mesh = None
+        self.occlusion = None
+        self.tile_versions = {}  # tile -> edit count; tiles not listed are as generated
+        self.navgrid = None
+        self._pathfinder = None
         self._generate_city()
+        if ctx is not None:
+            # Streets + lampposts merged into one indexed buffer, uploaded on first render
+            self.static_mesh = build_street_mesh(self.streets, self.lampposts)
+            self._build_buildings()
     
     def _generate_city(self):
         """Creates the Glades + Starling City downtown"""
@@ -39,7 +76,7 @@ class StarlingCity:
             for z in range(-50, 50, 8):
                 if abs(x) < 10 and abs(z) < 10:  # Skip center for tower
                     continue
-                height = np.random.randint(8, 25)
+                height = int(self.rng.integers(8, 25))
                 self.buildings.append({
                     'pos': (x, height/2, z),
                     'scale': (6, height, 6),
@@ -61,11 +98,84 @@ class StarlingCity:
         for i in range(-100, 100, 15):
             self.streets.append({'start': (i, 0.1, -100), 'end': (i, 0.1, 100)})
             self.streets.append({'start': (-100, 0.1, i), 'end': (100, 0.1, i)})
+        
+        # Lampposts along every street, alternating kerbs (M x 3 array of feet)
+        self.lampposts = place_lampposts(street_segments(self.streets), rng=self.rng)
+    
+    @property
+    def pathfinder(self):
+        """Route planner over the current buildings, baked on first use"""
+        # Nothing in the frame loop routes yet; until something does, neither
+        # startup nor replace_tiles pays for the walkable grid
+        if self._pathfinder is None:
+            self.navgrid = NavGrid.from_buildings(self.buildings, ((-105, -105), (105, 105)))
+            self._pathfinder = PathPlanner(self.navgrid)
+        return self._pathfinder
+    
+    def tile_of(self, pos):
+        return int(pos[0] // TILE_SIZE), int(pos[2] // TILE_SIZE)
+    
+    def tile_buildings(self, tile):
+        return [b for b in self.buildings if self.tile_of(b['pos']) == tile]
     
-    def render(self, prog, camera_matrix):
-        """Render all city geometry with shader"""
-        # Simplified - full ModernGL implementation would batch render
-        pass
+    def changed_tiles(self):
+        """Tiles that no longer match what the seed generates"""
+        return list(self.tile_versions)
+    
+    def replace_tiles(self, tiles):
+        """Swap every building in some tiles (demolition, construction, a loaded save).
+        
+        tiles maps tile -> its new buildings; paths, if anything has asked for
+        one, are repaired once for all of them.
+        """
+        old = [b for b in self.buildings if self.tile_of(b['pos']) in tiles]
+        self.buildings = [b for b in self.buildings if self.tile_of(b['pos']) not in tiles]
+        new = [b for buildings in tiles.values() for b in buildings]
+        self.buildings += new
+        if self._pathfinder is not None:
+            self._pathfinder.repair(np.concatenate([self.navgrid.remove_footprints(old),
+                                                    self.navgrid.add_footprints(new)]))
+        for tile in tiles:
+            self.tile_versions[tile] = self.tile_versions.get(tile, 0) + 1
+        if self.ctx is not None:
+            self._build_buildings()
+    
+    def _build_buildings(self):
+        """Instance buffer, and the occlusion culler if enabled, in self.buildings order"""
+        if self.building_mesh is not None and self.building_mesh.vao is not None:
+            self.building_mesh.vao.release()
+        self.building_mesh = BoxInstances.from_buildings(self.buildings)
+        self.building_xz = np.array([(b['pos'][0], b['pos'][2]) for b in self.buildings],
+                                    dtype=np.float32).reshape(-1, 2)
+        if self.occlusion is not None:
+            self.occlusion = OcclusionCuller.for_buildings(self.buildings)
+    
+    def enable_occlusion(self):
+        """Build the occlusion culler (kept current by _build_buildings from then on)"""
+        self.occlusion = OcclusionCuller.for_buildings(self.buildings)
+        return self.occlusion
+    
+    def buildings_within(self, position, distance):
+        """Mask of the buildings whose ground distance from position is at most distance"""
+        offset = self.building_xz - np.array((position[0], position[2]), dtype=np.float32)
+        return np.einsum('nc,nc->n', offset, offset) <= distance * distance
+    
+    def render(self, prog, camera_matrix, detail=0, building_prog=None, visible=None):
+        """Render all city geometry with shader (camera uniform already set)
+        
+        visible masks the buildings (range and occlusion); None draws all.
+        """
+        if self.static_mesh is not None:
+            if self.static_mesh.vao is None:
+                self.static_mesh.upload(self.ctx, prog)
+            # Detail 1 draws the roads alone (the mesh's first part), no lampposts
+            self.static_mesh.render(None if detail == 0 else 1)
+        if self.building_mesh is not None and building_prog is not None:
+            if self.building_mesh.vao is None:
+                self.building_mesh.upload(self.ctx, building_prog)
+            if visible is not None and len(visible) != len(self.buildings):
+                visible = None  # a mask from before the buildings changed
+            self.building_mesh.render(visible)
 
 
 # ============================================
@@ -189,19 +299,341 @@ class ArrowPhysics:
         arrow['lifetime'] -= dt
         return arrow['lifetime'] > 0
     
+    # The signature green blur is drawn by trails.ArrowTrails from the
+    # interpolated arrow positions of every rendered frame
+
+
+# ============================================
+# 4. FIXED-TIMESTEP SIMULATION
+# ============================================
+
+# Keys OliverQueen.handle_input reads - one bit each in a KeyState mask
+PATROL_KEYS = (K_w, K_s, K_a, K_d, K_LSHIFT, K_SPACE)
+
+
+class KeyState:
+    """Held-key snapshot, indexable by pygame key constants"""
+    
+    def __init__(self, mask=0):
+        self.mask = mask
+    
+    @classmethod
+    def from_pressed(cls, pressed):
+        """Build from pygame.key.get_pressed()"""
+        mask = 0
+        for bit, key in enumerate(PATROL_KEYS):
+            if pressed[key]:
+                mask |= 1 << bit
+        return cls(mask)
+    
+    def __getitem__(self, key):
+        try:
+            return bool(self.mask & (1 << PATROL_KEYS.index(key)))
+        except ValueError:
+            return False
+
+
+class TickInput:
+    """Everything the player did between two simulation ticks"""
+    
+    def __init__(self, keys=None, mouse_dx=0.0, mouse_dy=0.0, fire=0,
+                 toggle_hood=False, reload=0):
+        self.keys = keys if keys is not None else KeyState()
+        self.mouse_dx = mouse_dx
+        self.mouse_dy = mouse_dy
+        self.fire = fire
+        self.toggle_hood = toggle_hood
+        self.reload = reload
+    
+    def merge(self, other):
+        """Fold a later input into this one (held keys are replaced, events add up)"""
+        self.keys = other.keys
+        self.mouse_dx += other.mouse_dx
+        self.mouse_dy += other.mouse_dy
+        self.fire += other.fire
+        self.toggle_hood ^= other.toggle_hood
+        self.reload += other.reload
+    
+    def held(self):
+        """Input for a follow-up substep: same keys, events already consumed"""
+        return TickInput(self.keys)
+    
+    def record(self):
+        """Flat tuple for InputRecorder"""
+        return (self.keys.mask, self.mouse_dx, self.mouse_dy, self.fire,
+                self.toggle_hood, self.reload)
+    
+    @classmethod
+    def from_record(cls, record):
+        mask, mouse_dx, mouse_dy, fire, toggle_hood, reload = record
+        return cls(KeyState(mask), mouse_dx, mouse_dy, fire, toggle_hood, reload)
+
+
+class RenderState:
+    """What the renderer needs from one simulation tick"""
+    
+    def __init__(self, position, rotation, arrows):
+        self.position = position
+        self.rotation = rotation
+        self.arrows = arrows  # arrow id -> position
+    
+    @classmethod
+    def capture(cls, simulation):
+        oliver = simulation.oliver
+        return cls(
+            glm.vec3(oliver.position),
+            glm.vec2(oliver.rotation),
+            {a['id']: glm.vec3(a['position']) for a in simulation.arrows}
+        )
+    
     @staticmethod
-    def render_arrow_trail(arrow):
-        """Draw the signature green blur effect"""
-        # Implementation would create line segments
-        pass
+    def lerp(prev, curr, alpha):
+        """Blend two ticks; arrows spawned this tick are drawn where they are"""
+        arrows = {}
+        for arrow_id, pos in curr.arrows.items():
+            old = prev.arrows.get(arrow_id)
+            arrows[arrow_id] = glm.mix(old, pos, alpha) if old is not None else pos
+        return RenderState(
+            glm.mix(prev.position, curr.position, alpha),
+            glm.mix(prev.rotation, curr.rotation, alpha),
+            arrows
+        )
+
+
+def _no_section(name):
+    return nullcontext()
+
+
+class PatrolSimulation:
+    """Authoritative world state, advanced only in fixed ticks"""
+    
+    def __init__(self, city, oliver, tick_rate=60, crowd=None):
+        self.city = city
+        self.oliver = oliver
+        self.arrows = []
+        self.crowd = crowd  # optional NPCs walking city.streets
+        self.crowd_stride = 1  # steer the crowd every n-th tick (QualityGovernor)
+        self._crowd_ticks = 0
+        self.tick_rate = tick_rate
+        self.dt = 1.0 / tick_rate
+        self.tick = 0
+        self._next_arrow_id = 0
+        self.recorder = None  # InputRecorder capturing every tick's input
+        self.autosaver = None  # snapshot.Autosaver, checked after every tick
+    
+    def step(self, tick_input, timer=None):
+        """Advance the world by exactly one tick"""
+        if self.recorder:
+            self.recorder.record(*tick_input.record())
+        section = timer.section if timer else _no_section
+        with section('player'):
+            self.update_player(tick_input)
+        with section('arrows'):
+            self.update_arrows()
+        if self.crowd is not None:
+            with section('crowd'):
+                self.update_crowd()
+        self.tick += 1
+        if self.autosaver:
+            with section('autosave'):
+                self.autosaver.after_tick(self)
+    
+    def update_player(self, tick_input, oliver=None):
+        oliver = oliver or self.oliver
+        if tick_input.toggle_hood:
+            oliver.hood_raised = not oliver.hood_raised
+        if tick_input.reload:
+            # Reload quiver (find arrows in environment)
+            oliver.quiver += 5 * tick_input.reload
+        if tick_input.mouse_dx or tick_input.mouse_dy:
+            oliver.aim_bow(tick_input.mouse_dx, tick_input.mouse_dy)
+        for _ in range(tick_input.fire):
+            arrow = oliver.release_arrow()
+            if arrow:
+                arrow['id'] = self._next_arrow_id
+                self._next_arrow_id += 1
+                self.arrows.append(arrow)
+        oliver.handle_input(tick_input.keys, self.dt)
+    
+    def update_arrows(self):
+        self.arrows = [a for a in self.arrows if ArrowPhysics.update_arrow(a, self.dt)]
+    
+    def update_crowd(self):
+        self._crowd_ticks += 1
+        if self._crowd_ticks >= self.crowd_stride:
+            self.crowd.update(self.dt * self._crowd_ticks)
+            self._crowd_ticks = 0
+        hit = self.crowd.resolve_arrow_hits(self.arrows)
+        if hit:
+            self.arrows = [a for a in self.arrows if a['id'] not in hit]
+    
+    def state_hash(self):
+        """Digest of everything the simulation owns - equal hashes, equal worlds"""
+        oliver = self.oliver
+        h = hashlib.blake2b(digest_size=8)
+        h.update(struct.pack(
+            '<q8f2i2?', self.tick,
+            *oliver.position, *oliver.rotation, *oliver.velocity,
+            oliver.quiver, self._next_arrow_id, oliver.hood_raised, oliver.on_ground
+        ))
+        for a in self.arrows:
+            h.update(struct.pack('<i7f', a['id'], *a['position'], *a['velocity'], a['lifetime']))
+        if self.crowd is not None:
+            h.update(self.crowd.position.tobytes())
+            h.update(self.crowd.alive.tobytes())
+        return h.hexdigest()
+    
+    def render_state(self):
+        return RenderState.capture(self)
+
+
+class SimulationClock:
+    """Accumulator that turns variable frame time into fixed ticks"""
+    
+    def __init__(self, tick_rate=60, max_substeps=5):
+        self.tick_dt = 1.0 / tick_rate
+        self.max_substeps = max_substeps
+        self.accumulator = 0.0
+        
+        # Metrics
+        self.ticks = 0
+        self.substeps = 0          # ticks run for the last frame
+        self.dropped_time = 0.0    # seconds discarded by the substep cap
+        self.measured_tick_rate = 0.0
+        self._window_time = 0.0
+        self._window_ticks = 0
+    
+    def advance(self, frame_dt):
+        """Add elapsed time, return how many ticks to run now"""
+        self.accumulator += frame_dt
+        steps = int(self.accumulator / self.tick_dt)
+        if steps > self.max_substeps:
+            # Spiral-of-death guard: let the sim fall behind real time
+            self.dropped_time += (steps - self.max_substeps) * self.tick_dt
+            steps = self.max_substeps
+            self.accumulator = self.accumulator % self.tick_dt
+        else:
+            self.accumulator -= steps * self.tick_dt
+        
+        self.ticks += steps
+        self.substeps = steps
+        self._window_time += frame_dt
+        self._window_ticks += steps
+        if self._window_time >= 1.0:
+            self.measured_tick_rate = self._window_ticks / self._window_time
+            self._window_time = 0.0
+            self._window_ticks = 0
+        return steps
+    
+    @property
+    def alpha(self):
+        """How far between the last two ticks the current frame lies"""
+        return self.accumulator / self.tick_dt
+    
+    def metrics(self):
+        return {
+            'tick_rate': self.measured_tick_rate,
+            'substeps': self.substeps,
+            'dropped_time': self.dropped_time,
+            'ticks': self.ticks
+        }
+
+
+class SimulationThread(threading.Thread):
+    """Runs PatrolSimulation off the render thread so slow frames can't stall it"""
+    
+    def __init__(self, simulation, clock, inputs=None):
+        super().__init__(name='patrol-sim', daemon=True)
+        self.simulation = simulation
+        self.clock = clock
+        self.inputs = inputs  # replayed TickInputs instead of submitted ones
+        self.finished = False
+        self._lock = threading.Lock()
+        self._pending = TickInput()
+        self._prev = self._curr = simulation.render_state()
+        self._alpha = 0.0
+        self._stop_event = threading.Event()
+    
+    def submit(self, tick_input):
+        """Queue input gathered by the render thread"""
+        with self._lock:
+            self._pending.merge(tick_input)
+    
+    def run(self):
+        last = time.perf_counter()
+        while not self._stop_event.is_set():
+            now = time.perf_counter()
+            steps = self.clock.advance(now - last)
+            last = now
+            for _ in range(steps):
+                if self.inputs is not None:
+                    tick_input = next(self.inputs, None)
+                    if tick_input is None:
+                        self.finished = True
+                        return
+                else:
+                    with self._lock:
+                        tick_input = self._pending
+                        self._pending = tick_input.held()
+                self.simulation.step(tick_input)
+                state = self.simulation.render_state()
+                with self._lock:
+                    self._prev, self._curr = self._curr, state
+            with self._lock:
+                self._alpha = self.clock.alpha
+            time.sleep(max(0.0, self.clock.tick_dt - self.clock.accumulator))
+    
+    def interpolated_state(self):
+        with self._lock:
+            return RenderState.lerp(self._prev, self._curr, self._alpha)
+    
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def view_matrix(state):
+    """First-person camera at eye level"""
+    eye = state.position + glm.vec3(0, 1.8, 0)
+    return glm.lookAt(
+        eye,
+        eye + glm.vec3(
+            glm.sin(state.rotation.x) * glm.cos(state.rotation.y),
+            glm.sin(state.rotation.y),
+            glm.cos(state.rotation.x) * glm.cos(state.rotation.y)
+        ),
+        glm.vec3(0, 1, 0)
+    )
 
 
 # ============================================
-# 4. MAIN ENGINE INITIALIZATION
+# 5. MAIN ENGINE INITIALIZATION
 # ============================================
 
-def main():
+def main(tick_rate=60, max_substeps=5, threaded_sim=False, seed=None,
+         record=None, replay=None, slow_frame_ms=None, agents=0, crowd_workers=0,
+         load=None, autosave=None, frame_budget_ms=1000.0 / 60, connect=None,
+         occlusion=False, occlusion_thread=False):
     """Initialize Pygame, ModernGL, and run the Arrow open world"""
+    startup = time.perf_counter()
+    
+    # A replay brings its own tick rate, seed and input stream
+    replay_inputs = None
+    if replay:
+        recording = InputReplay(replay)
+        tick_rate, seed = recording.tick_rate, recording.seed
+        replay_inputs = map(TickInput.from_record, recording)
+    # A save brings its own city seed
+    snapshot = load_any(load) if load else None
+    if snapshot:
+        seed = snapshot.seed
+    # So does a Team Arrow server, which then owns the world; we only draw it
+    net = None
+    if connect:
+        from netplay import NetClient  # netplay imports this module
+        host, _, port = connect.partition(':')
+        net = NetClient(host or '127.0.0.1', int(port or 27960))
+        tick_rate, seed = net.tick_rate, net.seed
     
     # Pygame setup
     pygame.init()
@@ -212,17 +644,29 @@ def main():
     
     # ModernGL context
     ctx = moderngl.create_context()
+    ctx.enable(moderngl.DEPTH_TEST | moderngl.CULL_FACE)
+    
+    # The splash decodes on a worker thread; nothing else in the scene
+    # samples the key art, so none is loaded
+    programs = ProgramDedup(ctx)
+    assets = AssetManager(ctx)
+    loading = LoadingScreen(ctx, programs, assets, os.path.join(ART_DIR, 'Arrow_Intertitle.png'))
+    loading.draw(0.0)
+    pygame.display.flip()
     
     # Compile shaders (OpenGL 3.3+)
     vertex_shader = '''
     #version 330
     uniform mat4 camera;
     in vec3 in_position;
+    in vec3 in_normal;   // packed: n * 0.5 + 0.5
     in vec3 in_color;
     out vec3 v_color;
     void main() {
         gl_Position = camera * vec4(in_position, 1.0);
-        v_color = in_color;
+        vec3 normal = normalize(in_normal * 2.0 - 1.0);
+        float moonlight = max(dot(normal, normalize(vec3(0.3, 1.0, 0.2))), 0.0);
+        v_color = in_color * (0.35 + 0.65 * moonlight);
     }
     '''
     
@@ -235,82 +679,419 @@ def main():
     }
     '''
     
-    prog = ctx.program(
-        vertex_shader=vertex_shader,
-        fragment_shader=fragment_shader
-    )
+    prog = programs.get(vertex_shader, fragment_shader)
+    
+    # Buildings: one unit cube, stretched and tinted per instance
+    building_vertex_shader = '''
+    #version 330
+    uniform mat4 camera;
+    in vec3 in_position;
+    in vec3 in_normal;   // packed: n * 0.5 + 0.5
+    in vec3 in_color;
+    in vec3 in_center;
+    in vec3 in_size;
+    in vec3 in_tint;
+    out vec3 v_color;
+    void main() {
+        gl_Position = camera * vec4(in_center + in_position * in_size, 1.0);
+        vec3 normal = normalize(in_normal * 2.0 - 1.0);
+        float moonlight = max(dot(normal, normalize(vec3(0.3, 1.0, 0.2))), 0.0);
+        v_color = in_color * in_tint * (0.35 + 0.65 * moonlight);
+    }
+    '''
+    building_prog = programs.get(building_vertex_shader, fragment_shader)
     
     # Initialize world and player
-    starling_city = StarlingCity(ctx)
+    starling_city = StarlingCity(ctx, seed)
     oliver = OliverQueen()
-    arrows = []
-    
-    # Camera matrices
-    proj = glm.perspective(glm.radians(65.0), 1280/720, 0.1, 500.0)
+    crowd = Crowd(starling_city.streets, agents, seed or 0, workers=crowd_workers) if agents else None
+    simulation = PatrolSimulation(starling_city, oliver, tick_rate, crowd)
+    sim_clock = SimulationClock(tick_rate, max_substeps)
+    if record:
+        simulation.recorder = InputRecorder(record, tick_rate, seed or 0)
+    if snapshot:
+        snapshot.restore(simulation)
+    # F5 saves now; otherwise every 30 s of game time
+    if autosave:
+        simulation.autosaver = Autosaver(autosave, interval_ticks=30 * tick_rate)
     
+    # Loading state: stay responsive until the splash is resident
     clock = pygame.time.Clock()
     running = True
+    while running and not assets.done:
+        clock.tick(60)
+        for event in pygame.event.get():
+            if event.type == QUIT or (event.type == KEYDOWN and event.key == K_ESCAPE):
+                running = False
+        loading.draw(assets.pump())
+        pygame.display.flip()
+    warm = assets.requested and assets.cache_hits == assets.requested
+    print(f"Startup ({'warm' if warm else 'cold'}): {time.perf_counter() - startup:.2f}s, "
+          f"{assets.cache_hits}/{assets.requested} images from cache, "
+          f"{assets.decode_seconds:.2f}s decode time across workers, {len(programs)} shader "
+          f"programs linked in {programs.link_seconds * 1000:.0f} ms (no cross-run cache)")
+    
+    sim_thread = None
+    if threaded_sim:
+        sim_thread = SimulationThread(simulation, sim_clock, replay_inputs)
+        sim_thread.start()
+    pending = TickInput()
+    prev_state = curr_state = simulation.render_state()
+    
+    # Quality governor - trades draw distance, detail, trails and crowd rate
+    # for frame time. The crowd knob changes the simulation, so it stays put
+    # while recording or replaying to keep those runs deterministic.
+    governor = None
+    if frame_budget_ms:
+        governor = QualityGovernor(frame_budget_ms, crowd=not (record or replay))
+    quality = governor.quality if governor else LADDER[0]
+    
+    # Camera matrices
+    proj = glm.perspective(glm.radians(65.0), 1280/720, 0.1, quality.far_plane)
+    
+    # Occlusion culling - buildings hidden behind nearer ones are not drawn.
+    # Opt-in: on the shipped city (~200 buildings) a 3.4 ms pass hides ~8% of
+    # them and changes the mask, so the instance buffer is rewritten, nearly
+    # every frame - a loss. It pays on denser cities (occlusion.py --city).
+    # The worker computes each frame's mask while the frame renders and the
+    # next frame draws with it (the city must not change after this point).
+    culler = worker = None
+    if occlusion:
+        culler = starling_city.enable_occlusion()
+        culler.far = quality.far_plane
+        if occlusion_thread:
+            worker = OcclusionWorker(culler)
+            worker.start()
+    visible = None
+    
+    # Instrumentation - F3 toggles the overlay, F4 dumps a Chrome trace
+    profiler = FrameProfiler(ctx, slow_frame_ms=slow_frame_ms)
+    overlay = ProfilerOverlay(ctx, profiler, (1280, 720))
+    trails = ArrowTrails(ctx, fps=60)  # rows span the fade at clock.tick's cap
+    section = profiler.section
+    
+    render_time = 0.0  # trail timestamps
+    last_metrics = 0.0
     
     # ========================================
-    # 5. GAME LOOP - STARLING CITY NIGHT PATROL
+    # 6. GAME LOOP - STARLING CITY NIGHT PATROL
     # ========================================
     
     while running:
-        dt = clock.tick(60) / 1000.0  # Delta time (seconds)
+        frame_dt = clock.tick(60) / 1000.0  # Render frame time (seconds)
+        render_time += frame_dt
+        profiler.begin_frame()
         
-        # Event handling
-        for event in pygame.event.get():
-            if event.type == QUIT:
-                running = False
-            elif event.type == KEYDOWN:
-                if event.key == K_ESCAPE:
+        # Event handling - gathered into one input for the next tick
+        with section('events'):
+            frame_input = TickInput()
+            for event in pygame.event.get():
+                if event.type == QUIT:
                     running = False
-                elif event.key == K_f:
-                    oliver.hood_raised = not oliver.hood_raised
-                elif event.key == K_r:
-                    # Reload quiver (find arrows in environment)
-                    oliver.quiver += 5
-            elif event.type == MOUSEMOTION:
-                # Aim bow with mouse
-                oliver.aim_bow(event.rel[0], event.rel[1])
-            elif event.type == MOUSEBUTTONDOWN:
-                if event.button == 1:  # Left click - fire
-                    arrow = oliver.release_arrow()
-                    if arrow:
-                        arrows.append(arrow)
-        
-        # Continuous input
-        keys = pygame.key.get_pressed()
-        oliver.handle_input(keys, dt)
-        
-        # Update arrows
-        arrows = [a for a in arrows if ArrowPhysics.update_arrow(a, dt)]
+                elif event.type == KEYDOWN:
+                    if event.key == K_ESCAPE:
+                        running = False
+                    elif event.key == K_f:
+                        frame_input.toggle_hood ^= True
+                    elif event.key == K_r:
+                        frame_input.reload += 1
+                    elif event.key == K_F3:
+                        overlay.toggle()
+                    elif event.key == K_F4:
+                        profiler.dump_chrome_trace()
+                    elif event.key == K_F5 and simulation.autosaver:
+                        simulation.autosaver.request()
+                elif event.type == MOUSEMOTION:
+                    # Aim bow with mouse
+                    frame_input.mouse_dx += event.rel[0]
+                    frame_input.mouse_dy += event.rel[1]
+                elif event.type == MOUSEBUTTONDOWN:
+                    if event.button == 1:  # Left click - fire
+                        frame_input.fire += 1
+            
+            # Continuous input
+            frame_input.keys = KeyState.from_pressed(pygame.key.get_pressed())
         
-        # Camera view (first-person)
-        view = glm.lookAt(
-            oliver.position + glm.vec3(0, 1.8, 0),  # Eye level
-            oliver.position + glm.vec3(0, 1.8, 0) + glm.vec3(
-                glm.sin(oliver.rotation.x) * glm.cos(oliver.rotation.y),
-                glm.sin(oliver.rotation.y),
-                glm.cos(oliver.rotation.x) * glm.cos(oliver.rotation.y)
-            ),
-            glm.vec3(0, 1, 0)
-        )
+        # Simulation - fixed ticks, interpolated for display
+        with section('simulation'):
+            if net:
+                net.send_input(frame_input)
+                net.poll()
+                state = net.render_state() or curr_state
+                running = running and net.connected
+            elif sim_thread:
+                sim_thread.submit(frame_input)
+                state = sim_thread.interpolated_state()
+                running = running and not sim_thread.finished
+            else:
+                pending.merge(frame_input)
+                for _ in range(sim_clock.advance(frame_dt)):
+                    if replay_inputs is not None:
+                        tick_input = next(replay_inputs, None)
+                        if tick_input is None:
+                            running = False
+                            break
+                    else:
+                        tick_input, pending = pending, pending.held()
+                    simulation.step(tick_input, profiler)
+                    prev_state, curr_state = curr_state, simulation.render_state()
+                state = RenderState.lerp(prev_state, curr_state, sim_clock.alpha)
         
-        camera_matrix = proj * view
+        with section('view_matrix'):
+            camera_matrix = proj * view_matrix(state)
         
-        # Clear screen (gritty night vision)
-        ctx.clear(0.08, 0.1, 0.15, 1.0)  # Dark blue-black - Starling City night
+        with section('occlusion'):
+            if worker:
+                visible = worker.submit(np.array(camera_matrix), state.position + glm.vec3(0, 1.8, 0))
+            elif culler:
+                visible = culler.visible(np.array(camera_matrix), state.position + glm.vec3(0, 1.8, 0))
+            # The governor's building rung: drop buildings past its range
+            drawn = starling_city.buildings_within(state.position, quality.building_range)
+            if visible is not None and len(visible) == len(drawn):
+                drawn &= visible
         
-        # Render city
-        prog['camera'].write(camera_matrix)
+        with profiler.gpu_section('render'):
+            # Clear screen (gritty night vision)
+            ctx.clear(0.08, 0.1, 0.15, 1.0)  # Dark blue-black - Starling City night
+            
+            # Render city
+            with section('camera_write'):
+                prog['camera'].write(camera_matrix)
+            
+            with section('city'):
+                building_prog['camera'].write(camera_matrix)
+                starling_city.render(prog, camera_matrix, quality.detail, building_prog, drawn)
+            
+            with section('trails'):
+                trails.update(state.arrows, render_time, quality.max_trails)
+                trails.render(camera_matrix, render_time)
+            
+            overlay.draw()
         
-        # This is where you'd batch render all geometry
-        # Full ModernGL VAO/VBO implementation would go here
+        with section('flip'):
+            pygame.display.flip()
+        frame_ms = profiler.end_frame()
+        # The swap waits for vsync, so a synced frame always reads ~16.7 ms;
+        # the governor gets the frame's work instead - CPU time before the
+        # swap, or the GPU's own time (a few frames old) if that is longer
+        gpu_ms = profiler.samples['gpu:render']
+        work_ms = max(frame_ms - profiler.samples['flip'][-1], gpu_ms[-1] if gpu_ms else 0.0)
+        changed = governor.observe(work_ms) if governor else None
+        if changed:
+            quality = changed
+            proj = glm.perspective(glm.radians(65.0), 1280/720, 0.1, quality.far_plane)
+            simulation.crowd_stride = quality.crowd_stride
+            if culler:
+                culler.far = quality.far_plane
         
-        pygame.display.flip()
+        # Simulation metrics in the title bar, once a second
+        now = time.perf_counter()
+        if now - last_metrics >= 1.0:
+            last_metrics = now
+            m = sim_clock.metrics()
+            culled = ''
+            if culler:
+                stats = worker.stats if worker else culler.stats
+                hidden = (stats['frustum_culled'] + stats['occluded']) / max(stats['boxes'], 1)
+                culled = f", {hidden:.0%} buildings culled ({stats['ms']:.1f} ms)"
+            pygame.display.set_caption(
+                f"ARROW: Starling City - {m['tick_rate']:.0f} ticks/s, "
+                f"{m['substeps']} substeps, {m['dropped_time']:.2f}s dropped, "
+                f"quality {governor.level if governor else 0}{culled}"
+            )
     
+    if sim_thread:
+        sim_thread.stop()
+    if worker:
+        worker.stop()
+    if net:
+        net.close()
+    if simulation.recorder:
+        simulation.recorder.close()
+    if simulation.autosaver:
+        simulation.autosaver.close()
+    if crowd is not None:
+        crowd.close()
+    assets.close()
     pygame.quit()
 
+
+# ============================================
+# 7. HEADLESS SIMULATION & BENCHMARK
+# ============================================
+
+class SystemTimer:
+    """Per-system wall time and net allocated blocks, accumulated over a run"""
+    
+    def __init__(self):
+        self.seconds = {}
+        self.blocks = {}
+    
+    @contextmanager
+    def section(self, name):
+        blocks = sys.getallocatedblocks()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] = self.seconds.get(name, 0.0) + time.perf_counter() - start
+            self.blocks[name] = self.blocks.get(name, 0) + sys.getallocatedblocks() - blocks
+
+
+def scripted_patrol(tick):
+    """Deterministic stand-in for a player: walk, strafe, sprint, jump, shoot"""
+    phase = (tick // 120) % 4
+    mask = 1 << PATROL_KEYS.index(K_w)
+    if phase == 1:
+        mask |= 1 << PATROL_KEYS.index(K_a)
+    elif phase == 2:
+        mask |= 1 << PATROL_KEYS.index(K_LSHIFT)
+    elif phase == 3:
+        mask |= 1 << PATROL_KEYS.index(K_d)
+    if tick % 90 == 0:
+        mask |= 1 << PATROL_KEYS.index(K_SPACE)
+    return TickInput(
+        KeyState(mask),
+        mouse_dx=3.0 if phase in (1, 3) else 0.0,
+        mouse_dy=0.5 if tick % 240 < 120 else -0.5,
+        fire=1 if tick % 20 == 0 else 0,
+        reload=1 if tick % 600 == 599 else 0
+    )
+
+
+def script_inputs(path):
+    """Read one JSON object of TickInput fields per line"""
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                fields = json.loads(line)
+                fields['keys'] = KeyState(fields.get('keys', 0))
+                yield TickInput(**fields)
+
+
+def run_headless(ticks, inputs=None, seed=0, tick_rate=60, hash_out=None, record=None,
+                 agents=0, crowd_workers=0, load=None, save=None, budget_ms=None):
+    """Run city generation, player, arrows and crowd for N ticks without a window
+
+    budget_ms puts the quality governor on the tick cost; only its crowd
+    stride affects a headless run, and state hashes then depend on timing.
+    """
+    timer = SystemTimer()
+    snapshot = load_any(load) if load else None
+    if snapshot:
+        seed = snapshot.seed
+    gc_before = gc.get_stats()[0]['collections']
+    
+    with timer.section('city'):
+        starling_city = StarlingCity(None, seed=seed)
+    crowd = None
+    if agents:
+        with timer.section('crowd_spawn'):
+            crowd = Crowd(starling_city.streets, agents, seed, workers=crowd_workers)
+    simulation = PatrolSimulation(starling_city, OliverQueen(), tick_rate, crowd)
+    if record:
+        simulation.recorder = InputRecorder(record, tick_rate, seed)
+    if snapshot:
+        with timer.section('load'):
+            snapshot.restore(simulation)
+    if inputs is None:
+        inputs = map(scripted_patrol, range(simulation.tick, ticks))
+    inputs = iter(inputs)
+    governor = None
+    if budget_ms:
+        governor = QualityGovernor(budget_ms, log=lambda line: print(line, file=sys.stderr))
+    
+    start = time.perf_counter()
+    for tick_input in inputs:
+        if simulation.tick >= ticks:
+            break
+        tick_start = time.perf_counter()
+        simulation.step(tick_input, timer)
+        if governor:
+            changed = governor.observe((time.perf_counter() - tick_start) * 1000.0)
+            if changed:
+                simulation.crowd_stride = changed.crowd_stride
+        if hash_out:
+            hash_out.write(f"{simulation.tick} {simulation.state_hash()}\n")
+    elapsed = time.perf_counter() - start
+    if save:
+        with timer.section('save'):
+            Snapshot.capture(simulation).save(save)
+    if simulation.recorder:
+        simulation.recorder.close()
+    if crowd is not None:
+        crowd.close()
+    
+    return {
+        'ticks': simulation.tick,
+        'seconds': elapsed,
+        'ticks_per_second': simulation.tick / elapsed if elapsed else 0.0,
+        'system_seconds': timer.seconds,
+        'system_blocks': timer.blocks,
+        'gc_collections': gc.get_stats()[0]['collections'] - gc_before,
+        'crowd_hits': crowd.hits if crowd is not None else 0,
+        'governor': governor.report() if governor else None,
+        'final_hash': simulation.state_hash()
+    }
+
+
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tick-rate', type=int, default=60,
+                        help='simulation ticks per second')
+    parser.add_argument('--max-substeps', type=int, default=5,
+                        help='simulation ticks allowed per rendered frame')
+    parser.add_argument('--threaded-sim', action='store_true',
+                        help='run the simulation on its own thread')
+    parser.add_argument('--headless', type=int, metavar='TICKS',
+                        help='run TICKS simulation ticks without a window and report timings')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='city generation seed for headless runs')
+    parser.add_argument('--script', help='JSON-lines input script for headless runs')
+    parser.add_argument('--hash-out', help='write a state hash per tick to this file')
+    parser.add_argument('--record', help='record every tick of input to this file')
+    parser.add_argument('--replay', help='drive the simulation from a recording')
+    parser.add_argument('--agents', type=int, default=0,
+                        help='pedestrians and thugs walking the streets')
+    parser.add_argument('--crowd-workers', type=int, default=0,
+                        help='processes sharing the crowd update, split by region; '
+                             'ignored below crowd.POOL_BREAK_EVEN agents or a CPU per worker')
+    parser.add_argument('--slow-frame-ms', type=float,
+                        help='dump a Chrome trace when a frame takes longer than this')
+    parser.add_argument('--load', help='start from a snapshot file or autosave directory')
+    parser.add_argument('--save', help='headless: write a snapshot after the last tick')
+    parser.add_argument('--autosave', metavar='DIR',
+                        help='autosave into DIR every 30 s of game time (F5: save now)')
+    parser.add_argument('--connect', metavar='HOST:PORT',
+                        help='join a Team Arrow server (netplay.py) instead of simulating locally')
+    parser.add_argument('--frame-budget-ms', type=float,
+                        help='quality governor target (default 16.7, 0: fixed quality); '
+                             'headless: per-tick target, off unless given')
+    parser.add_argument('--occlusion', action='store_true',
+                        help='cull buildings hidden behind nearer ones (costs more than it '
+                             'saves on the shipped city; see occlusion.py)')
+    parser.add_argument('--occlusion-thread', action='store_true',
+                        help='with --occlusion: run it on its own thread, one frame behind')
+    args = parser.parse_args()
+    
+    if args.headless:
+        inputs = script_inputs(args.script) if args.script else None
+        if args.replay:
+            recording = InputReplay(args.replay)
+            args.tick_rate, args.seed = recording.tick_rate, recording.seed
+            inputs = map(TickInput.from_record, recording)
+        hash_out = open(args.hash_out, 'w') if args.hash_out else None
+        try:
+            report = run_headless(args.headless, inputs, args.seed, args.tick_rate,
+                                  hash_out, args.record, args.agents, args.crowd_workers,
+                                  args.load, args.save, args.frame_budget_ms)
+        finally:
+            if hash_out:
+                hash_out.close()
+        print(json.dumps(report, indent=2))
+    else:
+        main(args.tick_rate, args.max_substeps, args.threaded_sim, args.seed,
+             args.record, args.replay, args.slow_frame_ms, args.agents,
+             args.crowd_workers, args.load, args.autosave,
+             1000.0 / 60 if args.frame_budget_ms is None else args.frame_budget_ms,
+             args.connect, args.occlusion, args.occlusion_thread)
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+S.P.E.C.I.A.L. character sheet service
+A roster held in memory and served over HTTP with asyncio, rendered views cached per version
+"""
+
+import asyncio
+import json
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from perks import SPECIAL, Character
+from pipboy import ASSIGN, INCREASE, LEVEL_UP, OK, STATUS_NAMES, VIEWS, Session
+
+# ------------------------- Routes -------------------------
+#
+#   GET  /characters                        roster: slot, name, level
+#   GET  /characters/<slot>/<view>          sheet | special | perks | available
+#   POST /characters/<slot>/level_up
+#   POST /characters/<slot>/assign?perk=<name>
+#   POST /characters/<slot>/increase?attr=<S..L>
+#   GET  /stats                             requests, cache hits, renders
+#
+# Views are rendered once per character version (Character.version moves on
+# every level, attribute and rank change) and the finished HTTP response is
+# reused until then; the version doubles as the ETag, so a client holding a
+# current copy gets a bodiless 304.
+
+STATUS_LINES = {200: b'200 OK', 304: b'304 Not Modified', 400: b'400 Bad Request',
+                404: b'404 Not Found', 405: b'405 Method Not Allowed', 409: b'409 Conflict'}
+
+
+def http_response(status: int, body: bytes = b'', etag: Optional[str] = None) -> bytes:
+    headers = [b'HTTP/1.1 ' + STATUS_LINES[status],
+               b'Content-Type: application/json',
+               b'Content-Length: ' + str(len(body)).encode()]
+    if etag:
+        headers.append(b'ETag: "' + etag.encode() + b'"')
+    return b'\r\n'.join(headers) + b'\r\n\r\n' + body
+
+
+class SheetService:
+    """Routes requests to a Session, with one view cache per character.
+
+    handle() never awaits, so each request runs to completion on the event
+    loop before the next starts - no locking is needed around a character.
+    """
+
+    def __init__(self, session: Session):
+        self.session = session
+        self.cache: Dict[Tuple[int, str], Tuple[int, bytes]] = {}   # (slot, view) -> (version, response)
+        self.hits = 0
+        self.renders = 0
+        self.requests = 0
+
+    def render(self, slot: int, view: str, if_none_match: Optional[str]) -> bytes:
+        character = self.session.roster[slot]
+        etag = f"{slot}-{character.version}"
+        if if_none_match == f'"{etag}"':
+            self.hits += 1
+            return http_response(304, etag=etag)
+        cached = self.cache.get((slot, view))
+        if cached is not None and cached[0] == character.version:
+            self.hits += 1
+            return cached[1]
+        self.renders += 1
+        body = json.dumps(VIEWS[view](character)).encode()
+        response = http_response(200, body, etag)
+        self.cache[(slot, view)] = (character.version, response)
+        return response
+
+    async def handle(self, method: str, target: str, headers: Dict[str, str], body: bytes) -> bytes:
+        self.requests += 1
+        url = urlsplit(target)
+        parts = [part for part in url.path.split('/') if part]
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        if body and headers.get('content-type', '').startswith('application/json'):
+            try:
+                fields = json.loads(body)
+            except ValueError:
+                return http_response(400, b'{"error": "bad JSON body"}')
+            if not isinstance(fields, dict):
+                return http_response(400, b'{"error": "JSON body must be an object"}')
+            query.update(fields)
+        if not all(isinstance(value, str) for value in query.values()):
+            return http_response(400, b'{"error": "parameters must be strings"}')
+
+        if parts == ['stats'] and method == 'GET':
+            stats = {'requests': self.requests, 'cache_hits': self.hits, 'renders': self.renders}
+            return http_response(200, json.dumps(stats).encode())
+        if parts == ['characters'] and method == 'GET':
+            roster = [{'slot': slot, 'name': c.name, 'level': c.level}
+                      for slot, c in enumerate(self.session.roster)]
+            return http_response(200, json.dumps(roster).encode())
+        if len(parts) != 3 or parts[0] != 'characters' or not parts[1].isdigit():
+            return http_response(404, b'{"error": "no such resource"}')
+        slot, action = int(parts[1]), parts[2]
+        if slot >= len(self.session.roster):
+            return http_response(404, b'{"error": "no such character"}')
+
+        if method == 'GET':
+            if action not in VIEWS:
+                return http_response(404, b'{"error": "no such view"}')
+            return self.render(slot, action, headers.get('if-none-match'))
+
+        if method != 'POST':
+            return http_response(405)
+        character = self.session.roster[slot]
+        if action == 'level_up':
+            status, value = self.session.execute(slot, LEVEL_UP)
+        elif action == 'assign':
+            perk = character.tree.index.get(query.get('perk', ''))
+            if perk is None:
+                return http_response(400, b'{"error": "unknown perk"}')
+            status, value = self.session.execute(slot, ASSIGN, perk=perk)
+        elif action == 'increase':
+            attr = str(query.get('attr', '')).upper()
+            if attr not in SPECIAL:
+                return http_response(400, b'{"error": "attr must be one of S,P,E,C,I,A,L"}')
+            status, value = self.session.execute(slot, INCREASE, attribute=SPECIAL.index(attr))
+        else:
+            return http_response(404, b'{"error": "no such action"}')
+        result = {'ok': status == OK, 'status': STATUS_NAMES[status], 'value': value,
+                  'level': character.level, 'points': character.perk_points}
+        return http_response(200 if status == OK else 409, json.dumps(result).encode(),
+                             f"{slot}-{character.version}")
+
+    async def serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """HTTP/1.1 keep-alive: requests on one connection answered in order."""
+        try:
+            while True:
+                head = await reader.readuntil(b'\r\n\r\n')
+                lines = head.decode('latin-1').split('\r\n')
+                request_line = lines[0].split(' ', 2)
+                if len(request_line) != 3:
+                    writer.write(http_response(400, b'{"error": "malformed request line"}'))
+                    break
+                method, target, _ = request_line
+                headers = {}
+                for line in lines[1:]:
+                    if ':' in line:
+                        name, value = line.split(':', 1)
+                        headers[name.strip().lower()] = value.strip()
+                length = headers.get('content-length', '0')
+                if not (length.isascii() and length.isdigit()):
+                    writer.write(http_response(400, b'{"error": "bad Content-Length"}'))
+                    break
+                length = int(length)
+                body = await reader.readexactly(length) if length else b''
+                writer.write(await self.handle(method, target, headers, body))
+                if headers.get('connection', '').lower() == 'close':
+                    break
+                await writer.drain()
+        except asyncio.LimitOverrunError:
+            # A request head longer than the stream limit (64 KiB)
+            writer.write(http_response(400, b'{"error": "request head too large"}'))
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(session: Session, host: str = '127.0.0.1', port: int = 8470,
+                ready: Optional[asyncio.Event] = None):
+    service = SheetService(session)
+    server = await asyncio.start_server(service.serve_connection, host, port, backlog=4096)
+    if ready is not None:
+        ready.set()
+    async with server:
+        await server.serve_forever()
+
+
+def roster(size: int) -> Session:
+    """size characters, alternating between the sheets in characters/."""
+    names = ['Oliver Queen', 'Felicity Smoak']
+    return Session(Character.load(names[i % len(names)]) for i in range(size))
+
+
+# ------------------------- Load Generator -------------------------
+async def _client(host: str, port: int, roster_size: int, perk_names: List[List[str]],
+                  requests: int, write_share: float, seed: int, latencies: List[float]):
+    import random
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    views = list(VIEWS)
+    try:
+        for _ in range(requests):
+            slot = rng.randrange(roster_size)
+            if rng.random() < write_share:
+                action = rng.choice(('level_up', 'assign', 'assign', 'increase'))
+                query = ''
+                if action == 'assign':
+                    query = '?perk=' + rng.choice(perk_names[slot % len(perk_names)]).replace(' ', '%20')
+                elif action == 'increase':
+                    query = '?attr=' + rng.choice(SPECIAL)
+                request = f"POST /characters/{slot}/{action}{query} HTTP/1.1\r\nHost: x\r\nContent-Length: 0\r\n\r\n"
+            else:
+                request = f"GET /characters/{slot}/{rng.choice(views)} HTTP/1.1\r\nHost: x\r\n\r\n"
+            start = time.perf_counter()
+            writer.write(request.encode())
+            head = await reader.readuntil(b'\r\n\r\n')
+            length = int(head.split(b'Content-Length: ', 1)[1].split(b'\r\n', 1)[0])
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+
+
+async def load_test(host: str, port: int, clients: int, requests: int, roster_size: int,
+                    write_share: float) -> Tuple[List[float], Dict]:
+    perk_names = [Character.load(name).tree.perk_names for name in ('Oliver Queen', 'Felicity Smoak')]
+    latencies: List[float] = []
+    await asyncio.gather(*(_client(host, port, roster_size, perk_names, requests, write_share, seed,
+                                   latencies) for seed in range(clients)))
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(b"GET /stats HTTP/1.1\r\nConnection: close\r\n\r\n")
+    stats = json.loads((await reader.read()).split(b'\r\n\r\n', 1)[1])
+    writer.close()
+    return latencies, stats
+
+
+def _serve_process(size: int, port: int):
+    asyncio.run(serve(roster(size), port=port))
+
+
+if __name__ == "__main__":
+    import argparse
+    import multiprocessing
+
+    parser = argparse.ArgumentParser(description="Serve character sheets, or load-test the service")
+    parser.add_argument('--port', type=int, default=8470)
+    parser.add_argument('--roster', type=int, default=1000, help='characters held in memory')
+    parser.add_argument('--load', action='store_true', help='start a server process and load it')
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=50, help='per client')
+    parser.add_argument('--writes', type=float, default=0.1, help='share of requests that edit')
+    args = parser.parse_args()
+
+    if not args.load:
+        print(f"Serving {args.roster} characters on http://127.0.0.1:{args.port}/characters")
+        asyncio.run(serve(roster(args.roster), port=args.port))
+    else:
+        server = multiprocessing.Process(target=_serve_process, args=(args.roster, args.port), daemon=True)
+        server.start()
+        time.sleep(1.0)
+        start = time.perf_counter()
+        latencies, stats = asyncio.run(load_test('127.0.0.1', args.port, args.clients, args.requests,
+                                          args.roster, args.writes))
+        elapsed = time.perf_counter() - start
+        server.terminate()
+        latencies.sort()
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] * 1000
+
+        print(f"{args.clients} clients, {len(latencies)} requests in {elapsed:.1f} s "
+              f"= {len(latencies) / elapsed:.0f} req/s")
+        print("latency ms: " + ', '.join(f"p{p} {percentile(p):.1f}" for p in (50, 90, 99, 99.9)))
+        print(f"view cache: {stats['cache_hits']} hits, {stats['renders']} renders")
@@ -0,0 +1,501 @@
+"""
+ARROW: Snapshots
+Versioned binary save/load of the open world and a background autosaver
+"""
+
+import json
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+from operator import itemgetter
+
+import numpy as np
+import glm
+
+# ============================================
+# 1. FILE FORMAT
+# ============================================
+#
+#   header   : magic, version, flags, city seed, tick       (uncompressed)
+#   body     : sections, zlib-compressed as a whole when COMPRESSED is set
+#   section  : 4-byte tag, payload length, payload
+#
+# The city itself is never stored - it is regenerated from the seed, and only
+# tiles that changed since generation travel as TILE sections. Per-entity
+# state is written as NumPy structured arrays, so saving and loading are a
+# handful of buffer copies rather than one Python object per vector.
+
+MAGIC = b'ARSV'
+VERSION = 1
+HEADER = struct.Struct('<4sHHqq')
+SECTION = struct.Struct('<4sI')
+
+COMPRESSED = 0x01
+
+ARROW_TYPES = ('standard', 'explosive', 'grapple')
+BUILDING_TYPES = ('tower', 'tenement', 'industrial')
+
+PLAYER = struct.Struct('<8fiB4?')
+
+ARROW = np.dtype([
+    ('id', '<i8'),
+    ('position', '<f4', 3),
+    ('velocity', '<f4', 3),
+    ('gravity', '<f8'),
+    ('lifetime', '<f8'),
+    ('type', 'u1'),
+])
+
+BUILDING = np.dtype([
+    ('pos', '<f8', 3),
+    ('scale', '<f8', 3),
+    ('color', '<f8', 3),
+    ('type', 'u1'),
+])
+
+TILE = struct.Struct('<iiI')
+SIM = struct.Struct('<q')
+
+# Crowd arrays restored in place (worker processes share their memory)
+CROWD_FIELDS = ('position', 'velocity', 'goal_node', 'goal', 'max_speed', 'kind', 'alive')
+
+
+# ============================================
+# 2. CAPTURE (ON THE SIMULATION THREAD)
+# ============================================
+#
+# Capture is split in two. The simulation thread freezes what the next ticks
+# would change: a copy of the arrow list (firing appends to it), the arrows'
+# positions and velocities (ticks update those vectors in place) copied into
+# two glm arrays in C, their lifetimes, and copies of the crowd arrays. Ids,
+# gravity and type never change after an arrow is fired, and replace_tiles
+# swaps in a new building list rather than editing the old one, so those are
+# read later by reference. Packing - per-arrow loops, type codes, building
+# rows, the RNG state as JSON - happens in Capture.core() and tile_sections(),
+# on whichever thread writes.
+
+ARROW_CODES = {name: code for code, name in enumerate(ARROW_TYPES)}
+BUILDING_CODES = {name: code for code, name in enumerate(BUILDING_TYPES)}
+
+_POSITION = itemgetter('position')
+_VELOCITY = itemgetter('velocity')
+_LIFETIME = itemgetter('lifetime')
+
+
+def _player_bytes(oliver):
+    return PLAYER.pack(
+        *oliver.position, *oliver.rotation, *oliver.velocity,
+        oliver.quiver, ARROW_TYPES.index(oliver.current_arrow),
+        oliver.hood_raised, oliver.bow_drawn, oliver.is_running, oliver.on_ground
+    )
+
+
+def _freeze_arrows(arrows):
+    """(arrows, positions, velocities, lifetimes) as of now; no per-arrow Python loop"""
+    arrows = list(arrows)
+    if not arrows:
+        return arrows, None, None, []
+    return (arrows, glm.array(list(map(_POSITION, arrows))),
+            glm.array(list(map(_VELOCITY, arrows))), list(map(_LIFETIME, arrows)))
+
+
+def _arrow_array(frozen):
+    arrows, positions, velocities, lifetimes = frozen
+    out = np.empty(len(arrows), ARROW)
+    if arrows:
+        out['id'] = [a['id'] for a in arrows]
+        # glm arrays expose their float32 storage directly
+        out['position'] = np.frombuffer(positions, '<f4').reshape(-1, 3)
+        out['velocity'] = np.frombuffer(velocities, '<f4').reshape(-1, 3)
+        out['gravity'] = [a['gravity'] for a in arrows]
+        out['lifetime'] = lifetimes
+        out['type'] = [ARROW_CODES[a['type']] for a in arrows]
+    return out
+
+
+def _building_array(buildings):
+    out = np.empty(len(buildings), BUILDING)
+    if buildings:
+        out['pos'] = [b['pos'] for b in buildings]
+        out['scale'] = [b['scale'] for b in buildings]
+        out['color'] = [b['color'] for b in buildings]
+        out['type'] = [BUILDING_CODES[b['type']] for b in buildings]
+    return out
+
+
+def _tile_sections(buildings, tile_of, tiles):
+    """tile -> TILE section for each of tiles, in one pass over the buildings"""
+    by_tile = {tile: [] for tile in tiles}
+    if by_tile:
+        for b in buildings:
+            rows = by_tile.get(tile_of(b['pos']))
+            if rows is not None:
+                rows.append(b)
+    sections = {}
+    for tile, rows in by_tile.items():
+        rows = _building_array(rows)
+        sections[tile] = (b'TILE', TILE.pack(*tile, len(rows)) + rows.tobytes())
+    return sections
+
+
+def _freeze_crowd(crowd):
+    return (len(crowd), crowd.hits, [getattr(crowd, name).copy() for name in CROWD_FIELDS],
+            crowd.rng.bit_generator.state)
+
+
+def _crowd_bytes(frozen):
+    count, hits, arrays, rng_state = frozen
+    parts = [struct.pack('<II', count, hits)]
+    parts += [np.ascontiguousarray(array).tobytes() for array in arrays]
+    rng_state = json.dumps(rng_state).encode()
+    parts.append(struct.pack('<I', len(rng_state)) + rng_state)
+    return b''.join(parts)
+
+
+class Capture:
+    """The simulation-thread half of a snapshot; core() and tile_sections() pack it"""
+
+    def __init__(self, simulation, tiles=None):
+        city = simulation.city
+        self.seed = city.seed or 0
+        self.tick = simulation.tick
+        self.next_arrow_id = simulation._next_arrow_id
+        self.player = _player_bytes(simulation.oliver)
+        self.arrows = _freeze_arrows(simulation.arrows)
+        self.tiles = list(city.changed_tiles() if tiles is None else tiles)
+        self.buildings = city.buildings
+        self.tile_of = city.tile_of
+        self.crowd = _freeze_crowd(simulation.crowd) if simulation.crowd is not None else None
+
+    def core(self):
+        """Snapshot of everything but the tiles"""
+        sections = [
+            (b'SIM ', SIM.pack(self.next_arrow_id)),
+            (b'PLYR', self.player),
+            (b'ARRW', _arrow_array(self.arrows).tobytes()),
+        ]
+        if self.crowd is not None:
+            sections.append((b'CRWD', _crowd_bytes(self.crowd)))
+        return Snapshot(self.seed, self.tick, sections)
+
+    def tile_sections(self):
+        return _tile_sections(self.buildings, self.tile_of, self.tiles)
+
+
+class Snapshot:
+    """One captured world state: header fields plus (tag, payload) sections"""
+
+    def __init__(self, seed, tick, sections):
+        self.seed = seed
+        self.tick = tick
+        self.sections = sections
+
+    @classmethod
+    def capture(cls, simulation, tiles=None):
+        """Copy out everything needed to rebuild the simulation.
+
+        tiles limits which changed tiles are included (all changed tiles by
+        default). Capture and pack in one go; the Autosaver keeps only the
+        Capture on the simulation thread and packs on its writer.
+        """
+        capture = Capture(simulation, tiles)
+        snapshot = capture.core()
+        snapshot.sections += capture.tile_sections().values()
+        return snapshot
+
+    @classmethod
+    def capture_tile(cls, city, tile):
+        return cls(city.seed or 0, 0, [_tile_sections(city.buildings, city.tile_of, [tile])[tile]])
+
+    # ---------- encoding ----------
+
+    def to_bytes(self, compress=True, level=1):
+        body = b''.join(SECTION.pack(tag, len(payload)) + payload for tag, payload in self.sections)
+        flags = 0
+        if compress:
+            body = zlib.compress(body, level)
+            flags |= COMPRESSED
+        return HEADER.pack(MAGIC, VERSION, flags, self.seed, self.tick) + body
+
+    @classmethod
+    def from_bytes(cls, data, source='snapshot'):
+        magic, version, flags, seed, tick = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError(f"{source} is not an ARROW snapshot")
+        if version != VERSION:
+            raise ValueError(f"{source}: unsupported snapshot version {version}")
+        body = memoryview(data)[HEADER.size:]
+        if flags & COMPRESSED:
+            body = memoryview(zlib.decompress(body))
+        sections = []
+        pos = 0
+        while pos < len(body):
+            tag, length = SECTION.unpack_from(body, pos)
+            pos += SECTION.size
+            sections.append((tag, body[pos:pos + length]))
+            pos += length
+        return cls(seed, tick, sections)
+
+    def save(self, path, compress=True):
+        """Write atomically: a crash mid-save leaves the previous file intact"""
+        partial = path + '.part'
+        with open(partial, 'wb') as f:
+            f.write(self.to_bytes(compress))
+        os.replace(partial, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read(), path)
+
+    # ---------- restore ----------
+
+    def restore(self, simulation):
+        """Apply onto a simulation whose city was generated from self.seed"""
+        if (simulation.city.seed or 0) != self.seed:
+            raise ValueError(f"snapshot is for city seed {self.seed}, not {simulation.city.seed}")
+        simulation.tick = self.tick
+        tiles = {}
+        for tag, payload in self.sections:
+            if tag == b'SIM ':
+                simulation._next_arrow_id, = SIM.unpack(payload)
+            elif tag == b'PLYR':
+                self._restore_player(simulation.oliver, payload)
+            elif tag == b'ARRW':
+                arrows = np.frombuffer(payload, ARROW)
+                simulation.arrows = [
+                    {'id': i, 'position': glm.vec3(*p), 'velocity': glm.vec3(*v),
+                     'gravity': g, 'lifetime': life, 'type': ARROW_TYPES[t]}
+                    for i, p, v, g, life, t in zip(
+                        arrows['id'].tolist(), arrows['position'].tolist(),
+                        arrows['velocity'].tolist(), arrows['gravity'].tolist(),
+                        arrows['lifetime'].tolist(), arrows['type'].tolist())
+                ]
+            elif tag == b'TILE':
+                tx, tz, count = TILE.unpack_from(payload)
+                rows = np.frombuffer(payload, BUILDING, count, TILE.size)
+                tiles[(tx, tz)] = [
+                    {'pos': tuple(pos), 'scale': tuple(scale), 'color': tuple(color),
+                     'type': BUILDING_TYPES[kind]}
+                    for pos, scale, color, kind in zip(
+                        rows['pos'].tolist(), rows['scale'].tolist(),
+                        rows['color'].tolist(), rows['type'].tolist())
+                ]
+            elif tag == b'CRWD' and simulation.crowd is not None:
+                self._restore_crowd(simulation.crowd, payload)
+        if tiles:
+            simulation.city.replace_tiles(tiles)
+
+    @staticmethod
+    def _restore_player(oliver, payload):
+        values = PLAYER.unpack(payload)
+        oliver.position = glm.vec3(*values[0:3])
+        oliver.rotation = glm.vec2(*values[3:5])
+        oliver.velocity = glm.vec3(*values[5:8])
+        oliver.quiver = values[8]
+        oliver.current_arrow = ARROW_TYPES[values[9]]
+        oliver.hood_raised, oliver.bow_drawn, oliver.is_running, oliver.on_ground = values[10:]
+
+    @staticmethod
+    def _restore_crowd(crowd, payload):
+        count, crowd.hits = struct.unpack_from('<II', payload)
+        if count != len(crowd):
+            raise ValueError(f"snapshot has {count} agents, the crowd has {len(crowd)}")
+        pos = 8
+        for name in CROWD_FIELDS:
+            target = getattr(crowd, name)
+            size = target.nbytes
+            target[...] = np.frombuffer(payload, target.dtype, target.size, pos).reshape(target.shape)
+            pos += size
+        length, = struct.unpack_from('<I', payload, pos)
+        crowd.rng.bit_generator.state = json.loads(bytes(payload[pos + 4:pos + 4 + length]))
+
+
+# ============================================
+# 3. INCREMENTAL AUTOSAVE (BACKGROUND THREAD)
+# ============================================
+#
+#   directory/core.snap          player, arrows, crowd - rewritten every time
+#   directory/tile_<x>_<z>.snap  one per changed tile - written when it changes
+#
+# The simulation thread only takes a Capture; the writer thread packs, encodes
+# and writes, so an autosave costs a tick a few buffer copies.
+
+class Autosaver:
+    """Periodic snapshot of the simulation, written off the simulation thread"""
+
+    def __init__(self, directory, interval_ticks=1800, compress=True):
+        self.directory = directory
+        self.interval_ticks = interval_ticks
+        self.compress = compress
+        self.saved_versions = {}    # tile -> version last handed to the writer
+        self.saves = 0
+        self.capture_seconds = 0.0  # time spent on the simulation thread
+        self.capture_max = 0.0      # longest single capture
+        self.write_seconds = 0.0    # time spent packing and writing on the writer thread
+        self._requested = threading.Event()
+        self._jobs = queue.Queue()
+        os.makedirs(directory, exist_ok=True)
+        self._writer = threading.Thread(target=self._write_loop, name='autosave', daemon=True)
+        self._writer.start()
+
+    def request(self):
+        """Save at the end of the next tick (safe from any thread)"""
+        self._requested.set()
+
+    def after_tick(self, simulation):
+        """Called by the simulation after every tick"""
+        if simulation.tick % self.interval_ticks and not self._requested.is_set():
+            return
+        self._requested.clear()
+        start = time.perf_counter()
+        versions = simulation.city.tile_versions
+        tiles = [t for t, v in versions.items() if self.saved_versions.get(t) != v]
+        capture = Capture(simulation, tiles)
+        self.saved_versions.update((t, versions[t]) for t in tiles)
+        elapsed = time.perf_counter() - start
+        self.capture_seconds += elapsed
+        self.capture_max = max(self.capture_max, elapsed)
+        self._jobs.put(capture)
+
+    def _write_loop(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            start = time.perf_counter()
+            # Tiles first: a core file never refers to a tile that isn't on disk
+            for (tx, tz), section in job.tile_sections().items():
+                Snapshot(job.seed, 0, [section]).save(
+                    os.path.join(self.directory, f'tile_{tx}_{tz}.snap'), self.compress)
+            job.core().save(os.path.join(self.directory, 'core.snap'), self.compress)
+            self.write_seconds += time.perf_counter() - start
+            self.saves += 1
+            self._jobs.task_done()
+
+    def flush(self):
+        """Block until every captured save is on disk"""
+        self._jobs.join()
+
+    def close(self):
+        self.flush()
+        self._jobs.put(None)
+        self._writer.join()
+
+
+def load_autosave(directory):
+    """Merge an autosave directory back into one Snapshot"""
+    snapshot = Snapshot.load(os.path.join(directory, 'core.snap'))
+    for name in sorted(os.listdir(directory)):
+        if name.startswith('tile_') and name.endswith('.snap'):
+            snapshot.sections += Snapshot.load(os.path.join(directory, name)).sections
+    return snapshot
+
+
+def load_any(path):
+    """A snapshot file or an autosave directory"""
+    return load_autosave(path) if os.path.isdir(path) else Snapshot.load(path)
+
+
+# ============================================
+# 4. BENCHMARK
+# ============================================
+
+if __name__ == "__main__":
+    import argparse
+    import pickle
+    import shutil
+    import tempfile
+
+    from crowd import Crowd
+    from scene import OliverQueen, PatrolSimulation, StarlingCity
+
+    parser = argparse.ArgumentParser(description="Snapshot save/load throughput")
+    parser.add_argument('--arrows', type=int, default=20000)
+    parser.add_argument('--agents', type=int, default=10000)
+    parser.add_argument('--capture-bound-ms', type=float, default=6.0,
+                        help='fail if an autosave holds the simulation thread longer on average')
+    args = parser.parse_args()
+
+    city = StarlingCity(None, seed=0)
+    crowd = Crowd(city.streets, args.agents, seed=0)
+    simulation = PatrolSimulation(city, OliverQueen(), crowd=crowd)
+    rng = np.random.default_rng(0)
+    simulation.arrows = [
+        {'id': i, 'position': glm.vec3(*rng.uniform(-100, 100, 3)),
+         'velocity': glm.vec3(*rng.normal(0, 20, 3)), 'gravity': 9.8,
+         'lifetime': float(rng.uniform(0, 5)), 'type': 'standard'}
+        for i in range(args.arrows)
+    ]
+    # Knock the top floors off every tenement so every tile carries a delta
+    city.replace_tiles({
+        tile: [dict(b, scale=(b['scale'][0], b['scale'][1] * 0.5, b['scale'][2]))
+               for b in city.tile_buildings(tile)]
+        for tile in {city.tile_of(b['pos']) for b in city.buildings}
+    })
+    reference = simulation.state_hash()
+
+    def timed(run, repeat=5):
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = run()
+            best = min(best, time.perf_counter() - start)
+        return result, best
+
+    workdir = tempfile.mkdtemp(prefix='arrow_snap_')
+    try:
+        print(f"{args.arrows} arrows, {args.agents} agents, "
+              f"{len(city.changed_tiles())} changed tiles")
+        snap, capture = timed(lambda: Snapshot.capture(simulation))
+        print(f"{'capture':>18}: {capture * 1000:8.1f} ms")
+        for compress in (False, True):
+            path = os.path.join(workdir, 'save.snap')
+            data, encode = timed(lambda: snap.to_bytes(compress))
+            _, write = timed(lambda: snap.save(path, compress))
+            loaded, read = timed(lambda: Snapshot.load(path))
+            _, restore = timed(lambda: loaded.restore(simulation), repeat=1)
+            assert simulation.state_hash() == reference
+            label = 'zlib' if compress else 'raw'
+            megabytes = len(data) / 1e6
+            print(f"{label:>18}: {megabytes:6.2f} MB, save {write * 1000:7.1f} ms "
+                  f"({megabytes / write:6.0f} MB/s), load {read * 1000:6.1f} ms + "
+                  f"restore {restore * 1000:6.1f} ms")
+
+        state = {'oliver': vars(simulation.oliver), 'arrows': simulation.arrows,
+                 'buildings': city.buildings, 'crowd': {name: getattr(crowd, name)
+                                                        for name in CROWD_FIELDS}}
+        data, dump = timed(lambda: pickle.dumps(state))
+        _, undump = timed(lambda: pickle.loads(data))
+        print(f"{'pickle (baseline)':>18}: {len(data) / 1e6:6.2f} MB, save {dump * 1000:7.1f} ms, "
+              f"load {undump * 1000:6.1f} ms")
+
+        # Autosave: one tile edited between saves, every save captured mid-run.
+        # In play saves are 30 s apart, so each waits for the previous write
+        # rather than fighting the writer thread for the GIL mid-capture
+        saver = Autosaver(os.path.join(workdir, 'autosave'), interval_ticks=1)
+        tiles = city.changed_tiles()
+        for i in range(20):
+            tile = tiles[i % len(tiles)]
+            city.replace_tiles({tile: city.tile_buildings(tile)})
+            simulation.tick += 1
+            saver.after_tick(simulation)
+            saver.flush()
+        saver.close()
+        print(f"{'autosave':>18}: {saver.saves} saves, "
+              f"{saver.capture_seconds / saver.saves * 1000:.1f} ms/save on the simulation thread "
+              f"(max {saver.capture_max * 1000:.1f}), "
+              f"{saver.write_seconds / saver.saves * 1000:.1f} ms/save on the writer")
+        capture_ms = saver.capture_seconds / saver.saves * 1000
+        assert capture_ms <= args.capture_bound_ms, \
+            f"autosave held the simulation thread {capture_ms:.1f} ms/save " \
+            f"(bound {args.capture_bound_ms} ms)"
+        restored = load_autosave(os.path.join(workdir, 'autosave'))
+        restored.restore(simulation)
+        assert simulation.tick == restored.tick
+    finally:
+        shutil.rmtree(workdir)
+        crowd.close()
@@ -0,0 +1,231 @@
+"""
+ARROW: Arrow trails
+The signature green blur, kept in fixed ring buffers and drawn in one call
+"""
+
+import heapq
+import math
+import time
+
+import numpy as np
+import moderngl
+
+# ============================================
+# 1. RING BUFFERS (CPU SIDE)
+# ============================================
+#
+# Trails are segment rings: each frame every arrow in flight appends one
+# segment (last position -> current position) to a shared ring of `length`
+# rows, overwriting the oldest row. Rows are laid out slot by slot, so one
+# frame dirties one contiguous run of vertices - the only bytes uploaded.
+# A row is overwritten `length` frames after it was laid down, so the ring
+# must span the whole fade at the frame rate it runs at: length defaults to
+# fade * fps rows, plus one.
+# Vertices carry the time they were laid down and the shader fades them out;
+# slots of arrows that are gone are handed back once their last segment has
+# faded. Everything lives in one array allocated up front - memory is the
+# same at one arrow a minute or a full quiver a second.
+
+VERTEX = np.dtype([('position', '<f4', 3), ('born', '<f4')])
+VERTEX_FORMAT = '3f 1f'
+
+
+class TrailBuffer:
+    """Fixed-capacity segment rings, one slot per arrow"""
+
+    def __init__(self, capacity=256, length=None, fade=0.35, fps=60):
+        if length is None:
+            length = math.ceil(fade * fps) + 1
+        self.capacity = capacity
+        self.length = length
+        self.fade = fade
+        # (row, slot, endpoint); born = -inf reads as fully faded
+        self.vertices = np.zeros((length, capacity, 2), VERTEX)
+        self.vertices['born'] = -np.inf
+        self.head = 0            # row the next frame writes
+        self.last = np.zeros((capacity, 3), dtype=np.float32)
+        self.slots = {}          # arrow id -> slot
+        self.retiring = []       # heap of (time faded, slot)
+        self.free = list(range(capacity))  # heap, lowest slot first keeps dirty runs short
+        self.dirty = None        # (first, last + 1) vertex range touched since the last upload
+
+    def _acquire(self, now):
+        while self.retiring and self.retiring[0][0] <= now:
+            heapq.heappush(self.free, heapq.heappop(self.retiring)[1])
+        if self.free:
+            return heapq.heappop(self.free)
+        if self.retiring:
+            slot = heapq.heappop(self.retiring)[1]  # cut a fading trail short
+        else:
+            # Every slot belongs to a live arrow: steal the oldest
+            slot = self.slots.pop(next(iter(self.slots)))
+        self.vertices['born'][:, slot] = -np.inf
+        self._touch(0, self.vertices.size)
+        return slot
+
+    def update(self, arrows, now, limit=None):
+        """Append this frame's positions; arrows maps arrow id -> position
+
+        limit keeps only the newest arrows' trails (ids in firing order); the
+        rest retire as if they had landed.
+        """
+        if limit is not None and len(arrows) > limit:
+            arrows = dict(list(arrows.items())[len(arrows) - limit:])
+        for arrow_id in [a for a in self.slots if a not in arrows]:
+            heapq.heappush(self.retiring, (now + self.fade, self.slots.pop(arrow_id)))
+
+        count = len(arrows)
+        if not count:
+            return
+        slots = np.empty(count, dtype=np.int64)
+        fresh = np.zeros(count, dtype=bool)
+        positions = np.empty((count, 3), dtype=np.float32)
+        for i, (arrow_id, pos) in enumerate(arrows.items()):
+            slot = self.slots.get(arrow_id)
+            if slot is None:
+                slot = self.slots[arrow_id] = self._acquire(now)
+                fresh[i] = True
+            slots[i] = slot
+            positions[i] = (pos[0], pos[1], pos[2])
+
+        # A new arrow has no segment yet - only a starting point
+        row = self.vertices[self.head]
+        moving = slots[~fresh]
+        row['position'][moving, 0] = self.last[moving]
+        row['position'][moving, 1] = positions[~fresh]
+        row['born'][moving] = now
+        if len(moving):
+            base = self.head * self.capacity * 2
+            self._touch(base + int(moving.min()) * 2, base + int(moving.max()) * 2 + 2)
+        self.head = (self.head + 1) % self.length
+        self.last[slots] = positions
+
+    def _touch(self, first, last):
+        if self.dirty is None:
+            self.dirty = (first, last)
+        else:
+            self.dirty = (min(self.dirty[0], first), max(self.dirty[1], last))
+
+    def take_dirty(self):
+        """Vertex range to upload, reset for the next frame"""
+        dirty, self.dirty = self.dirty, None
+        return dirty
+
+    @property
+    def nbytes(self):
+        return self.vertices.nbytes
+
+
+# ============================================
+# 2. GPU STREAMING & DRAW
+# ============================================
+
+class ArrowTrails:
+    """TrailBuffer mirrored into one persistent vertex buffer, drawn as GL_LINES"""
+
+    vertex_shader = '''
+    #version 330
+    uniform mat4 camera;
+    uniform float now;
+    uniform float fade;
+    in vec3 in_position;
+    in float in_born;
+    out float v_alpha;
+    void main() {
+        gl_Position = camera * vec4(in_position, 1.0);
+        v_alpha = clamp(1.0 - (now - in_born) / fade, 0.0, 1.0);
+    }
+    '''
+
+    fragment_shader = '''
+    #version 330
+    in float v_alpha;
+    out vec4 f_color;
+    void main() {
+        if (v_alpha <= 0.0) {
+            discard;
+        }
+        // Green Arrow blur, brightest at the head
+        f_color = vec4(0.35, 1.0, 0.45, v_alpha * v_alpha);
+    }
+    '''
+
+    def __init__(self, ctx, capacity=256, length=None, fade=0.35, fps=60):
+        self.ctx = ctx
+        self.trails = TrailBuffer(capacity, length, fade, fps)
+        self.prog = ctx.program(vertex_shader=self.vertex_shader,
+                                fragment_shader=self.fragment_shader)
+        self.prog['fade'].value = fade
+        # Allocated once at full size; only ever rewritten, never resized
+        self.vbo = ctx.buffer(self.trails.vertices.tobytes(), dynamic=True)
+        self.vao = ctx.vertex_array(self.prog, [(self.vbo, VERTEX_FORMAT, 'in_position', 'in_born')])
+        self.uploaded_bytes = 0
+
+    def update(self, arrows, now, limit=None):
+        """Record this frame's arrow positions and stream what changed to the GPU"""
+        self.trails.update(arrows, now, limit)
+        dirty = self.trails.take_dirty()
+        if dirty is None:
+            return
+        first, last = dirty
+        flat = self.trails.vertices.reshape(-1)
+        if (last - first) * 2 > len(flat):
+            # Most of it changed: orphan so the driver hands us fresh storage
+            # instead of stalling on the copy the GPU may still be reading
+            self.vbo.orphan()
+            first, last = 0, len(flat)
+        data = flat[first:last]
+        self.vbo.write(data.tobytes(), offset=first * VERTEX.itemsize)
+        self.uploaded_bytes += data.nbytes
+
+    def render(self, camera_matrix, now):
+        """Every trail in one draw call, additively blended over the scene"""
+        self.prog['camera'].write(camera_matrix)
+        self.prog['now'].value = now
+        with self.ctx.scope(self.ctx.fbo, enable_only=moderngl.BLEND | moderngl.DEPTH_TEST):
+            self.ctx.blend_func = moderngl.SRC_ALPHA, moderngl.ONE
+            self.vao.render(moderngl.LINES)
+            self.ctx.blend_func = moderngl.DEFAULT_BLENDING
+
+
+# ============================================
+# 3. BENCHMARK
+# ============================================
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Trail update cost at a given fire rate")
+    parser.add_argument('--arrows-per-second', type=float, default=30.0)
+    parser.add_argument('--seconds', type=float, default=20.0)
+    parser.add_argument('--fps', type=int, default=60)
+    args = parser.parse_args()
+
+    trails = TrailBuffer(fps=args.fps)
+    rng = np.random.default_rng(0)
+    arrows = {}
+    next_id = 0
+    dt = 1.0 / args.fps
+    frames = int(args.seconds * args.fps)
+    uploaded = 0
+    start = time.perf_counter()
+    for frame in range(frames):
+        now = frame * dt
+        # Same flight model as ArrowPhysics: 45 u/s, 9.8 gravity, 5 s lifetime
+        for _ in range(rng.poisson(args.arrows_per_second * dt)):
+            direction = rng.normal(size=3)
+            arrows[next_id] = [np.zeros(3), direction / np.linalg.norm(direction) * 45.0, 5.0]
+            next_id += 1
+        for arrow_id, arrow in list(arrows.items()):
+            arrow[1][1] -= 9.8 * dt
+            arrow[0] = arrow[0] + arrow[1] * dt
+            arrow[2] -= dt
+            if arrow[2] <= 0:
+                del arrows[arrow_id]
+        trails.update({arrow_id: arrow[0] for arrow_id, arrow in arrows.items()}, now)
+        first, last = trails.take_dirty() or (0, 0)
+        uploaded += (last - first) * VERTEX.itemsize
+    elapsed = time.perf_counter() - start
+    print(f"{next_id} arrows over {frames} frames: {elapsed / frames * 1e6:.0f} us/frame "
+          f"(incl. flight), {trails.length} rows, {trails.nbytes / 1024:.0f} KB resident, "
+          f"{uploaded / frames / 1024:.1f} KB/frame uploaded, {len(trails.slots)} live slots")